@@ -5,7 +5,7 @@ __version__ = (HERE / "VERSION").read_text().strip()
 
 import prtpy.outputtypes as out
 import prtpy.objectives as obj
-from prtpy.binners import BinsArray, Binner, BinnerKeepingContents, BinnerKeepingSums, printbins
+from prtpy.binners import BinsArray, Binner, BinnerKeepingContents, BinnerKeepingSums, BinnerKeepingIndices, BinnerKeepingAssignment, BinnerKeepingPersistentContents, BinnerKeepingSumsInList, BinnerKeepingContentsInList, TrailBinner, BatchBinner, printbins
 
 from prtpy.packing.adaptors import pack, pack_random_items
 from prtpy.partitioning.adaptors import partition, partition_random_items, compare_algorithms, compare_algorithms_on_random_items
@@ -14,6 +14,9 @@ from prtpy.partitioning.adaptors import partition, partition_random_items, compa
 class partitioning:
     from prtpy.partitioning.complete_greedy import anytime as cg
     from prtpy.partitioning.complete_greedy import anytime as complete_greedy
+    from prtpy.partitioning.complete_greedy import anytime_with_trail as complete_greedy_with_trail
+    from prtpy.partitioning.complete_greedy import breadth_first as complete_greedy_breadth_first
+    from prtpy.partitioning.complete_greedy import anytime_parallel as complete_greedy_parallel
 
     from prtpy.partitioning.dynamic_programming import optimal as dp
     from prtpy.partitioning.dynamic_programming import optimal as dynamic_programming
@@ -43,15 +46,20 @@ class partitioning:
     from prtpy.partitioning.sequential_number_partitioning_sy import snp as sequential_number_partitioning
     from prtpy.partitioning.sequential_number_partitioning_sy import snp as snp_sy
     from prtpy.partitioning.sequential_number_partitioning_sy import snp
+    from prtpy.partitioning.sequential_number_partitioning_sy import snp_with_trail
 
     from prtpy.partitioning.recursive_number_partitioning_sy import rnp as recursive_number_partitioning_sy
     from prtpy.partitioning.recursive_number_partitioning_sy import rnp as rnp_sy
     from prtpy.partitioning.recursive_number_partitioning_sy import rnp as recursive_number_partitioning # Default implementation
     from prtpy.partitioning.recursive_number_partitioning_sy import rnp as rnp
+    from prtpy.partitioning.recursive_number_partitioning_sy import rnp_with_trail
 
     # Eli Belkind module
     from prtpy.partitioning.cbldm import cbldm
 
+    from prtpy.partitioning.meet_in_the_middle import optimal as meet_in_the_middle
+    from prtpy.partitioning.meet_in_the_middle import optimal as horowitz_sahni
+
     
 partitioning.complete_greedy.__name__ = "complete-greedy"
 partitioning.integer_programming.__name__ = "integer-programming"
@@ -64,6 +72,7 @@ partitioning.recursive_number_partitioning_sy.__name__ = "recursive-number-parti
 partitioning.recursive_number_partitioning.__name__ = "recursive-number-partitioning"
 partitioning.sequential_number_partitioning_sy.__name__ = "sequential-number-partitioning-sy"
 partitioning.sequential_number_partitioning.__name__ = "sequential-number-partitioning"
+partitioning.meet_in_the_middle.__name__ = "meet-in-the-middle"
 
 class packing:
     from prtpy.packing.first_fit import online as first_fit, decreasing as first_fit_decreasing
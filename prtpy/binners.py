@@ -13,8 +13,8 @@ Since:  2022-07
 
 from abc import ABC, abstractmethod
 
-import numpy as np, itertools
-from typing import Any, Callable, List, Tuple, Iterator
+import numpy as np, itertools, numbers, bisect, operator
+from typing import Any, Callable, List, Tuple, Iterator, Iterable
 import prtpy
 
 BinsArray = Any
@@ -34,6 +34,45 @@ def bins2str(bins: BinsArray)->str:
 def printbins(bins:BinsArray):
     print(bins2str(bins))
 
+def exact_dtype(values: Iterable[float]) -> type:
+    """
+    Return a dtype for bin sums, that keeps all sums of the given values exact:
+     * float, if some value is not an integer;
+     * np.int64, if all values are integers, and the sum of their absolute values fits in 64 bits;
+     * object (arbitrary-precision Python ints), if all values are integers, but their sum might overflow 64 bits.
+
+    >>> exact_dtype([1.5, 2, 3])
+    <class 'float'>
+    >>> exact_dtype([1, 2, np.int64(3)])
+    <class 'numpy.int64'>
+    >>> exact_dtype([2**62, 2**62])
+    <class 'object'>
+    """
+    total = 0
+    for value in values:
+        if not isinstance(value, numbers.Integral):
+            return float
+        total += abs(int(value))
+    return np.int64 if total < 2**63 else object
+
+def value_vector(items: Iterable[Any], valueof: Callable) -> np.ndarray:
+    """
+    Compute the values of all items once, into a numpy vector whose dtype is given by `exact_dtype`.
+    Used by the adaptors, which then pass the item indices to the algorithm (see `Binner.use_value_vector`).
+
+    >>> value_vector(["a", "bb", "ccc"], len)
+    array([1, 2, 3])
+    >>> value_vector([1.5, 2], lambda x:x)
+    array([1.5, 2. ])
+    >>> value_vector([2**62, 2**62], lambda x:x)
+    array([4611686018427387904, 4611686018427387904], dtype=object)
+    """
+    values = [valueof(item) for item in items]
+    dtype = exact_dtype(values)
+    if dtype is object:
+        values = [int(value) for value in values]
+    return np.array(values, dtype=dtype)
+
 class Binner(ABC):
     """
     An abstract bins-array manager.
@@ -45,6 +84,31 @@ class Binner(ABC):
 
     def __init__(self, valueof: Callable = lambda x:x):
         self.valueof = valueof
+        self.values = None
+
+    def use_value_vector(self, values: np.ndarray):
+        """
+        Let the items be indices into the given vector of values: the value of item i is values[i].
+        Used by the adaptors, which compute the values of all items once (see `value_vector`).
+        Algorithms can then use vectorized operations on the values (see `values_of`).
+        """
+        self.values = values
+        self.valueof = values.tolist().__getitem__
+
+    def values_of(self, items: Iterable[Any]) -> np.ndarray:
+        """
+        Return a numpy vector with the values of the given items.
+
+        >>> binner = BinnerKeepingSums(len)
+        >>> binner.values_of(["a", "bb"])
+        array([1, 2])
+        >>> binner.use_value_vector(np.array([10, 20, 30]))
+        >>> binner.values_of([2, 0])
+        array([30, 10])
+        """
+        if self.values is not None:
+            return self.values[np.fromiter(items, dtype=np.intp)]
+        return np.array([self.valueof(item) for item in items])
 
     @abstractmethod
     def new_bins(self, numbins:int)->BinsArray:
@@ -94,6 +158,17 @@ class Binner(ABC):
         return bins
 
 
+    def add_and_resort(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        """
+        Add the given item to the given bin, in a bins-array that is sorted by ascending sum,
+        and keep the array sorted by ascending sum.
+        Since the value of the item is non-negative, only the given bin may move - towards the end of the array.
+        Return the bins after the addition.
+        """
+        self.add_item_to_bin(bins, item, bin_index)
+        self.sort_by_ascending_sum(bins)
+        return bins
+
     @abstractmethod
     def sort_by_ascending_sum(self, bins:BinsArray):
         """
@@ -131,19 +206,124 @@ class Binner(ABC):
         """
         pass
 
-    @abstractmethod
+    def combination_sums(self, bins1: BinsArray, bins2: BinsArray)->Iterator[Tuple[Tuple[int], List[float]]]:
+        '''
+        Generate the sums of all the possible combinations of bins between two bins-arrays, without building their contents.
+        Yields pairs (perm, sums): bin perm[i] of bins1 is combined with bin i of bins2, and sums are the new sums in ascending order.
+        NOTE: combinations with the same sums are equivalent for algorithms that depend only on the sums (like CKK),
+              so only the first of them is returned.
+
+        >>> binner = BinnerKeepingSums()
+        >>> for perm,sums in binner.combination_sums([0,0,0], [1,1,5]): perm, sums
+        ((0, 1, 2), [1, 1, 5])
+        '''
+        numbins = self.numbins(bins1)
+        if self.numbins(bins2)!=numbins:
+            raise ValueError(f"Inputs should have the same number of bins, but they have {numbins} and {self.numbins(bins2)} bins.")
+        sums1 = list(self.sums(bins1))
+        sums2 = list(self.sums(bins2))
+        indices_of_sum = {}
+        for i,sum1 in enumerate(sums1):
+            indices_of_sum.setdefault(sum1, []).append(i)
+        yielded = set()
+        # Permuting bins with equal sums gives the same sums, so only distinct orders of the sums of bins1 are used.
+        for sums1_order in dict.fromkeys(itertools.permutations(sums1)):
+            new_sums = sorted(map(operator.add, sums1_order, sums2))
+            new_sums_tuple = tuple(new_sums)
+            if new_sums_tuple not in yielded:
+                yielded.add(new_sums_tuple)
+                unused_indices = {sum1: iter(indices) for sum1,indices in indices_of_sum.items()}
+                perm = tuple(next(unused_indices[sum1]) for sum1 in sums1_order)
+                yield (perm, new_sums)
+
+    def combine_by_permutation(self, bins1: BinsArray, bins2: BinsArray, perm: Tuple[int])->BinsArray:
+        '''
+        Return a new bins-array, in which bin i is the combination of bin perm[i] of bins1 with bin i of bins2,
+        sorted by ascending sum. bins1 and bins2 are not modified.
+        '''
+        numbins = len(perm)
+        new_bins = self.new_bins(numbins)
+        for i in range(numbins):
+            self.combine_bins(new_bins, i, bins1, perm[i])
+            self.combine_bins(new_bins, i, bins2, i)
+        self.sort_by_ascending_sum(new_bins)
+        return new_bins
+
     def all_combinations(self, bins1: BinsArray, bins2: BinsArray)->Iterator[BinsArray]:
         '''
         generate all the possible combinations of bins between two object bins
-        NOTE: duplicate combinations are not returned.
+        NOTE: combinations with the same sums are returned only once (see `combination_sums`).
+
+        >>> binner = BinnerKeepingSums(dtype=int)
+        >>> for perm in binner.all_combinations([1,2,3], [4,5,6]): list(perm)
+        [5, 7, 9]
+        [5, 8, 8]
+        [6, 6, 9]
+        [6, 7, 8]
+        [7, 7, 7]
+        >>> for perm in binner.all_combinations([1,20,300], [4,50,600]): list(perm)
+        [5, 70, 900]
+        [5, 350, 620]
+        [24, 51, 900]
+        [24, 350, 601]
+        [51, 304, 620]
+        [70, 304, 601]
+
+        >>> for binner in [BinnerKeepingContents(), BinnerKeepingIndices(), BinnerKeepingPersistentContents()]:
+        ...     b1 = binner.new_bins(3)
+        ...     for item,ibin in [(1,0), (20,1), (300,2)]: _=binner.add_item_to_bin(b1, item, ibin)
+        ...     b2 = binner.new_bins(3)
+        ...     for item,ibin in [(1,0), (3,0), (4,1), (46,1), (600,2)]: _=binner.add_item_to_bin(b2, item, ibin)
+        ...     for perm in binner.all_combinations(b1,b2): print(perm[1])
+        ...     print()
+        [[1, 1, 3], [4, 20, 46], [300, 600]]
+        [[1, 1, 3], [4, 46, 300], [20, 600]]
+        [[1, 3, 20], [1, 4, 46], [300, 600]]
+        [[1, 3, 20], [4, 46, 300], [1, 600]]
+        [[1, 4, 46], [1, 3, 300], [20, 600]]
+        [[4, 20, 46], [1, 3, 300], [1, 600]]
+        <BLANKLINE>
+        [[1, 1, 3], [20, 4, 46], [300, 600]]
+        [[1, 1, 3], [300, 4, 46], [20, 600]]
+        [[20, 1, 3], [1, 4, 46], [300, 600]]
+        [[20, 1, 3], [300, 4, 46], [1, 600]]
+        [[1, 4, 46], [300, 1, 3], [20, 600]]
+        [[20, 4, 46], [300, 1, 3], [1, 600]]
+        <BLANKLINE>
+        [[1, 1, 3], [20, 4, 46], [300, 600]]
+        [[1, 1, 3], [300, 4, 46], [20, 600]]
+        [[20, 1, 3], [1, 4, 46], [300, 600]]
+        [[20, 1, 3], [300, 4, 46], [1, 600]]
+        [[1, 4, 46], [300, 1, 3], [20, 600]]
+        [[20, 4, 46], [300, 1, 3], [1, 600]]
+        <BLANKLINE>
         '''
-        pass
+        for perm, _ in self.combination_sums(bins1, bins2):
+            yield self.combine_by_permutation(bins1, bins2, perm)
+
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        """
+        Return an object that describes the current state of the given bin,
+        such that restore_bin can later bring the bin back to this state.
+        Used by TrailBinner for backtracking.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support backtracking.")
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        """
+        Bring the given bin back to a state returned by bin_state.
+        NOTE: Bins must be restored in the reverse order in which their states were taken.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support backtracking.")
 
 
 class BinnerKeepingSums(Binner):
     """
     A binner that creates bin-arrays that keep track only of the total sum in each bin.
 
+    The sums are kept in a numpy array of the given dtype (float by default; see `exact_dtype`).
+    With dtype=object, the values are converted to Python ints, so the sums are exact regardless of their size.
+
     >>> values = {"a":3, "b":4, "c":5, "d":5, "e":5}
     >>> binner = BinnerKeepingSums(lambda x: values[x])
     >>> bins = binner.new_bins(3)
@@ -193,15 +373,29 @@ class BinnerKeepingSums(Binner):
     >>> printbins(binner.remove_bins(bins, 1))
     Bin #0: sum=0.0
     Bin #1: sum=3.0
+
+    Integer sums:
+    >>> binner = BinnerKeepingSums(dtype=np.int64)
+    >>> printbins(binner.add_item_to_bin(binner.new_bins(2), item=2**53+1, bin_index=0))
+    Bin #0: sum=9007199254740993
+    Bin #1: sum=0
+    >>> binner = BinnerKeepingSums(dtype=object)
+    >>> bins = binner.add_item_to_bin(binner.new_bins(2), item=np.int64(2**62), bin_index=0)
+    >>> printbins(binner.add_item_to_bin(bins, item=np.int64(2**62), bin_index=0))
+    Bin #0: sum=9223372036854775808
+    Bin #1: sum=0
     """
 
-    def __init__(self, valueof: Callable = lambda x:x):
+    def __init__(self, valueof: Callable = lambda x:x, dtype: type = float):
+        if np.dtype(dtype) == object:
+            valueof = _exact_integer_valueof(valueof)
         super().__init__(valueof)
+        self.dtype = dtype
 
     BinsArray = np.ndarray    # Here, the bins-array is simply an array of the sums.
 
     def new_bins(self, numbins)->BinsArray:
-        bins = np.zeros(numbins)
+        bins = np.zeros(numbins, dtype=self.dtype)
         return bins
 
     def copy_bins(self, bins: BinsArray)->BinsArray:
@@ -226,6 +420,8 @@ class BinnerKeepingSums(Binner):
         bins[bin_index] += self.valueof(item)
         return bins
 
+    # add_and_resort is inherited: for an array of sums only, numpy's in-place sort is faster than moving the bin with a Python-level bisection.
+
     def numitems(self, bins: BinsArray, bin_index:int) -> Tuple[float]:
         raise NotImplementedError("Bins keeping sums do not keep track of the number of items.")
 
@@ -244,37 +440,11 @@ class BinnerKeepingSums(Binner):
     def combine_bins(self, bins1:BinsArray, ibin1:int, bins2:BinsArray, ibin2:int):
         bins1[ibin1] += bins2[ibin2]
 
-    def all_combinations(self, bins1: BinsArray, bins2: BinsArray)->Iterator[BinsArray]:
-        """
-        >>> binner = BinnerKeepingSums()
-        >>> b1 = [1,2,3]
-        >>> b2 = [4,5,6]
-        >>> for perm in binner.all_combinations(b1, b2): perm
-        [5, 7, 9]
-        [5, 8, 8]
-        [6, 6, 9]
-        [6, 7, 8]
-        [7, 7, 7]
-        >>> b1 = [1,20,300]
-        >>> b2 = [4,50,600]
-        >>> for perm in binner.all_combinations(b1, b2): perm
-        [5, 70, 900]
-        [5, 350, 620]
-        [24, 51, 900]
-        [24, 350, 601]
-        [51, 304, 620]
-        [70, 304, 601]
-        """
-        yielded = set()   # prevent duplicates
-        numbins = self.numbins(bins1)
-        for perm in itertools.permutations(range(numbins)):
-            # print("perm=",perm)
-            new_sums = [bins1[perm[i]] + bins2[i] for i in range(numbins)]
-            new_sums.sort()   # to avoid duplicates
-            new_sums_tuple = tuple(new_sums)
-            if new_sums_tuple not in yielded:
-                yielded.add(new_sums_tuple)
-                yield new_sums
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        return bins[bin_index]
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        bins[bin_index] = state
 
 
 class BinnerKeepingContents(BinnerKeepingSums):
@@ -339,13 +509,13 @@ class BinnerKeepingContents(BinnerKeepingSums):
     Bin #1: ['a'], sum=3.0
     """
 
-    def __init__(self, valueof: Callable = lambda x:x):
-        super().__init__(valueof)
+    def __init__(self, valueof: Callable = lambda x:x, dtype: type = float):
+        super().__init__(valueof, dtype)
 
     BinsArray = Tuple[np.ndarray, List[List]]  # Here, each bins-array is a tuple: sums,lists. sums is an array of sums; lists is a list of lists of items.
 
     def new_bins(self, numbins:int)->BinsArray:
-        sums  = np.zeros(numbins)
+        sums  = np.zeros(numbins, dtype=self.dtype)
         lists = [[] for _ in range(numbins)]
         return (sums, lists)
 
@@ -382,9 +552,35 @@ class BinnerKeepingContents(BinnerKeepingSums):
         lists[bin_index].append(item)
         return bins
 
+    def add_and_resort(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        """
+        >>> binner = BinnerKeepingContents()
+        >>> bins = binner.new_bins(3)
+        >>> for item in [1, 2, 3]: _ = binner.add_and_resort(bins, item, 0)
+        >>> bins
+        (array([1., 2., 3.]), [[1], [2], [3]])
+        >>> binner.add_and_resort(bins, 4, 0)
+        (array([2., 3., 5.]), [[2], [3], [1, 4]])
+        """
+        sums, lists = bins
+        bin_index, new_index, new_sum = _resorted_index(sums, bin_index, self.valueof(item))
+        new_list = lists[bin_index]
+        new_list.append(item)
+        sums[bin_index:new_index] = sums[bin_index+1:new_index+1]
+        lists[bin_index:new_index] = lists[bin_index+1:new_index+1]
+        sums[new_index] = new_sum
+        lists[new_index] = new_list
+        return bins
+
     def sums(self, bins: BinsArray) -> Tuple[float]:
         return bins[0]
 
+    def lists(self, bins: BinsArray) -> List[List]:
+        """
+        Return the contents of all bins, as a list of lists of items.
+        """
+        return bins[1]
+
     def numitems(self, bins: BinsArray, bin_index:int) -> Tuple[float]:
         """
         Return the number of items in the given bin.
@@ -412,34 +608,967 @@ class BinnerKeepingContents(BinnerKeepingSums):
         sums1[ibin1] += sums2[ibin2]
         lists1[ibin1] += lists2[ibin2]
 
+    def combine_by_permutation(self, bins1: BinsArray, bins2: BinsArray, perm: Tuple[int])->BinsArray:
+        sums1, lists1 = bins1
+        sums2, lists2 = bins2
+        new_bins = self.new_bins(len(perm))
+        new_sums, new_lists = new_bins
+        for i,ibin1 in enumerate(perm):
+            new_sums[i] = sums1[ibin1] + sums2[i]
+            new_lists[i] = sorted(lists1[ibin1] + lists2[i])   # a merge of two sorted runs, for a canonical order of items
+        self.sort_by_ascending_sum(new_bins)
+        return new_bins
+
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        sums, lists = bins
+        return (sums[bin_index], len(lists[bin_index]))
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        sums, lists = bins
+        sums[bin_index], numitems = state
+        del lists[bin_index][numitems:]
+
+
+class BinnerKeepingSumsInList(BinnerKeepingSums):
+    """
+    A binner that keeps track only of the total sum in each bin, like BinnerKeepingSums,
+    but keeps the sums in a plain Python list rather than a numpy array.
+    For a small number of bins, list operations are much faster than numpy operations,
+    which have a large constant overhead per call.
+    See `small_binner` for automatic selection.
+
+    >>> values = {"a":3, "b":4, "c":5, "d":5, "e":5}
+    >>> binner = BinnerKeepingSumsInList(lambda x: values[x])
+    >>> bins = binner.new_bins(3)
+    >>> binner.add_item_to_bin(bins, item="a", bin_index=0)
+    [3, 0, 0]
+    >>> binner.add_item_to_bin(binner.copy_bins(bins), item="b", bin_index=1)
+    [3, 4, 0]
+    >>> bins
+    [3, 0, 0]
+    >>> binner.sort_by_ascending_sum(bins)
+    >>> bins
+    [0, 0, 3]
+    >>> binner.add_and_resort(bins, item="c", bin_index=0)
+    [0, 3, 5]
+    >>> binner.add_and_resort(bins, item="d", bin_index=1)
+    [0, 5, 8]
+    >>> binner.concatenate_bins(bins, binner.new_bins(1))
+    [0, 5, 8, 0]
+    """
+
+    BinsArray = List[float]    # Here, the bins-array is a list of the sums.
+
+    def new_bins(self, numbins)->BinsArray:
+        return numbins*[0]
+
+    def copy_bins(self, bins: BinsArray)->BinsArray:
+        return list(bins)
+
+    def concatenate_bins(self, bins1:BinsArray, bins2:BinsArray):
+        return list(bins1) + list(bins2)
+
+    def add_and_resort(self, bins: BinsArray, item: Any, bin_index: int)->BinsArray:
+        bin_index, new_index, new_sum = _resorted_index(bins, bin_index, self.valueof(item))
+        bins[bin_index:new_index] = bins[bin_index+1:new_index+1]
+        bins[new_index] = new_sum
+        return bins
+
+
+class BinnerKeepingContentsInList(BinnerKeepingContents):
+    """
+    A binner that keeps track of the entire contents of each bin, like BinnerKeepingContents,
+    but keeps the sums in a plain Python list rather than a numpy array.
+    See `small_binner` for automatic selection.
+
+    >>> values = {"a":3, "b":4, "c":5, "d":5, "e":5}
+    >>> binner = BinnerKeepingContentsInList(lambda x: values[x])
+    >>> bins = binner.new_bins(3)
+    >>> binner.add_item_to_bin(bins, item="a", bin_index=0)
+    ([3, 0, 0], [['a'], [], []])
+    >>> binner.add_item_to_bin(binner.copy_bins(bins), item="b", bin_index=1)
+    ([3, 4, 0], [['a'], ['b'], []])
+    >>> binner.sort_by_ascending_sum(bins)
+    >>> bins
+    ([0, 0, 3], [[], [], ['a']])
+    >>> binner.add_and_resort(bins, item="c", bin_index=0)
+    ([0, 3, 5], [[], ['a'], ['c']])
+    >>> binner.add_and_resort(bins, item="d", bin_index=1)
+    ([0, 5, 8], [[], ['c'], ['a', 'd']])
+    """
+
+    BinsArray = Tuple[List[float], List[List]]  # Here, each bins-array is a tuple: sums,lists. sums is a list of sums; lists is a list of lists of items.
+
+    def new_bins(self, numbins:int)->BinsArray:
+        return (numbins*[0], [[] for _ in range(numbins)])
+
+    def copy_bins(self, bins: BinsArray)->BinsArray:
+        sums, lists = bins
+        return (list(sums), list(map(list, lists)))
+
+    def concatenate_bins(self, bins1:BinsArray, bins2:BinsArray):
+        sums1, lists1 = bins1
+        sums2, lists2 = bins2
+        return (list(sums1) + list(sums2), lists1 + lists2)
+
+
+SMALL_NUMBINS = 5   # Up to this number of bins, algorithms replace the numpy-based binners by the list-based binners.
+
+def small_binner(binner: Binner, numbins: int)->Binner:
+    """
+    Return a list-based binner that can be used by an algorithm instead of the given binner, 
+    if the number of bins is small, and the given binner is one of the standard numpy-based binners.
+    Otherwise, return the given binner itself.
+    Use `convert_bins` to convert the algorithm's output back to the format of the given binner.
+
+    >>> type(small_binner(BinnerKeepingSums(), 3)).__name__
+    'BinnerKeepingSumsInList'
+    >>> type(small_binner(BinnerKeepingContents(), 3)).__name__
+    'BinnerKeepingContentsInList'
+    >>> type(small_binner(BinnerKeepingContents(), 10)).__name__
+    'BinnerKeepingContents'
+    """
+    if numbins > SMALL_NUMBINS:
+        return binner
+    if type(binner) is BinnerKeepingSums:
+        new_binner = BinnerKeepingSumsInList(binner.valueof)
+    elif type(binner) is BinnerKeepingContents:
+        new_binner = BinnerKeepingContentsInList(binner.valueof)
+    else:
+        return binner
+    new_binner.values = binner.values
+    return new_binner
+
+
+def convert_bins(bins: BinsArray, from_binner: Binner, to_binner: Binner)->BinsArray:
+    """
+    Convert a bins-array created by `small_binner(to_binner)` into a bins-array of to_binner.
+
+    >>> binner = BinnerKeepingContents()
+    >>> bins = small_binner(binner, 2).new_bins(2)
+    >>> _ = small_binner(binner, 2).add_item_to_bin(bins, 5, 1)
+    >>> printbins(convert_bins(bins, small_binner(binner, 2), binner))
+    Bin #0: [], sum=0.0
+    Bin #1: [5], sum=5.0
+    """
+    if from_binner is to_binner:
+        return bins
+    numbins = from_binner.numbins(bins)
+    new_bins = to_binner.new_bins(numbins)
+    for ibin in range(numbins):
+        to_binner.combine_bins(new_bins, ibin, bins, ibin)
+    return new_bins
+
+
+class LazyBinsArray:
+    """
+    A base class for bins-arrays that keep the bin contents in some compact structure.
+
+    For compatibility with BinnerKeepingContents, it behaves like a pair (sums, lists):
+    the lists are materialized, by the binner that created the array, only when bins[1] is requested.
+    """
+    __slots__ = ("binner", "sums")
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index:int):
+        return (self.sums, self.binner.lists(self))[index]
+
+    def __iter__(self):
+        yield self.sums
+        yield self.binner.lists(self)
+
+    def __repr__(self)->str:
+        return repr((self.sums, self.binner.lists(self)))
+
+
+class IndexedBinsArray(LazyBinsArray):
+    """
+    A bins-array of BinnerKeepingIndices.
+
+    It keeps the items in two flat integer buffers:
+    entries[j] is the index (in the binner's item table) of the j-th added item,
+    and owners[j] is the index of the bin that contains it.
+    Only the first `size` places in the buffers are used.
+    """
+    __slots__ = ("entries", "owners", "size")
+
+    def __init__(self, binner, sums:np.ndarray, entries:np.ndarray, owners:np.ndarray, size:int):
+        self.binner = binner
+        self.sums = sums
+        self.entries = entries
+        self.owners = owners
+        self.size = size
+
+
+class BinnerKeepingIndices(BinnerKeepingContents):
+    """
+    A binner that keeps track of the entire contents of each bin, like BinnerKeepingContents,
+    but stores the items as integer indices in flat NumPy buffers, instead of in lists of lists.
+    Copying a bins-array copies only two small integer arrays, and no Python lists are created.
+    The lists of items are materialized only when the output is extracted.
+
+    The binner keeps a table of all the items it has seen, so the items must be hashable.
+
+    >>> values = {"a":3, "b":4, "c":5, "d":5, "e":5}
+    >>> binner = BinnerKeepingIndices(lambda x: values[x])
+    >>> bins = binner.new_bins(3)
+    >>> printbins(binner.add_item_to_bin(bins, item="a", bin_index=0))
+    Bin #0: ['a'], sum=3.0
+    Bin #1: [], sum=0.0
+    Bin #2: [], sum=0.0
+    >>> _=binner.add_item_to_bin(bins, item="b", bin_index=1)
+    >>> _=binner.add_item_to_bin(bins, item="c", bin_index=1)
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    Bin #2: [], sum=0.0
+
+    Adding to a clone should not change the original:
+    >>> printbins(binner.add_item_to_bin(binner.copy_bins(bins), item="d", bin_index=1))
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c', 'd'], sum=14.0
+    Bin #2: [], sum=0.0
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    Bin #2: [], sum=0.0
+    >>> binner.sort_by_ascending_sum(bins)
+    >>> printbins(bins)
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c'], sum=9.0
+    >>> binner.numitems(bins, 0), binner.numitems(bins, 1), binner.numitems(bins, 2)
+    (0, 1, 2)
+    >>> bins
+    (array([0., 3., 9.]), [[], ['a'], ['b', 'c']])
+
+    >>> printbins(binner.add_empty_bins(bins, 1))
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c'], sum=9.0
+    Bin #3: [], sum=0.0
+    >>> printbins(binner.remove_bins(bins, 1))
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+
+    >>> bins2 = binner.add_item_to_bin(binner.new_bins(3), item="e", bin_index=-1)
+    >>> binner.combine_bins(bins, 0, bins2, 2)
+    >>> printbins(bins)
+    Bin #0: ['e'], sum=5.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c'], sum=9.0
+    """
+
+    def __init__(self, valueof: Callable = lambda x:x, dtype: type = float):
+        super().__init__(valueof, dtype)
+        self.items = []         # maps an index to an item
+        self.item_indices = {}  # maps an item to its index
+
+    BinsArray = IndexedBinsArray
+
+    def _index_of(self, item:Any)->int:
+        index = self.item_indices.get(item)
+        if index is None:
+            index = self.item_indices[item] = len(self.items)
+            self.items.append(item)
+        return index
+
+    def _new_bins_array(self, sums:np.ndarray, entries:np.ndarray, owners:np.ndarray)->BinsArray:
+        size = len(entries)
+        capacity = max(size, 8)
+        new_entries = np.empty(capacity, dtype=np.int32)
+        new_owners  = np.empty(capacity, dtype=np.int32)
+        new_entries[:size] = entries
+        new_owners[:size] = owners
+        return IndexedBinsArray(self, sums, new_entries, new_owners, size)
+
+    def new_bins(self, numbins:int)->BinsArray:
+        return self._new_bins_array(np.zeros(numbins, dtype=self.dtype), entries=(), owners=())
+
+    def copy_bins(self, bins: BinsArray)->BinsArray:
+        return IndexedBinsArray(self, np.array(bins.sums), bins.entries.copy(), bins.owners.copy(), bins.size)
+
+    def concatenate_bins(self, bins1:BinsArray, bins2:BinsArray):
+        """
+        Concatenate the bins in bins1 with the bins in bins2.
+        NOTE: Returns a new BinsArray. bins1 and bins2 are not modified.
+        """
+        new_sums = np.append(bins1.sums, bins2.sums)
+        new_entries = np.append(bins1.entries[:bins1.size], bins2.entries[:bins2.size])
+        new_owners = np.append(bins1.owners[:bins1.size], bins2.owners[:bins2.size] + len(bins1.sums))
+        return self._new_bins_array(new_sums, new_entries, new_owners)
+
+    def remove_bins(self, bins: BinsArray, numbins:int)->BinsArray:
+        '''
+        Remove some bins from the end of the given BinsArray.
+        Returns a copy of "bins" with the removed bins.
+        NOTE: This does NOT change bins in-place; it returns a copy.
+        '''
+        new_numbins = len(bins.sums)-numbins
+        owners = bins.owners[:bins.size]
+        kept = owners < new_numbins
+        return self._new_bins_array(bins.sums[0:new_numbins], bins.entries[:bins.size][kept], owners[kept])
+
+    def _append(self, bins: BinsArray, entries:np.ndarray, bin_index:int):
+        new_size = bins.size + len(entries)
+        if new_size > len(bins.entries):
+            capacity = max(new_size, 2*len(bins.entries))
+            bins.entries = np.resize(bins.entries, capacity)
+            bins.owners = np.resize(bins.owners, capacity)
+        bins.entries[bins.size:new_size] = entries
+        bins.owners[bins.size:new_size] = bin_index
+        bins.size = new_size
+
+    def add_item_to_bin(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        if bin_index < 0:
+            bin_index += len(bins.sums)
+        bins.sums[bin_index] += self.valueof(item)
+        if bins.size == len(bins.entries):
+            self._append(bins, (self._index_of(item),), bin_index)
+        else:
+            bins.entries[bins.size] = self._index_of(item)
+            bins.owners[bins.size] = bin_index
+            bins.size += 1
+        return bins
+
+    def add_and_resort(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        """
+        >>> binner = BinnerKeepingIndices()
+        >>> bins = binner.new_bins(3)
+        >>> for item in [1, 2, 3, 4]: _ = binner.add_and_resort(bins, item, 0)
+        >>> bins
+        (array([2., 3., 5.]), [[2], [3], [1, 4]])
+        """
+        # Moving a bin requires renumbering the owners of all entries anyway, so a vectorized re-sort is as fast.
+        self.add_item_to_bin(bins, item, bin_index)
+        self.sort_by_ascending_sum(bins)
+        return bins
+
+    def sums(self, bins: BinsArray) -> Tuple[float]:
+        return bins.sums
+
+    def lists(self, bins: BinsArray) -> List[List]:
+        """
+        Return the contents of all bins, as a list of lists of items.
+        """
+        numbins = len(bins.sums)
+        owners = bins.owners[:bins.size]
+        order = np.argsort(owners, kind="stable")
+        boundaries = np.cumsum(np.bincount(owners, minlength=numbins))[:-1]
+        items = self.items
+        return [
+            [items[index] for index in indices]
+            for indices in np.split(bins.entries[:bins.size][order], boundaries)
+        ]
+
+    def numitems(self, bins: BinsArray, bin_index:int) -> int:
+        """
+        Return the number of items in the given bin.
+        """
+        if bin_index < 0:
+            bin_index += len(bins.sums)
+        return int(np.count_nonzero(bins.owners[:bins.size]==bin_index))
+
+    def numbins(self, bins: BinsArray) -> int:
+        """
+        Return the number of bins in the given bins-array.
+        """
+        return len(bins.sums)
+
+    def sort_by_ascending_sum(self, bins: BinsArray):
+        sums = bins.sums
+        sorted_indices = np.argsort(sums, kind="stable")
+        new_indices = np.empty_like(sorted_indices)
+        new_indices[sorted_indices] = np.arange(len(sums))
+        sums[:] = sums[sorted_indices]
+        bins.owners[:bins.size] = new_indices[bins.owners[:bins.size]]
+
+    def combine_bins(self, bins1:BinsArray, ibin1:int, bins2:BinsArray, ibin2:int):
+        if ibin1 < 0:
+            ibin1 += len(bins1.sums)
+        if ibin2 < 0:
+            ibin2 += len(bins2.sums)
+        bins1.sums[ibin1] += bins2.sums[ibin2]
+        entries2 = bins2.entries[:bins2.size][bins2.owners[:bins2.size]==ibin2]
+        self._append(bins1, entries2, ibin1)
+
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        # Items are only appended at the end of the buffers, so when states are restored in reverse order,
+        # the items added after the state was taken are exactly the items after the current size.
+        return (bins.sums[bin_index], bins.size)
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        bins.sums[bin_index], bins.size = state
+
+    def combine_by_permutation(self, bins1: BinsArray, bins2: BinsArray, perm: Tuple[int])->BinsArray:
+        # Renumber the owners of bins1 by the inverse permutation, so all entries are moved in one vectorized pass.
+        perm = list(perm)
+        inverse = np.empty(len(perm), dtype=np.int32)
+        inverse[perm] = np.arange(len(perm))
+        new_bins = self._new_bins_array(
+            bins1.sums[perm] + bins2.sums,
+            np.append(bins1.entries[:bins1.size], bins2.entries[:bins2.size]),
+            np.append(inverse[bins1.owners[:bins1.size]], bins2.owners[:bins2.size]))
+        self.sort_by_ascending_sum(new_bins)
+        return new_bins
+
+
+class BinnerKeepingAssignment(BinnerKeepingIndices):
+    """
+    A binner for very large inputs, whose output is an assignment vector: assignment[i] = the bin of item i.
+
+    The items must be non-negative integers, e.g. indices into a vector of values, as passed by the adaptors
+    (see `Binner.use_value_vector`). The items are stored directly in the flat int32 buffers of BinnerKeepingIndices,
+    without a table of items, so each item takes 8 bytes, and no Python object is created per item.
+
+    >>> binner = BinnerKeepingAssignment()
+    >>> binner.use_value_vector(np.array([3, 4, 5, 5]))
+    >>> bins = binner.new_bins(3)
+    >>> for item,ibin in [(0,2), (1,0), (2,0)]: _=binner.add_item_to_bin(bins, item, ibin)
+    >>> printbins(bins)
+    Bin #0: [1, 2], sum=9.0
+    Bin #1: [], sum=0.0
+    Bin #2: [0], sum=3.0
+    >>> binner.assignment(bins, numitems=4)
+    array([ 2,  0,  0, -1])
+    >>> binner.sort_by_ascending_sum(bins)
+    >>> binner.assignment(bins)
+    array([1, 2, 2])
+    """
+
+    def _index_of(self, item:Any)->int:
+        return item
+
+    def lists(self, bins: BinsArray) -> List[List]:
+        """
+        Return the contents of all bins, as a list of lists of items.
+        """
+        owners = bins.owners[:bins.size]
+        order = np.argsort(owners, kind="stable")
+        boundaries = np.cumsum(np.bincount(owners, minlength=len(bins.sums)))[:-1]
+        return [indices.tolist() for indices in np.split(bins.entries[:bins.size][order], boundaries)]
+
+    def assignment(self, bins: BinsArray, numitems:int=None) -> np.ndarray:
+        """
+        Return a vector that maps each item to the index of its bin, or to -1 if it is in no bin.
+        By default, numitems is the largest item in the bins plus 1.
+        """
+        entries = bins.entries[:bins.size]
+        if numitems is None:
+            numitems = int(entries.max())+1 if bins.size>0 else 0
+        result = np.full(numitems, -1, dtype=np.int64)
+        result[entries] = bins.owners[:bins.size]
+        return result
+
+
+class PersistentBinsArray(LazyBinsArray):
+    """
+    A bins-array of BinnerKeepingPersistentContents.
+
+    The contents of each bin are kept in an immutable node, which is one of:
+     * None - an empty bin;
+     * (count, item, rest) - the items of node `rest`, followed by `item`;
+     * (count, JOIN, first, second) - the items of node `first`, followed by the items of node `second`.
+    Nodes are never modified, so they can be shared by many bins-arrays.
+    """
+    __slots__ = ("heads",)
+
+    def __init__(self, binner, sums:np.ndarray, heads:List):
+        self.binner = binner
+        self.sums = sums
+        self.heads = heads
+
+
+JOIN = object()   # A marker for nodes that join the contents of two other nodes.
+
+
+class BinnerKeepingPersistentContents(BinnerKeepingContents):
+    """
+    A binner that keeps track of the entire contents of each bin, like BinnerKeepingContents,
+    but with persistent (structurally shared) contents:
+    a copy of a bins-array shares the contents of all bins with the original,
+    so copying costs O(numbins) and adding an item or combining two bins costs O(1),
+    regardless of the number of items.
+    This is useful in branch-and-bound search, where each child differs from its parent by a single item.
+    The lists of items are materialized only when the output is extracted.
+
+    >>> values = {"a":3, "b":4, "c":5, "d":5, "e":5}
+    >>> binner = BinnerKeepingPersistentContents(lambda x: values[x])
+    >>> bins = binner.new_bins(3)
+    >>> printbins(binner.add_item_to_bin(bins, item="a", bin_index=0))
+    Bin #0: ['a'], sum=3.0
+    Bin #1: [], sum=0.0
+    Bin #2: [], sum=0.0
+    >>> _=binner.add_item_to_bin(bins, item="b", bin_index=1)
+    >>> _=binner.add_item_to_bin(bins, item="c", bin_index=1)
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    Bin #2: [], sum=0.0
+
+    Adding to a clone should not change the original:
+    >>> printbins(binner.add_item_to_bin(binner.copy_bins(bins), item="d", bin_index=1))
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c', 'd'], sum=14.0
+    Bin #2: [], sum=0.0
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    Bin #2: [], sum=0.0
+    >>> binner.sort_by_ascending_sum(bins)
+    >>> printbins(bins)
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c'], sum=9.0
+    >>> binner.numitems(bins, 0), binner.numitems(bins, 1), binner.numitems(bins, 2)
+    (0, 1, 2)
+    >>> bins
+    (array([0., 3., 9.]), [[], ['a'], ['b', 'c']])
+
+    >>> printbins(binner.add_empty_bins(bins, 1))
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c'], sum=9.0
+    Bin #3: [], sum=0.0
+    >>> printbins(binner.remove_bins(bins, 1))
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+
+    >>> bins2 = binner.add_item_to_bin(binner.new_bins(3), item="e", bin_index=-1)
+    >>> binner.combine_bins(bins, 2, bins2, 2)
+    >>> printbins(bins)
+    Bin #0: [], sum=0.0
+    Bin #1: ['a'], sum=3.0
+    Bin #2: ['b', 'c', 'e'], sum=14.0
+    >>> binner.numitems(bins, 2)
+    3
+    """
+
+    def __init__(self, valueof: Callable = lambda x:x, dtype: type = float):
+        super().__init__(valueof, dtype)
+
+    BinsArray = PersistentBinsArray
+
+    def new_bins(self, numbins:int)->BinsArray:
+        return PersistentBinsArray(self, np.zeros(numbins, dtype=self.dtype), numbins*[None])
+
+    def copy_bins(self, bins: BinsArray)->BinsArray:
+        return PersistentBinsArray(self, np.array(bins.sums), list(bins.heads))
+
+    def concatenate_bins(self, bins1:BinsArray, bins2:BinsArray):
+        """
+        Concatenate the bins in bins1 with the bins in bins2.
+        NOTE: Returns a new BinsArray. bins1 and bins2 are not modified.
+        """
+        return PersistentBinsArray(self, np.append(bins1.sums, bins2.sums), bins1.heads + bins2.heads)
+
+    def remove_bins(self, bins: BinsArray, numbins:int)->BinsArray:
+        '''
+        Remove some bins from the end of the given BinsArray.
+        Returns a copy of "bins" with the removed bins.
+        NOTE: This does NOT change bins in-place; it returns a copy.
+        '''
+        new_numbins = len(bins.sums)-numbins
+        return PersistentBinsArray(self, bins.sums[0:new_numbins], bins.heads[0:new_numbins])
+
+    def add_item_to_bin(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        bins.sums[bin_index] += self.valueof(item)
+        head = bins.heads[bin_index]
+        bins.heads[bin_index] = (1 if head is None else head[0]+1, item, head)
+        return bins
+
+    def add_and_resort(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        """
+        >>> binner = BinnerKeepingPersistentContents()
+        >>> bins = binner.new_bins(3)
+        >>> for item in [1, 2, 3, 4]: _ = binner.add_and_resort(bins, item, 0)
+        >>> bins
+        (array([2., 3., 5.]), [[2], [3], [1, 4]])
+        """
+        sums, heads = bins.sums, bins.heads
+        bin_index, new_index, new_sum = _resorted_index(sums, bin_index, self.valueof(item))
+        head = heads[bin_index]
+        sums[bin_index:new_index] = sums[bin_index+1:new_index+1]
+        heads[bin_index:new_index] = heads[bin_index+1:new_index+1]
+        sums[new_index] = new_sum
+        heads[new_index] = (1 if head is None else head[0]+1, item, head)
+        return bins
+
+    def sums(self, bins: BinsArray) -> Tuple[float]:
+        return bins.sums
+
+    def lists(self, bins: BinsArray) -> List[List]:
+        """
+        Return the contents of all bins, as a list of lists of items.
+        """
+        return [_items_of_node(head) for head in bins.heads]
+
+    def numitems(self, bins: BinsArray, bin_index:int) -> int:
+        """
+        Return the number of items in the given bin.
+        """
+        head = bins.heads[bin_index]
+        return 0 if head is None else head[0]
+
+    def numbins(self, bins: BinsArray) -> int:
+        """
+        Return the number of bins in the given bins-array.
+        """
+        return len(bins.sums)
+
+    def sort_by_ascending_sum(self, bins: BinsArray):
+        sums, heads = bins.sums, bins.heads
+        sorted_indices = sorted(range(len(sums)), key=sums.__getitem__)
+        sums[:] = sums[sorted_indices]
+        heads[:] = map(heads.__getitem__, sorted_indices)
+
+    def combine_bins(self, bins1:BinsArray, ibin1:int, bins2:BinsArray, ibin2:int):
+        bins1.sums[ibin1] += bins2.sums[ibin2]
+        bins1.heads[ibin1] = _join_nodes(bins1.heads[ibin1], bins2.heads[ibin2])
+
+    def combine_by_permutation(self, bins1: BinsArray, bins2: BinsArray, perm: Tuple[int])->BinsArray:
+        new_heads = [_join_nodes(bins1.heads[ibin1], bins2.heads[i]) for i,ibin1 in enumerate(perm)]
+        new_bins = PersistentBinsArray(self, bins1.sums[list(perm)] + bins2.sums, new_heads)
+        self.sort_by_ascending_sum(new_bins)
+        return new_bins
+
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        return (bins.sums[bin_index], bins.heads[bin_index])
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        bins.sums[bin_index], bins.heads[bin_index] = state
+
+
+def _resorted_index(sums: np.ndarray, bin_index: int, value: float) -> Tuple[int, int, float]:
+    """
+    Given an array of sums in ascending order, and a value to add to sums[bin_index],
+    return the (non-negative) bin index, the index to which the bin should move so that the sums remain sorted, and its new sum.
+    The bin moves past all bins with a smaller sum (so it stays before bins with an equal sum, as in a stable sort).
+    """
+    if bin_index < 0:
+        bin_index += len(sums)
+    new_sum = sums[bin_index] + value
+    new_index = bisect.bisect_left(sums, new_sum, bin_index+1) - 1   # faster than np.searchsorted for short arrays
+    return bin_index, new_index, new_sum
+
+
+def _exact_integer_valueof(valueof: Callable) -> Callable:
+    """
+    Wrap the given valueof function such that it returns Python ints, whose arithmetic never overflows.
+    """
+    return lambda item: int(valueof(item))
+
+
+def _join_nodes(first, second):
+    """
+    Return a node with the items of `first` followed by the items of `second`.
+    """
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return (first[0]+second[0], JOIN, first, second)
+
+
+def _items_of_node(node)->List:
+    """
+    Return the items in the given node of a PersistentBinsArray, in the order they were added.
+    """
+    items = []    # collected in reverse order
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        while node is not None:
+            if node[1] is JOIN:
+                stack.append(node[2])
+                node = node[3]
+            else:
+                items.append(node[1])
+                node = node[2]
+    items.reverse()
+    return items
+
+
+class TrailBinner(Binner):
+    """
+    A binner for depth-first search algorithms, that keep a single mutable bins-array instead of a copy per search node.
+
+    It wraps another binner (that does the actual bookkeeping) and keeps a "trail" - an undo-log of the changes made to the bins.
+    push_item adds an item to a bin and records the previous state of the bin;
+    undo backtracks, by restoring the recorded states in reverse order.
+    So the memory of the search is proportional to its depth, rather than to the number of open nodes.
+
+    >>> values = {"a":3, "b":4, "c":5}
+    >>> binner = TrailBinner(BinnerKeepingContents(lambda x: values[x]))
+    >>> bins = binner.new_bins(2)
+    >>> binner.push_item(bins, "a", 0)
+    >>> checkpoint = binner.checkpoint()
+    >>> binner.push_item(bins, "b", 1)
+    >>> binner.push_item(bins, "c", 1)
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    >>> binner.undo()
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b'], sum=4.0
+    >>> binner.undo(checkpoint)
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: [], sum=0.0
+
+    Whole bins of another array can be pushed too:
+    >>> other = binner.new_bins(2)
+    >>> _ = binner.add_item_to_bin(other, "b", 0)
+    >>> _ = binner.add_item_to_bin(other, "c", 0)
+    >>> binner.push_bin(bins, 1, other, 0)
+    >>> printbins(bins)
+    Bin #0: ['a'], sum=3.0
+    Bin #1: ['b', 'c'], sum=9.0
+    >>> binner.undo(0)
+    >>> printbins(bins)
+    Bin #0: [], sum=0.0
+    Bin #1: [], sum=0.0
+    """
+
+    def __init__(self, binner: Binner):
+        super().__init__(binner.valueof)
+        self.values = binner.values
+        self.binner = binner
+        self.trail = []   # a list of (bins, bin_index, previous state of the bin)
+
+    def push_item(self, bins: BinsArray, item: Any, bin_index: int):
+        """
+        Add the given item to the given bin, such that the addition can be undone.
+        """
+        self.trail.append((bins, bin_index, self.binner.bin_state(bins, bin_index)))
+        self.binner.add_item_to_bin(bins, item, bin_index)
+
+    def push_bin(self, bins: BinsArray, bin_index: int, other_bins: BinsArray, other_index: int):
+        """
+        Add the contents of bin other_index in other_bins to the given bin, such that the addition can be undone.
+        """
+        self.trail.append((bins, bin_index, self.binner.bin_state(bins, bin_index)))
+        self.binner.combine_bins(bins, bin_index, other_bins, other_index)
+
+    def checkpoint(self) -> int:
+        """
+        Return a marker of the current position in the trail, to be used later in undo.
+        """
+        return len(self.trail)
+
+    def undo(self, checkpoint:int=None):
+        """
+        Undo all the pushes made after the given checkpoint (by default - only the last push).
+        """
+        if checkpoint is None:
+            checkpoint = len(self.trail)-1
+        trail = self.trail
+        while len(trail) > checkpoint:
+            bins, bin_index, state = trail.pop()
+            self.binner.restore_bin(bins, bin_index, state)
+
+    def new_bins(self, numbins:int)->BinsArray:
+        return self.binner.new_bins(numbins)
+
+    def copy_bins(self, bins:BinsArray)->BinsArray:
+        return self.binner.copy_bins(bins)
+
+    def concatenate_bins(self, bins1:BinsArray, bins2:BinsArray):
+        return self.binner.concatenate_bins(bins1, bins2)
+
+    def remove_bins(self, bins: BinsArray, numbins:int)->BinsArray:
+        return self.binner.remove_bins(bins, numbins)
+
+    def add_item_to_bin(self, bins:BinsArray, item: Any, bin_index: int)->BinsArray:
+        return self.binner.add_item_to_bin(bins, item, bin_index)
+
+    def sort_by_ascending_sum(self, bins:BinsArray):
+        return self.binner.sort_by_ascending_sum(bins)
+
+    def numitems(self, bins: BinsArray, bin_index:int) -> int:
+        return self.binner.numitems(bins, bin_index)
+
+    def numbins(self, bins: BinsArray) -> int:
+        return self.binner.numbins(bins)
+
+    def sums(self, bins: BinsArray) -> Tuple[float]:
+        return self.binner.sums(bins)
+
+    def combine_bins(self, bins1:BinsArray, ibin1:int, bins2:BinsArray, ibin2:int):
+        return self.binner.combine_bins(bins1, ibin1, bins2, ibin2)
+
+    def combination_sums(self, bins1: BinsArray, bins2: BinsArray)->Iterator[Tuple[Tuple[int], List[float]]]:
+        return self.binner.combination_sums(bins1, bins2)
+
+    def combine_by_permutation(self, bins1: BinsArray, bins2: BinsArray, perm: Tuple[int])->BinsArray:
+        return self.binner.combine_by_permutation(bins1, bins2, perm)
+
     def all_combinations(self, bins1: BinsArray, bins2: BinsArray)->Iterator[BinsArray]:
+        return self.binner.all_combinations(bins1, bins2)
+
+    def bin_state(self, bins: BinsArray, bin_index:int)->Any:
+        return self.binner.bin_state(bins, bin_index)
+
+    def restore_bin(self, bins: BinsArray, bin_index:int, state:Any):
+        return self.binner.restore_bin(bins, bin_index, state)
+
+
+
+class BatchBinner:
+    """
+    A manager of *batches* of bins-arrays, for algorithms that handle many states at once,
+    e.g. an entire layer of a breadth-first search.
+
+    A batch is a 2-D numpy array with a row per state and a column per bin: batch[s,i] is the sum of bin i in state s.
+    The rows are kept sorted by ascending sum, so that states that differ only in the order of the bins are identical rows.
+    A batch keeps only the sums. An algorithm that needs the contents can keep the parent row and bin of each row
+    (returned by `add_item_to_each_bin`), and rebuild the contents of a single state with the given binner.
+
+    >>> batcher = BatchBinner(BinnerKeepingSums(dtype=int))
+    >>> batch = batcher.new_batch(numbins=3)
+    >>> batch, parents, bins = batcher.add_item_to_each_bin(batch, 5)
+    >>> batch
+    array([[0, 0, 5]])
+    >>> batch, parents, bins = batcher.add_item_to_each_bin(batch, 4)
+    >>> batch
+    array([[0, 4, 5],
+           [0, 0, 9]])
+    >>> parents, bins
+    (array([0, 0]), array([0, 2]))
+    >>> batch, parents, bins = batcher.add_item_to_each_bin(batch, 4)
+    >>> batch
+    array([[ 4,  4,  5],
+           [ 0,  5,  8],
+           [ 0,  4,  9],
+           [ 0,  4,  9],
+           [ 0,  0, 13]])
+    >>> batcher.unique(batch)
+    (array([[ 0,  0, 13],
+           [ 0,  4,  9],
+           [ 0,  5,  8],
+           [ 4,  4,  5]]), array([4, 2, 1, 0]))
+    """
+
+    def __init__(self, binner: Binner):
+        self.binner = binner
+        self.valueof = binner.valueof
+        self.dtype = binner.dtype
+
+    def new_batch(self, numbins:int)->np.ndarray:
         """
-        >>> binner = BinnerKeepingContents()
-        >>> b1 = ([1, 20, 300],  [[1], [20], [300]])
-        >>> b2 = ([4, 50, 600],  [[1, 3], [4, 46], [600]])
-        >>> for perm in binner.all_combinations(b1,b2): perm[1]
-        [[1, 1, 3], [4, 20, 46], [300, 600]]
-        [[1, 1, 3], [4, 46, 300], [20, 600]]
-        [[1, 3, 20], [1, 4, 46], [300, 600]]
-        [[1, 3, 20], [4, 46, 300], [1, 600]]
-        [[1, 4, 46], [1, 3, 300], [20, 600]]
-        [[4, 20, 46], [1, 3, 300], [1, 600]]
+        Create a new batch with a single state, in which all bins are empty.
         """
-        yielded = set() # to avoid duplicates
-        sums1, lists1 = bins1
-        sums2, lists2 = bins2
-        numbins = len(sums1)
-        if len(sums2)!=numbins:
-            raise ValueError(f"Inputs should have the same number of bins, but they have {numbins} and {len(sums2)} bins.")
-        for perm in itertools.permutations(range(numbins)):
-            new_sums =  [sums1[perm[i]] + sums2[i] for i in range(numbins)]
-            new_lists = [sorted(lists1[perm[i]] + lists2[i]) for i in range(numbins)]  # sorting to avoid duplicates
-            new_bins = (new_sums, new_lists)
-            self.sort_by_ascending_sum(new_bins)
-            new_lists_tuple = tuple(map(tuple,new_bins[1]))
-            if new_lists_tuple not in yielded:
-                yielded.add(new_lists_tuple)
-                yield new_bins
+        return np.zeros((1, numbins), dtype=self.dtype)
+
+    def add_item_to_each_bin(self, batch: np.ndarray, item: Any)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return a new batch, with the states obtained by adding the given item to each bin of each state in the given batch,
+        sorted by ascending sum; adding the item to a bin whose sum equals the sum of the previous bin gives the same state,
+        so it is skipped.
+        Also return, for each new row, the index of its parent row and the index of the bin (in the parent row) that got the item.
+        """
+        numstates, numbins = batch.shape
+        value = self.valueof(item)
+        is_new = np.ones((numstates, numbins), dtype=bool)
+        is_new[:, 1:] = batch[:, 1:] != batch[:, :-1]
+        parents, bins = np.nonzero(is_new)
+        new_batch = batch[parents]
+        new_batch[np.arange(len(parents)), bins] += value
+        new_batch.sort(axis=1)
+        return new_batch, parents, bins
+
+    def add_copies_to_each_bin(self, batch: np.ndarray, item: Any, compositions: np.ndarray)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return a new batch, with the states obtained by adding copies of the given item to each state in the given batch,
+        where compositions[c,i] is the number of copies added to bin i by composition c. The new rows are sorted by ascending sum.
+        As in `add_item_to_each_bin`, bins with equal sums are interchangeable, so a composition that gives such bins
+        a decreasing number of copies gives the same state as another composition, and it is skipped.
+        Also return, for each new row, the index of its parent row and the index of its composition.
+
+        >>> batcher = BatchBinner(BinnerKeepingSums(dtype=int))
+        >>> batch, parents, compositions = batcher.add_copies_to_each_bin(batcher.new_batch(numbins=2), 5, np.array([[0,2], [1,1], [2,0]]))
+        >>> batch
+        array([[ 0, 10],
+               [ 5,  5]])
+        >>> batch, parents, compositions = batcher.add_copies_to_each_bin(batch, 3, np.array([[0,1], [1,0]]))
+        >>> batch
+        array([[ 0, 13],
+               [ 5,  8],
+               [ 3, 10]])
+        >>> parents, compositions
+        (array([0, 1, 0]), array([0, 0, 1]))
+        """
+        value = self.valueof(item)
+        increments = compositions.astype(batch.dtype) * value
+        has_equal_previous_bin = batch[:, 1:] == batch[:, :-1]
+        parents = []
+        for composition in compositions:
+            has_fewer_copies_than_previous_bin = np.flatnonzero(composition[1:] < composition[:-1])
+            parents.append(np.flatnonzero(~has_equal_previous_bin[:, has_fewer_copies_than_previous_bin].any(axis=1)))
+        numrows = [len(rows) for rows in parents]
+        composition_indices = np.repeat(np.arange(len(compositions)), numrows)
+        parents = np.concatenate(parents)
+        new_batch = batch[parents]
+        ends = np.cumsum(numrows)
+        for composition_index, end in enumerate(ends):
+            new_batch[end-numrows[composition_index]:end] += increments[composition_index]
+        new_batch.sort(axis=1)
+        return new_batch, parents, composition_indices
+
+    def unique(self, batch: np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the distinct rows of the given batch, and the index of the first occurrence of each of them.
+        """
+        if batch.dtype == object:   # np.unique does not support rows of Python ints.
+            first_index_of_row = {}
+            for index,row in enumerate(map(tuple, batch)):
+                first_index_of_row.setdefault(row, index)
+            indices = np.fromiter(first_index_of_row.values(), dtype=np.intp, count=len(first_index_of_row))
+            return batch[indices], indices
+        keys = self._packed_rows(batch)
+        if keys is None:
+            unique_batch, indices = np.unique(batch, axis=0, return_index=True)
+            return unique_batch, indices
+        _, indices = np.unique(keys, return_index=True)
+        return batch[indices], indices
+
+    @staticmethod
+    def path_to_row(layers: List[Tuple[np.ndarray, np.ndarray]], row: int) -> List[int]:
+        """
+        Given the parents and bins of each layer (as returned by `add_item_to_each_bin` and filtered by the algorithm),
+        follow the parents from the given row of the last layer back to the root, and return the bin chosen at each depth.
+
+        >>> layers = [(np.array([0]), np.array([2])), (np.array([0, 0]), np.array([0, 2]))]
+        >>> BatchBinner.path_to_row(layers, 1)
+        [2, 2]
+        """
+        path = [None]*len(layers)
+        for depth in reversed(range(len(layers))):
+            parents, bins = layers[depth]
+            path[depth] = int(bins[row])
+            row = parents[row]
+        return path
+
+    def _packed_rows(self, batch: np.ndarray)->np.ndarray:
+        """
+        If the batch has non-negative integers, and each row fits in 63 bits, return a vector with a single int64 key per row,
+        whose order is the lexicographic order of the rows. Sorting these keys is much faster than sorting the rows.
+        Otherwise, return None.
+        """
+        numstates, numbins = batch.shape
+        if batch.dtype.kind not in "iu" or numstates == 0:
+            return None
+        bits_per_bin = max(int(batch.max()).bit_length(), 1)
+        if bits_per_bin*numbins > 63 or batch.min() < 0:
+            return None
+        keys = np.zeros(numstates, dtype=np.int64)
+        for ibin in range(numbins):
+            keys <<= bits_per_bin
+            keys |= batch[:, ibin].astype(np.int64, copy=False)
+        return keys
 
 
 if __name__ == "__main__":
@@ -11,13 +11,15 @@ subsets that exclude the first number
 """
 
 from typing import List, Generator, Callable
+import itertools
 
 
 class Node:
-    def __init__(self,depth, cur_set, remaining_numbers):
+    # The remaining numbers of a node are the items from index `depth` onwards.
+    def __init__(self,depth, cur_set, cur_sum):
         self.depth = depth
         self.cur_set = cur_set
-        self.remaining_numbers = remaining_numbers
+        self.cur_sum = cur_sum
         self.left = None
         self.right = None
 
@@ -26,8 +28,11 @@ class InExclusionBinTree:
 
     def __init__(self, items: List, valueof: Callable, upper_bound, lower_bound):
         self.items = sorted(items, key=valueof, reverse=True)
+        # The values are computed once; sums_of_remaining[d] is the sum of the values of the items from index d onwards.
+        self.values = [valueof(item) for item in self.items]
+        self.sums_of_remaining = list(itertools.accumulate(reversed(self.values), initial=0))[::-1]
         self.leaf_depth = len(items)
-        self.root = Node(0, [], self.items)  # root
+        self.root = Node(0, [], 0)  # root
         self.valueof = valueof
         self.upper_bound = upper_bound
         self.lower_bound = lower_bound
@@ -35,14 +40,14 @@ class InExclusionBinTree:
     # inclusion
     def add_right(self, parent: Node):
         parent.right = Node(depth=parent.depth+1,
-                            cur_set=parent.cur_set + [parent.remaining_numbers[0]],
-                            remaining_numbers=parent.remaining_numbers[1:])
+                            cur_set=parent.cur_set + [self.items[parent.depth]],
+                            cur_sum=parent.cur_sum + self.values[parent.depth])
 
     # exclusion
     def add_left(self, parent: Node):
         parent.left = Node(depth=parent.depth+1,
                            cur_set=parent.cur_set,
-                           remaining_numbers=parent.remaining_numbers[1:])
+                           cur_sum=parent.cur_sum)
 
     def generate_tree(self) -> Generator:
         """
@@ -79,8 +84,8 @@ class InExclusionBinTree:
 
     def rec_generate_tree(self, current_node: Node) -> Generator:
         # prune
-        if sum(map(self.valueof,current_node.cur_set)) > self.upper_bound or \
-                sum(map(self.valueof,current_node.cur_set + current_node.remaining_numbers)) < self.lower_bound:
+        if current_node.cur_sum > self.upper_bound or \
+                current_node.cur_sum + self.sums_of_remaining[current_node.depth] < self.lower_bound:
             return
         # generate
         if current_node.depth == self.leaf_depth:
@@ -37,6 +37,18 @@ class Objective(ABC):
         """
         return -np.inf     # this means that there is essentially no lower bound (no branch will be pruned).
 
+    def values_to_minimize(self, batch:np.ndarray)->np.ndarray:
+        """
+        Returns the value to minimize of each state in a batch: a 2-D array whose rows are bin sums in ascending order (see binners.BatchBinner).
+        """
+        return np.array([self.value_to_minimize(sums) for sums in batch.tolist()])
+
+    def lower_bounds(self, batch:np.ndarray, sum_of_remaining_items:float)->np.ndarray:
+        """
+        Returns the lower bound of each state in a batch: a 2-D array whose rows are bin sums in ascending order (see binners.BatchBinner).
+        """
+        return np.array([self.lower_bound(sums, sum_of_remaining_items, are_sums_in_ascending_order=True) for sums in batch.tolist()])
+
 
 class MaximizeTheSmallestSum(Objective):
     def value_to_minimize(self, sums:list, are_sums_in_ascending_order:bool=False)->float:
@@ -68,6 +80,25 @@ class MaximizeTheSmallestSum(Objective):
                 return -np.floor(sum_of_remaining_items/i)
             sum_of_remaining_items += sorted_sums[i]
         return -np.floor(sum_of_remaining_items/len(sorted_sums))
+
+    def values_to_minimize(self, batch:np.ndarray)->np.ndarray:
+        return -batch[:,0]
+
+    def lower_bounds(self, batch:np.ndarray, sum_of_remaining_items:float)->np.ndarray:
+        """
+        A vectorized version of lower_bound: in each row, the loop stops at the first i in which sum_of_remaining_items plus the i smallest sums is at most i*sums[i].
+
+        >>> batch = np.array([[0,0,0], [10,20,30], [0,0,50], [5,40,40]])
+        >>> MaximizeSmallestSum.lower_bounds(batch, 45)
+        array([-15, -35, -22, -43])
+        >>> [MaximizeSmallestSum.lower_bound(sums, 45, are_sums_in_ascending_order=True) for sums in batch]
+        [-15.0, -35.0, -22.0, -43.0]
+        """
+        numstates, numbins = batch.shape
+        prefix_sums = np.cumsum(batch, axis=1)
+        is_stop = sum_of_remaining_items + prefix_sums[:,:-1] <= np.arange(1,numbins) * batch[:,1:]
+        stop = np.where(is_stop.any(axis=1), is_stop.argmax(axis=1)+1, numbins)
+        return -((sum_of_remaining_items + prefix_sums[np.arange(numstates), stop-1]) // stop)
 MaximizeSmallestSum = MaximizeTheSmallestSum()
 
 
@@ -117,6 +148,16 @@ class MinimizeTheLargestSum(Objective):
         """
         current_largest_sum = sums[-1] if are_sums_in_ascending_order else max(sums)
         return max(current_largest_sum, np.ceil((sum(sums)+sum_of_remaining_items)/len(sums)))
+
+    def values_to_minimize(self, batch:np.ndarray)->np.ndarray:
+        return batch[:,-1]
+
+    def lower_bounds(self, batch:np.ndarray, sum_of_remaining_items:float)->np.ndarray:
+        """
+        >>> MinimizeLargestSum.lower_bounds(np.array([[0,0,0], [10,20,30], [0,0,50]]), 100)
+        array([34, 54, 50])
+        """
+        return np.maximum(batch[:,-1], -((-batch.sum(axis=1)-sum_of_remaining_items) // batch.shape[1]))
     
 
 MinimizeLargestSum = MinimizeTheLargestSum()
@@ -152,6 +193,12 @@ class MinimizeTheDifference(Objective):
         """
         return MaximizeSmallestSum.lower_bound(sums, sum_of_remaining_items, are_sums_in_ascending_order) \
              + MinimizeLargestSum.lower_bound(sums, sum_of_remaining_items, are_sums_in_ascending_order)
+
+    def values_to_minimize(self, batch:np.ndarray)->np.ndarray:
+        return batch[:,-1] - batch[:,0]
+
+    def lower_bounds(self, batch:np.ndarray, sum_of_remaining_items:float)->np.ndarray:
+        return MaximizeSmallestSum.lower_bounds(batch, sum_of_remaining_items) + MinimizeLargestSum.lower_bounds(batch, sum_of_remaining_items)
 MinimizeDifference = MinimizeTheDifference()
 
 
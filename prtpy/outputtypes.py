@@ -4,20 +4,23 @@ Define the various available output formats for a partition algorithm.
 
 from abc import ABC
 from typing import Any, List, Callable
-from prtpy.binners import Binner, BinnerKeepingContents, BinnerKeepingSums, BinsArray
+import numpy as np
+from prtpy.binners import Binner, BinnerKeepingContents, BinnerKeepingSums, BinnerKeepingAssignment, BinsArray
 
 class OutputType(ABC):
     @classmethod
-    def create_binner(cls, valueof: Callable) -> Binner:
+    def create_binner(cls, valueof: Callable, dtype: type = float) -> Binner:
         """
         Construct and return a Bins structure. Used at the initialization phase of an algorithm.
+        dtype is the type of the bin sums (see `binners.exact_dtype`).
         """
         raise NotImplementedError("Choose a specific output type")
 
     @classmethod
-    def extract_output_from_binsarray(cls, bins: BinsArray) -> List:
+    def extract_output_from_binsarray(cls, bins: BinsArray, item_names: List = None) -> List:
         """
         Return the required output from the given bins-array.
+        If item_names is given, the items in the bins-array are indices into item_names.
         """
         raise NotImplementedError("Choose a specific output type")
 
@@ -30,15 +33,15 @@ class OutputType(ABC):
 class Sums(OutputType):
     """ Output the list of sums of all bins (but not the bins' contents).  """
     @classmethod
-    def create_binner(cls, valueof: Callable) -> List:
-        return BinnerKeepingSums(valueof)
+    def create_binner(cls, valueof: Callable, dtype: type = float) -> List:
+        return BinnerKeepingSums(valueof, dtype)
 
     @classmethod
     def extract_output_from_sums(cls, sums: List[float]) -> List:
         return list(sums)
 
     @classmethod
-    def extract_output_from_binsarray(cls, bins: BinsArray) -> List:
+    def extract_output_from_binsarray(cls, bins: BinsArray, item_names: List = None) -> List:
         try:
             bins[0][0]           # If it succeeds, it means that bins is a tuple (sums,lists).
             sums = bins[0]
@@ -94,16 +97,19 @@ class Partition(OutputType):
     """ Output the set of all bins. """
 
     @classmethod
-    def create_binner(cls, valueof: Callable) -> List:
-        return BinnerKeepingContents(valueof)
+    def create_binner(cls, valueof: Callable, dtype: type = float) -> List:
+        return BinnerKeepingContents(valueof, dtype)
 
     @classmethod
     def extract_output_from_sums_and_lists(cls, sums: List[float], lists: List[List[Any]]) -> List:
         return lists
 
     @classmethod
-    def extract_output_from_binsarray(cls, bins: BinsArray) -> List:
-        return cls.extract_output_from_sums_and_lists(bins[0], bins[1])
+    def extract_output_from_binsarray(cls, bins: BinsArray, item_names: List = None) -> List:
+        sums, lists = bins[0], bins[1]
+        if item_names is not None:
+            lists = [[item_names[index] for index in lst] for lst in lists]
+        return cls.extract_output_from_sums_and_lists(sums, lists)
 
 
 class PartitionAndSumsTuple(Partition):
@@ -133,3 +139,46 @@ class PartitionAndSums(Partition):
     def extract_output_from_sums_and_lists(cls, sums: List[float], lists: List[List[Any]]) -> List:
         return PartitionAndSums.Struct(sums,lists)
 
+
+
+#
+# Outputs based on an assignment vector, for very large partitions.
+#
+
+class Assignment(OutputType):
+    """
+    Output a numpy vector that maps each item to its bin: assignment[i] is the index of the bin of the i-th item.
+    Uses 8 bytes per item, and creates no list per bin.
+    """
+
+    @classmethod
+    def create_binner(cls, valueof: Callable, dtype: type = float) -> List:
+        return BinnerKeepingAssignment(valueof, dtype)
+
+    @classmethod
+    def extract_output_from_sums_and_assignment(cls, sums: List[float], assignment: np.ndarray) -> List:
+        return assignment
+
+    @classmethod
+    def extract_output_from_binsarray(cls, bins: BinsArray, item_names: List = None) -> List:
+        numitems = None if item_names is None else len(item_names)
+        try:
+            assignment = bins.binner.assignment(bins, numitems)
+        except AttributeError:   # Some algorithms use their own binner, which keeps the contents in lists.
+            sums, lists = bins[0], bins[1]
+            if numitems is None:
+                numitems = max((max(lst) for lst in lists if len(lst)>0), default=-1) + 1
+            assignment = np.full(numitems, -1, dtype=np.int64)
+            for ibin,lst in enumerate(lists):
+                assignment[list(lst)] = ibin
+        return cls.extract_output_from_sums_and_assignment(bins[0], assignment)
+
+
+class AssignmentAndSums(Assignment):
+    """ 
+    Output a pair (tuple) with two vectors: (sums, assignment). 
+    sums is a vector of bin sums; assignment maps each item to the index of its bin.
+    """
+    @classmethod
+    def extract_output_from_sums_and_assignment(cls, sums: List[float], assignment: np.ndarray) -> List:
+        return (sums, assignment)
@@ -12,7 +12,7 @@ Since: 2022-07
 import numpy as np
 
 from prtpy import outputtypes as out
-from prtpy.binners import Binner
+from prtpy.binners import Binner, value_vector
 from typing import Callable, List, Any
 from prtpy.packing.first_fit import decreasing as ffd
 
@@ -54,7 +54,7 @@ def pack(
     >>> pack(algorithm=ffd, binsize=60, items={"a":44, "b":24, "c":24, "d":22, "e":21, "f":17, "g":8, "h":8, "i":6, "j":6})
     [['a', 'g', 'h'], ['b', 'c', 'i', 'j'], ['d', 'e', 'f']]
     >>> pack(algorithm=ffd, binsize=60, items=np.array([44, 24, 24, 22, 21, 17, 8, 8, 6, 6]), outputtype=out.Sums)
-    [60.0, 60.0, 60.0]
+    [60, 60, 60]
     >>> pack(algorithm=ffd, binsize=60, items=[44, 24, 24, 22, 21, 17, 8, 8, 6, 6], outputtype=out.BinCount)
     3
     >>> pack(algorithm=ffd, binsize=61, items=[44, 24, 24, 22, 21, 17, 8, 8, 6, 6], outputtype=out.BinCount)
@@ -68,9 +68,13 @@ def pack(
         item_names = items
         if valueof is None:
             valueof = lambda item: item
-    binner = outputtype.create_binner(valueof)
-    bins = algorithm(binner, binsize, item_names, **kwargs)
-    return outputtype.extract_output_from_binsarray(bins)
+    # Compute the values once; the algorithm gets the item indices, and the item names are restored in the output.
+    item_names = list(item_names)
+    values = value_vector(item_names, valueof)   # integer values get exact integer sums
+    binner = outputtype.create_binner(valueof, values.dtype)
+    binner.use_value_vector(values)
+    bins = algorithm(binner, binsize, range(len(item_names)), **kwargs)
+    return outputtype.extract_output_from_binsarray(bins, item_names)
 
 def pack_random_items(numitems: int, bitsperitem: int, **kwargs):
     """
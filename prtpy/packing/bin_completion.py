@@ -9,8 +9,7 @@
 from typing import Any
 from prtpy.packing import best_fit
 from prtpy.packing.bin_completion_utils import *
-import copy
-from prtpy import Binner, BinnerKeepingContents, BinsArray
+from prtpy import Binner, BinsArray
 
 def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
     """
@@ -69,6 +68,11 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
     Bin #2: [94, 5], sum=99.0
     Bin #3: [93, 4], sum=97.0
     Bin #4: [8], sum=8.0
+
+    Items with names:
+    >>> from prtpy import pack
+    >>> pack(algorithm=bin_completion, binsize=100, items={"a":6, "b":12, "c":15, "d":40, "e":43, "f":82})
+    [['f', 'b', 'a'], ['e', 'd', 'c']]
     """
     # Test if there is an item with a value larger than binsize.
     for item in items:
@@ -79,7 +83,7 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
     items = [item for item in items if binner.valueof(item)!=0]
 
     # Find the BFD solution and check if it's optimal using the lower bound calculation.
-    bfd_solution = best_fit.decreasing(BinnerKeepingContents(binner.valueof), binsize, items)
+    bfd_solution = best_fit.decreasing(binner, binsize, items)
     lb = lower_bound(binsize, map(binner.valueof, items))
 
     # If the BFD solution is optimal - return it.
@@ -110,7 +114,11 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
             # Now we consider all items except for x.
             # We generate all possible completions for the bin containing x, sorted by their sum in descending order.
             updated_list = cb.items[1:]
-            possible_undominated_completions = find_bin_completions(x, updated_list, binsize)
+            # The completions are computed on the values, and then translated back to items.
+            possible_undominated_completions = [
+                items_with_values(updated_list, completion, binner.valueof)
+                for completion in find_bin_completions(binner.valueof(x), list(map(binner.valueof, updated_list)), binsize)
+            ]
 
             # If we found only 1 possible completion - we add it to the bin and remove it from the updated item list.
             if len(possible_undominated_completions) == 1:
@@ -125,7 +133,7 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
                 # Then we add that copies to a new branches.
                 for completion in possible_undominated_completions[1:]:
                     new_items = list_without_items(updated_list, completion)
-                    new_bins = copy.deepcopy(cb.bins)
+                    new_bins = binner.copy_bins(cb.bins)
 
                     # list(map(partial(new_bins.add_item_to_bin, bin_index=new_bins.bin_index), completion))
                     for item in completion:
@@ -133,7 +141,7 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
 
                     # We can calculate the partial lower bound in O(1) and pass on the branch if we are working on
                     # a solution that is worse than our best solution so far.
-                    partial_lower_bound = binner.numbins(new_bins) + (sum(new_items) / binsize)
+                    partial_lower_bound = binner.numbins(new_bins) + (sum(map(binner.valueof, new_items)) / binsize)
                     best_numbins_so_far = binner.numbins(best_solution_so_far)
                     if partial_lower_bound >= best_numbins_so_far:
                         logging.info(
@@ -155,7 +163,7 @@ def bin_completion(binner: Binner, binsize: float, items: List[Any])->BinsArray:
 
             # We can calculate the partial lower bound in O(1) and prune the branch if we are working on a solution that
             # is worse than our best solution so far.
-            partial_lower_bound = binner.numbins(cb.bins) + (sum(updated_list) / binsize)
+            partial_lower_bound = binner.numbins(cb.bins) + (sum(map(binner.valueof, updated_list)) / binsize)
             best_numbins_so_far = binner.numbins(best_solution_so_far)
             if partial_lower_bound >= best_numbins_so_far:
                 logging.info(
@@ -7,7 +7,7 @@ Since: 05-2022
 """
 import math
 from itertools import combinations, product
-from typing import List, Iterable
+from typing import List, Iterable, Callable
 import logging
 from prtpy.binners import BinsArray
 
@@ -31,6 +31,23 @@ def list_without_items(original: List, to_remove: Iterable) -> List:
     return output
 
 
+# Returns a list of items from 'items', whose values are the given 'values' (each item is used at most once).
+def items_with_values(items: List, values: Iterable, valueof: Callable) -> List:
+    """
+    >>> items_with_values(["a", "b", "c", "d"], [3, 1], {"a":1, "b":3, "c":1, "d":3}.__getitem__)
+    ['b', 'a']
+    >>> items_with_values([10, 11, 12], [5, 5], lambda i: 5)
+    [10, 11]
+    """
+    unused_items = list(items)
+    output = []
+    for value in values:
+        item = next(item for item in unused_items if valueof(item) == value)
+        unused_items.remove(item)
+        output.append(item)
+    return output
+
+
 # Returns a new list which is a copy of 'lst' but without duplicate items.
 def unique_list(lst: List) -> List:
     output = []
@@ -90,7 +90,7 @@ def decreasing(binner: Binner, binsize: float, items: List[any])->BinsArray:
     >>> pack(algorithm=decreasing, binsize=60, items={"a":44, "b":24, "c":24, "d":22, "e":21, "f":17, "g":8, "h":8, "i":6, "j":6})
     [['a', 'g', 'h'], ['b', 'c', 'i', 'j'], ['d', 'e', 'f']]
     >>> pack(algorithm=decreasing, binsize=60, items={"a":44, "b":24, "c":24, "d":22, "e":21, "f":17, "g":8, "h":8, "i":6, "j":6}, outputtype=out.Sums)
-    [60.0, 60.0, 60.0]
+    [60, 60, 60]
     """
     sorted_items = sorted(items, key=binner.valueof, reverse=True)
     return online(binner, binsize, sorted_items)
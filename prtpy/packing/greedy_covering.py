@@ -46,7 +46,7 @@ def decreasing(binner: Binner, binsize: float, items: List[Any])->BinsArray:
     >>> pack(algorithm=decreasing, binsize=60, items={"a":44, "b":24, "c":24, "d":22, "e":21, "f":17, "g":8, "h":8, "i":6, "j":6})
     [['a', 'b'], ['c', 'd', 'e']]
     >>> pack(algorithm=decreasing, binsize=60, items={"a":44, "b":24, "c":24, "d":22, "e":21, "f":17, "g":8, "h":8, "i":6, "j":6}, outputtype=out.Sums)
-    [68.0, 67.0]
+    [68, 67]
     """
     bins = binner.new_bins(1)
     sorted_items = sorted(items, key=binner.valueof, reverse=True)
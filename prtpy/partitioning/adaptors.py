@@ -14,7 +14,7 @@ import numpy as np
 
 import prtpy
 from prtpy import outputtypes as out, objectives as obj
-from prtpy.binners import Binner
+from prtpy.binners import Binner, value_vector
 from typing import Callable, List, Any
 
 def partition(
@@ -52,22 +52,32 @@ def partition(
     >>> prt = prtpy.partitioning
     >>> import numpy as np
     >>> partition(algorithm=prt.dp, numbins=2, items=[1,2,3,3,5,9,9])
-    [[2, 5, 9], [1, 3, 3, 9]]
+    [[1, 3, 3, 9], [2, 5, 9]]
     >>> partition(algorithm=prt.dp, numbins=3, items=[1,2,3,3,5,9,9])
-    [[2, 9], [1, 9], [3, 3, 5]]
+    [[9, 2], [9, 1], [5, 3, 3]]
     >>> partition(algorithm=prt.dp, numbins=2, items=np.array([1,2,3,3,5,9,9]), outputtype=out.Sums)
-    [16.0, 16.0]
+    [16, 16]
     >>> int(partition(algorithm=prt.dp, numbins=3, items=[1,2,3,3,5,9,9], outputtype=out.LargestSum))
     11
     >>> partition(algorithm=prt.dp, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
-    [['b', 'e', 'f'], ['a', 'c', 'd', 'g']]
+    [['a', 'c', 'd', 'f'], ['b', 'e', 'g']]
     >>> partition(algorithm=prt.dp, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
-    [['b', 'g'], ['a', 'f'], ['c', 'd', 'e']]
+    [['f', 'b'], ['g', 'a'], ['e', 'c', 'd']]
+
+    Integer values are summed exactly, even when the sums do not fit in 64 bits:
+    >>> partition(algorithm=prt.greedy, numbins=2, items=[2**62, 2**62, 1], outputtype=out.Sums)
+    [4611686018427387905, 4611686018427387904]
+
+    For very large inputs, the output can be a vector that maps each item (by its position) to its bin:
+    >>> partition(algorithm=prt.greedy, numbins=2, items=[1,2,3,3,5,9,9], outputtype=out.Assignment)
+    array([1, 0, 1, 1, 0, 0, 1])
+    >>> partition(algorithm=prt.greedy, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.AssignmentAndSums)
+    (array([16, 16]), array([1, 0, 1, 1, 0, 0, 1]))
 
     >>> traversc_example = [18, 12, 22, 22]
     >>> print(prtpy.partition(algorithm=prt.integer_programming, numbins=2, items=traversc_example, outputtype=out.PartitionAndSums))
-    Bin #0: [12, 22], sum=34.0
-    Bin #1: [18, 22], sum=40.0
+    Bin #0: [12, 22], sum=34
+    Bin #1: [18, 22], sum=40
     """
     if isinstance(items, dict):  # items is a dict mapping an item to its value.
         item_names = items.keys()
@@ -77,9 +87,13 @@ def partition(
         item_names = items
         if valueof is None:
             valueof = lambda item: item
-    binner = outputtype.create_binner(valueof)
-    bins   = algorithm(binner, numbins, item_names, **kwargs)
-    return outputtype.extract_output_from_binsarray(bins)
+    # Compute the values once; the algorithm gets the item indices, and the item names are restored in the output.
+    item_names = list(item_names)
+    values = value_vector(item_names, valueof)   # integer values get exact integer sums
+    binner = outputtype.create_binner(valueof, values.dtype)
+    binner.use_value_vector(values)
+    bins   = algorithm(binner, numbins, range(len(item_names)), **kwargs)
+    return outputtype.extract_output_from_binsarray(bins, item_names)
 
 
 def partition_random_items(numitems: int, bitsperitem: int, **kwargs):
@@ -118,15 +132,15 @@ def compare_algorithms(
     True
     >>> compare_algorithms(2, [4,5,6,7,8], out.Difference, algorithm1=prt.ilp, kwargs1={"objective":obj.MinimizeDifference}, algorithm2=prt.greedy, kwargs2={}) #doctest: +NORMALIZE_WHITESPACE
     Algorithms differ on input [4, 5, 6, 7, 8]:
-        integer-programming:   sums=[15.0, 15.0], Difference=0.0
-        greedy:   sums=[13.0, 17.0], Difference=4.0
+        integer-programming:   sums=[15, 15], Difference=0
+        greedy:   sums=[13, 17], Difference=4
     False
     >>> compare_algorithms(2, [4,5,6,7,8], out.SortedSums, algorithm1=prt.ilp, kwargs1={"objective":obj.MinimizeDifference}, algorithm2=prt.snp, kwargs2={})
     True
     >>> compare_algorithms(2, [4,5,6,7,8], out.SortedSums, algorithm1=prt.ilp, kwargs1={"objective":obj.MinimizeDifference}, algorithm2=prt.greedy, kwargs2={}) #doctest: +NORMALIZE_WHITESPACE
     Algorithms differ on input [4, 5, 6, 7, 8]:
-        integer-programming:   sums=[15.0, 15.0]
-        greedy:   sums=[13.0, 17.0]
+        integer-programming:   sums=[15, 15]
+        greedy:   sums=[13, 17]
     False
     """
     sums1 = partition(algorithm1, numbins, items, outputtype=out.SortedSums, **kwargs1)
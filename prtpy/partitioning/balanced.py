@@ -26,7 +26,7 @@ def bidirectional_balanced(binner: Binner, numbins: int, items: List[any]):
     >>> partition(algorithm=bidirectional_balanced, numbins=3, items={"a":1, "b":2, "c":3, "d":4, "e":5, "f":9})
     [['f', 'a'], ['e', 'b'], ['d', 'c']]
     >>> partition(algorithm=bidirectional_balanced, numbins=2, items={"a":1, "b":2, "c":3, "d":4, "e":5, "f":9}, outputtype=out.Sums)
-    [14.0, 10.0]
+    [14, 10]
     """
     bin_index = 0
     current_direction = +1
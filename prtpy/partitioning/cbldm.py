@@ -60,6 +60,12 @@ def cbldm(
 
     >>> partition(algorithm=cbldm, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
     [['g', 'd', 'c', 'a'], ['f', 'b', 'e']]
+
+    A binner that keeps the contents in arrays gives the same partition:
+    >>> from prtpy import BinnerKeepingIndices
+    >>> printbins(cbldm(BinnerKeepingIndices(), 2, items=[8,7,6,5,4], time_limit=1, partition_difference=1))
+    Bin #0: [4, 6, 5], sum=15.0
+    Bin #1: [8, 7], sum=15.0
     """
     start = time.perf_counter()
     if numbins != 2:
@@ -77,7 +83,8 @@ def cbldm(
     if numitems == 0:  # empty items returns empty partition
         return binner.new_bins(numbins)
 
-    binner = BinnerKeepingContents(binner.valueof)  # Must keep contents, because we need to count the number of items in each bin!
+    if not isinstance(binner, BinnerKeepingContents):
+        binner = BinnerKeepingContents(binner.valueof, binner.dtype)  # Must keep contents, because we need to count the number of items in each bin!
 
     sub_partitions = []    # list of bin-arrays, each of which contains a possible sub-partition.
     for item in sorted_items:
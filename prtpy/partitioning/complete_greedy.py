@@ -14,13 +14,161 @@
 
 from typing import List, Tuple, Callable, Iterator, Any
 import numpy as np
-import logging, time
-from prtpy import objectives as obj, Binner, BinsArray
+import array, logging, time, bisect, os, sys, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from prtpy import objectives as obj, Binner, BinsArray, TrailBinner
+from prtpy.binners import small_binner, convert_bins, BatchBinner
+from prtpy.partitioning.warm_start import best_heuristic_solution
 
 logger = logging.getLogger(__name__)
 
 
 
+def _sorted_items_and_sums_of_remaining_items(binner: Binner, items: List[Any]) -> Tuple[List[Any], List[float]]:
+    """
+    Return the items sorted by descending value, 
+    and a list whose i-th element is the sum of the values of the sorted items from index i onwards (with a trailing 0).
+
+    >>> from prtpy import BinnerKeepingSums
+    >>> _sorted_items_and_sums_of_remaining_items(BinnerKeepingSums(), [2, 5, 3])
+    ([5, 3, 2], [10, 5, 2, 0])
+    """
+    items = list(items)
+    values = binner.values_of(items)
+    order = np.argsort(-values, kind="stable")
+    sorted_items = [items[i] for i in order]
+    sums_of_remaining_items = np.cumsum(values[order][::-1])[::-1].tolist() + [0]
+    return sorted_items, sums_of_remaining_items
+
+
+SEEN_STATES_MEMORY = 2**27   # Default memory (in bytes) of the table of seen states.
+
+class TranspositionTable:
+    """
+    A set of seen search states, with a fixed memory budget.
+
+    Each state is kept with its (64-bit) Python hash and the depth at which it was seen; the hashes and depths are kept in compact arrays.
+    The table is divided into buckets with a few entries ("ways") each, and a state can be kept only in the bucket of its hash.
+    The table grows until it reaches its memory budget; afterwards, adding a state to a full bucket evicts another state:
+      * "lru" - 4 ways; the least-recently seen state is evicted.
+      * "depth" - 1 way; the new state replaces the old one only if it is not deeper, since shallower states have larger subtrees.
+      * "two-tier" - 2 ways: a depth-preferred entry as in "depth", and an entry that is always replaced;
+                     a state evicted from the depth-preferred entry moves to the other entry.
+    An evicted state may be searched again, so the search becomes slower, but remains correct.
+    A state is reported as seen only if it equals a kept state, not just its hash (Python's hash has collisions, e.g. hash(-1) == hash(-2)),
+    so the subtree of a new state is never skipped.
+
+    >>> table = TranspositionTable(memory=1000, replacement="depth")
+    >>> table.check_and_add((1, 2), depth=1), table.check_and_add((1, 2), depth=1), len(table)
+    (False, True, 1)
+    >>> all(not table.check_and_add((i, i+1), depth=2) for i in range(2, 100))
+    True
+    >>> len(table) <= 10, table.evictions > 0
+    (True, True)
+    >>> table = TranspositionTable(memory=1000, replacement="depth")
+    >>> table.check_and_add((0, 1), depth=100000), table.check_and_add((0, 1), depth=100000)   # deep trees, with more than 2**16 items.
+    (False, True)
+    >>> table = TranspositionTable(memory=1000, replacement="lru")
+    >>> hash((-1, 2**61)) == hash((-2, 1)), table.check_and_add((-1, 2**61), depth=1), table.check_and_add((-2, 1), depth=1)
+    (True, False, False)
+    """
+    WAYS = {"lru": 4, "depth": 1, "two-tier": 2}
+    INITIAL_NUMBUCKETS = 2**10
+
+    def __init__(self, memory: int = SEEN_STATES_MEMORY, replacement: str = "two-tier"):
+        if replacement not in self.WAYS:
+            raise ValueError(f"replacement should be one of {list(self.WAYS)}, but it is {replacement}")
+        self.replacement = replacement
+        self.ways = self.WAYS[replacement]
+        self.memory = memory
+        self.entry_size = 8 + 4 + 8 + (8 if replacement=="lru" else 0)   # key, depth, reference to the state and last-seen time.
+        self.max_numbuckets = self._max_numbuckets(self.entry_size)   # updated when the size of the states is known.
+        self.size = 0
+        self.evictions = 0
+        self.clock = 0
+        self._allocate(min(self.INITIAL_NUMBUCKETS, self.max_numbuckets))
+
+    def _max_numbuckets(self, entry_size: int) -> int:
+        max_numbuckets = 1
+        while 2 * max_numbuckets * self.ways * entry_size <= self.memory:
+            max_numbuckets *= 2
+        return max_numbuckets
+
+    def _allocate(self, numbuckets: int):
+        self.mask = numbuckets - 1
+        numentries = numbuckets * self.ways
+        self.keys = array.array("q", bytes(8*numentries))
+        self.depths = array.array("I", bytes(4*numentries))   # depth+1 of the state in each entry; 0 means an empty entry.
+        self.states = [None] * numentries
+        self.times = array.array("Q", bytes(8*numentries)) if self.replacement=="lru" else None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def check_and_add(self, state: Tuple, depth: int) -> bool:
+        """
+        If the given state is in the table, return True. Otherwise, add it and return False.
+        """
+        key = hash(state)
+        first = (key & self.mask) * self.ways
+        keys, depths, states = self.keys, self.depths, self.states
+        self.clock += 1
+        for entry in range(first, first+self.ways):
+            if depths[entry] and keys[entry] == key and states[entry] == state:
+                if self.times is not None:
+                    self.times[entry] = self.clock
+                return True
+        if self.size == 0 and self.evictions == 0:   # the first state - all states of a search have about the same size.
+            self.max_numbuckets = self._max_numbuckets(self.entry_size + sys.getsizeof(state) + sum(map(sys.getsizeof, state)))
+            if self.mask+1 > self.max_numbuckets:
+                self._allocate(self.max_numbuckets)
+                first = (key & self.mask) * self.ways
+        if self.size >= (self.mask+1) * self.ways * 3 // 4 and self.mask+1 < self.max_numbuckets:
+            self._grow()
+            first = (key & self.mask) * self.ways
+        self._add(first, key, state, depth+1)
+        return False
+
+    def _add(self, first: int, key: int, state: Tuple, stored_depth: int):
+        keys, depths, states = self.keys, self.depths, self.states
+        if self.replacement == "lru":
+            entry = min(range(first, first+self.ways), key=lambda entry: self.times[entry] if depths[entry] else -1)
+            self.times[entry] = self.clock
+        elif self.replacement == "depth":
+            entry = first
+            if depths[entry] and depths[entry] < stored_depth:
+                return   # the state in the table has a larger subtree, so it is kept.
+        else:   # two-tier
+            entry = first
+            if depths[entry] and depths[entry] < stored_depth:
+                entry = first+1
+            elif depths[entry]:   # the evicted depth-preferred state replaces the always-replaced state.
+                if depths[first+1]:
+                    self.evictions += 1
+                    self.size -= 1
+                keys[first+1], depths[first+1], states[first+1] = keys[entry], depths[entry], states[entry]
+                depths[entry] = 0
+        if depths[entry]:
+            self.evictions += 1
+        else:
+            self.size += 1
+        keys[entry], depths[entry], states[entry] = key, stored_depth, state
+
+    def _grow(self):
+        old_keys, old_depths, old_states, old_times = self.keys, self.depths, self.states, self.times
+        self._allocate(2 * (self.mask+1))
+        self.size = 0
+        for entry, stored_depth in enumerate(old_depths):
+            if stored_depth:
+                key = old_keys[entry]
+                if old_times is not None:
+                    self.clock = old_times[entry]
+                self._add((key & self.mask) * self.ways, key, old_states[entry], stored_depth)
+        if old_times is not None:
+            self.clock = max(old_times)
+
+
 def anytime(
     binner: Binner, numbins: int, items: List[any],
     objective: obj.Objective = obj.MinimizeDifference,
@@ -28,12 +176,29 @@ def anytime(
     use_fast_lower_bound: bool = True,   # A faster lower bound, that does not create the branch at all. Useful for min-max and max-min objectives.
     use_heuristic_3: bool = False,  # An improved stopping condition, applicable for min-max only. Not very useful in experiments.
     use_set_of_seen_states: bool = True, 
+    seen_states_memory: int = SEEN_STATES_MEMORY,
+    seen_states_replacement: str = "two-tier",
+    discrepancy_search: str = None,
+    upper_bound: float = np.inf,
+    initial_solution: Any = None,
     time_limit: float = np.inf,
 ) -> Iterator:
     """
     Finds a partition in which the largest sum is minimal, using the Complete Greedy algorithm.
 
     :param objective: represents the function that should be optimized. Default is minimizing the difference between bin sums.
+    :param use_set_of_seen_states: skip states whose sums were already seen.
+    :param seen_states_memory, seen_states_replacement: the memory budget (in bytes) and the replacement scheme of the table of seen states (see TranspositionTable).
+    :param discrepancy_search: the order in which the tree is searched. Adding an item to any bin except the one with the smallest sum is a "discrepancy" from the greedy choice.
+      * None (default) - depth-first search; the greedy branch is searched first, but then the search backtracks from the bottom of the tree.
+      * "ilds" - Iterative Limited Discrepancy Search (Korf, 1996): iteration k searches the partitions with exactly k discrepancies.
+      * "dds" - Depth-bounded Discrepancy Search (Walsh, 1997): iteration k searches the partitions whose deepest discrepancy is at depth k.
+      Each iteration is a depth-first search with the same pruning, and the search ends when an iteration is not limited by the discrepancies.
+      So the result is still optimal, but the partitions are found in a different order: within a short time limit,
+      it may find better partitions when the early decisions matter most (in number partitioning, the last items often matter most).
+    :param upper_bound: only partitions whose objective value is smaller than this are searched. Default is infinity.
+    :param initial_solution: a partition (bins-array of the given binner) with numbins bins, whose objective value is used as an upper bound from the first node.
+      It is returned if no better partition is found. If it is "heuristics", the best partition of the heuristics in warm_start.HEURISTICS is used.
     :param time_limit: determines how much time (in seconds) the function should run before it stops. Default is infinity.
 
     >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums, printbins
@@ -83,32 +248,107 @@ def anytime(
     >>> objective.value_to_minimize(bins1)==objective.value_to_minimize(bins2)
     True
 
+    Compare results with and without discrepancy search:
+    >>> random_numbers = np.random.randint(1, 2**48-1, 10, dtype=np.int64)
+    >>> for discrepancy_search in ["ilds", "dds"]:
+    ...     for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+    ...         bins1=anytime(BinnerKeepingSums(), 3, random_numbers, objective=objective)
+    ...         bins2=anytime(BinnerKeepingSums(), 3, random_numbers, objective=objective, discrepancy_search=discrepancy_search)
+    ...         print(objective.value_to_minimize(bins1)==objective.value_to_minimize(bins2), end=" ")
+    True True True True True True 
+
+    Start from the best partition of fast heuristics, which is returned if it is optimal:
+    >>> list(anytime(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MinimizeLargestSum, initial_solution="heuristics"))
+    [53.0, 62.0, 62.0]
+    >>> print(anytime(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MinimizeLargestSum, upper_bound=62))
+    None
+
     Partitioning items with names:
     >>> from prtpy import partition, outputtypes as out
     >>> partition(algorithm=anytime, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
     [['g', 'a'], ['f', 'b'], ['e', 'c', 'd']]
     >>> partition(algorithm=anytime, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
-    [16.0, 16.0]
+    [16, 16]
     """
+    best_bins = None
+    for best_bins, _, _, _ in generator(binner, numbins, items, objective, use_lower_bound, use_fast_lower_bound, use_heuristic_3,
+        use_set_of_seen_states, seen_states_memory, seen_states_replacement, discrepancy_search, upper_bound, initial_solution, time_limit):
+        pass
+    return best_bins
+
+
+def generator(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    use_fast_lower_bound: bool = True,
+    use_heuristic_3: bool = False,
+    use_set_of_seen_states: bool = True,
+    seen_states_memory: int = SEEN_STATES_MEMORY,
+    seen_states_replacement: str = "two-tier",
+    discrepancy_search: str = None,
+    upper_bound: float = np.inf,
+    initial_solution: Any = None,
+    time_limit: float = np.inf,
+) -> Iterator[Tuple[BinsArray, float, float, int]]:
+    """
+    The search of `anytime` (with the same parameters), as a generator that yields each partition that is better than all the previous ones.
+    Yields tuples (bins, objective value, elapsed time in seconds, number of intermediate partitions checked so far).
+    The last partition is the one returned by `anytime`, so the caller can stop whenever the partition is good enough.
+    If an initial solution is given, it is yielded first (with 0 intermediate partitions), unless it is not better than the upper bound.
+
+    >>> from prtpy import BinnerKeepingSums
+    >>> for bins, objective_value, elapsed_time, nodes in generator(BinnerKeepingSums(), 2, [4,5,6,7,8], objective=obj.MinimizeDifference):
+    ...     print(list(bins), objective_value, nodes)
+    [13.0, 17.0] 4 9
+    [14.0, 16.0] 2 11
+    [15.0, 15.0] 0 14
+    """
+    if discrepancy_search not in [None, "ilds", "dds"]:
+        raise ValueError(f"discrepancy_search should be None, 'ilds' or 'dds', but it is {discrepancy_search}")
     numitems = len(items)
     start_time = time.perf_counter()
     end_time = start_time + time_limit
+    original_binner, binner = binner, small_binner(binner, numbins)
 
-    sorted_items = sorted(items, key=binner.valueof, reverse=True)
-    sums_of_remaining_items = [sum(map(binner.valueof, sorted_items[i:])) for i in range(numitems)] + [0] # For Heuristic 3
-    best_bins, best_objective_value = None, np.inf
+    sorted_items, sums_of_remaining_items = _sorted_items_and_sums_of_remaining_items(binner, items)   # the sums are for Heuristic 3 and the lower bounds
+    best_objective_value = upper_bound
 
     global_lower_bound = objective.lower_bound(np.zeros(numbins), sums_of_remaining_items[0], are_sums_in_ascending_order=True)
 
     logger.info("\nComplete Greedy %s Partitioning of %d items into %d parts. Lower bound: %s", objective, numitems, numbins, global_lower_bound)
 
-    # Create a stack whose elements are a partition and the current depth.
+    # Warm start: the initial solution is the first incumbent, so the search prunes by its value from the first node.
+    if isinstance(initial_solution, str):
+        if initial_solution != "heuristics":
+            raise ValueError(f"initial_solution should be a bins-array or 'heuristics', but it is {initial_solution}")
+        initial_solution, _ = best_heuristic_solution(original_binner, numbins, items, objective)
+    if initial_solution is not None:
+        if original_binner.numbins(initial_solution) != numbins:
+            raise ValueError(f"initial_solution should have {numbins} bins, but it has {original_binner.numbins(initial_solution)}")
+        initial_bins = original_binner.copy_bins(initial_solution)
+        original_binner.sort_by_ascending_sum(initial_bins)
+        initial_objective_value = objective.value_to_minimize(original_binner.sums(initial_bins))
+        logger.info("  Initial solution value: %s", initial_objective_value)
+        if initial_objective_value < best_objective_value:
+            best_objective_value = initial_objective_value
+            yield initial_bins, best_objective_value, time.perf_counter()-start_time, 0
+            if best_objective_value<=global_lower_bound:
+                logger.info("    Initial solution matches global lower bound - stopping")
+                return
+
+    # Create a stack whose elements are a partition, the current depth, and the number of discrepancies on the path to it.
     # Initially, it contains a single tuple: an empty partition with depth 0.
     first_bins  = binner.new_bins(numbins)
-    first_vertex = (first_bins, 0)
-    stack: List[Tuple[BinsArray, int]] = [first_vertex]
+    first_vertex = (first_bins, 0, 0)
+    stack: List[Tuple[BinsArray, int, int]] = [first_vertex]
     if use_set_of_seen_states:
-        seen_states = set(tuple(binner.sums(first_bins)))
+        seen_states = TranspositionTable(seen_states_memory, seen_states_replacement)
+
+    # In a discrepancy search, an iteration is "cut" if some branch was skipped since it has too many discrepancies.
+    # Then, when the stack is empty, the next iteration starts. 
+    iteration = 0
+    is_iteration_cut = False
 
     # For logging and profiling:
     complete_partitions_checked = 0      
@@ -119,12 +359,22 @@ def anytime(
     times_heuristic_3_activated = 0
     times_seen_state_skipped = 0
 
-    while len(stack) > 0:
+    while len(stack) > 0 or is_iteration_cut:
         if time.perf_counter() > end_time:
             logger.info("Time-limit of %s reached - stopping", time_limit)
             break
 
-        current_bins, depth = stack.pop()
+        if len(stack) == 0:
+            iteration += 1
+            if discrepancy_search == "dds" and iteration == 1:
+                iteration = 2   # in DDS, iteration 1 should have a discrepancy at depth 0, but all bins are empty there, so it is skipped.
+            logger.info("  Discrepancy search iteration %d", iteration)
+            is_iteration_cut = False
+            stack.append(first_vertex)
+            if use_set_of_seen_states:   # the states of the previous iteration were searched with a different limit.
+                seen_states = TranspositionTable(seen_states_memory, seen_states_replacement)
+
+        current_bins, depth, discrepancies = stack.pop()
         current_sums = tuple(binner.sums(current_bins))
 
         # If we have reached the leaves of the DFS tree, check if we have an improvement:
@@ -132,8 +382,9 @@ def anytime(
             complete_partitions_checked += 1
             new_objective_value = objective.value_to_minimize(current_sums)
             if new_objective_value < best_objective_value:
-                best_bins, best_objective_value = current_bins, new_objective_value
+                best_objective_value = new_objective_value
                 logger.info("  Found a better solution: %s, with value %s", current_bins, best_objective_value)
+                yield convert_bins(current_bins, binner, original_binner), best_objective_value, time.perf_counter()-start_time, intermediate_partitions_checked
                 if new_objective_value<=global_lower_bound:
                     logger.info("    Solution matches global lower bound - stopping")
                     break
@@ -148,7 +399,7 @@ def anytime(
                     binner.add_item_to_bin(new_bins, sorted_items[i], 0)
                 binner.sort_by_ascending_sum(new_bins)
                 new_depth = numitems
-                stack.append((new_bins, new_depth))
+                stack.append((new_bins, new_depth, discrepancies))
                 logger.debug("    Heuristic 3 activated")
                 times_heuristic_3_activated+=1
                 continue
@@ -170,6 +421,23 @@ def anytime(
                 continue   
             previous_bin_sum = current_bin_sum
 
+            new_discrepancies = discrepancies
+            if discrepancy_search is not None:
+                is_discrepancy = current_bin_sum != current_sums[0]
+                if discrepancy_search == "ilds":
+                    new_discrepancies = discrepancies + is_discrepancy
+                    if new_discrepancies > iteration:
+                        is_iteration_cut = True
+                        continue
+                    if new_discrepancies + (numitems-depth-1) < iteration:
+                        continue   # the partitions in this branch have fewer discrepancies, so they were searched in previous iterations.
+                elif (depth >= iteration and is_discrepancy) or (depth == iteration-1 and not is_discrepancy):   # dds
+                    # If depth == iteration-1, the partitions with no discrepancy at this depth were searched in previous iterations,
+                    # but the partitions with deeper discrepancies will be searched in the next iterations (if there are deeper items).
+                    if iteration < numitems:
+                        is_iteration_cut = True
+                    continue
+
             # Fast-lower-bound heuristic - before creating the new vertex.
             # Currently implemented only for two objectives: min-max and max-min.
             if use_fast_lower_bound:
@@ -189,8 +457,7 @@ def anytime(
                     times_fast_lower_bound_activated += 1
                     continue
 
-            new_bins = binner.add_item_to_bin(binner.copy_bins(current_bins), next_item, bin_index)
-            binner.sort_by_ascending_sum(new_bins)
+            new_bins = binner.add_and_resort(binner.copy_bins(current_bins), next_item, bin_index)
             new_sums = tuple(binner.sums(new_bins))
 
             # Lower-bound heuristic. 
@@ -201,22 +468,551 @@ def anytime(
                     times_lower_bound_activated += 1
                     continue
             if use_set_of_seen_states: 
-                if new_sums in seen_states:
+                # In ILDS, the states with a different number of discrepancies have different subtrees.
+                new_state = new_sums + (new_discrepancies,) if discrepancy_search == "ilds" else new_sums
+                if seen_states.check_and_add(new_state, depth+1):   # should be after if use_lower_bound
                     logger.debug("    State %s already seen", new_sums)
                     times_seen_state_skipped += 1
                     continue
-                seen_states.add(new_sums)   # should be after if use_lower_bound
 
-            new_vertex = (new_bins, depth + 1)
+            new_vertex = (new_bins, depth + 1, new_discrepancies)
             stack.append(new_vertex)
             intermediate_partitions_checked += 1
 
     logger.info("Checked %d out of %d complete partitions, and %d intermediate partitions.", complete_partitions_checked, numbins**numitems, intermediate_partitions_checked)
     logger.info("  Heuristics: fast lower bound = %d, lower bound = %d, seen state = %d, heuristic 3 = %d.", times_fast_lower_bound_activated, times_lower_bound_activated, times_seen_state_skipped, times_heuristic_3_activated)
+    if use_set_of_seen_states:
+        logger.info("  Seen states: %d in the table, %d evicted.", len(seen_states), seen_states.evictions)
+
+
+def anytime_with_trail(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    use_fast_lower_bound: bool = True,
+    use_set_of_seen_states: bool = True, 
+    seen_states_memory: int = SEEN_STATES_MEMORY,
+    seen_states_replacement: str = "two-tier",
+    time_limit: float = np.inf,
+) -> BinsArray:
+    """
+    The same search as `anytime`, but with a single mutable bins-array instead of a bins-array per search node:
+    each step adds the next item with TrailBinner.push_item, and backtracking undoes it.
+    So the memory used by the search is proportional to its depth (the number of items).
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums, printbins
+    >>> printbins(anytime_with_trail(BinnerKeepingContents(), 2, [4,5,6,7,8], objective=obj.MinimizeDifference))
+    Bin #0: [8, 7], sum=15.0
+    Bin #1: [6, 5, 4], sum=15.0
+    >>> walter_numbers = [46, 39, 27, 26, 16, 13, 10]
+    >>> printbins(anytime_with_trail(BinnerKeepingContents(), 3, walter_numbers, objective=obj.MinimizeDifference))
+    Bin #0: [39, 16], sum=55.0
+    Bin #1: [46, 13], sum=59.0
+    Bin #2: [27, 26, 10], sum=63.0
+    >>> list(anytime_with_trail(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MinimizeLargestSum))
+    [53.0, 62.0, 62.0]
+    >>> list(anytime_with_trail(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MaximizeSmallestSum))
+    [56.0, 56.0, 65.0]
+
+    Compare results with the regular search:
+    >>> random_numbers = np.random.randint(1, 2**48-1, 10, dtype=np.int64)
+    >>> for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+    ...     bins1=anytime(BinnerKeepingSums(), 3, random_numbers, objective=objective)
+    ...     bins2=anytime_with_trail(BinnerKeepingSums(), 3, random_numbers, objective=objective)
+    ...     print(objective.value_to_minimize(bins1)==objective.value_to_minimize(bins2))
+    True
+    True
+    True
+
+    >>> from prtpy import partition, outputtypes as out
+    >>> partition(algorithm=anytime_with_trail, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
+    [16, 16]
+    """
+    numitems = len(items)
+    end_time = time.perf_counter() + time_limit
+    original_binner, binner = binner, small_binner(binner, numbins)
+
+    sorted_items, sums_of_remaining_items = _sorted_items_and_sums_of_remaining_items(binner, items)
+    best_bins, best_objective_value = None, np.inf
+
+    global_lower_bound = objective.lower_bound(np.zeros(numbins), sums_of_remaining_items[0], are_sums_in_ascending_order=True)
+
+    logger.info("\nComplete Greedy %s Partitioning of %d items into %d parts, with a trail. Lower bound: %s", objective, numitems, numbins, global_lower_bound)
+
+    trail_binner = TrailBinner(binner)
+    bins = binner.new_bins(numbins)
+    if numitems == 0:
+        return convert_bins(bins, binner, original_binner)
+    if use_set_of_seen_states:
+        seen_states = TranspositionTable(seen_states_memory, seen_states_replacement)
+
+    # For logging and profiling:
+    complete_partitions_checked = 0
+    intermediate_partitions_checked = 1
+    times_fast_lower_bound_activated = 0
+    times_lower_bound_activated = 0
+    times_seen_state_skipped = 0
+
+    def bins_to_try(depth:int) -> Iterator[int]:
+        """
+        Generate the indices of the bins into which the item at the given depth should be added, by ascending order of sum.
+        """
+        nonlocal times_fast_lower_bound_activated
+        current_sums = binner.sums(bins)
+        order = sorted(range(numbins), key=current_sums.__getitem__)
+        sorted_sums = [current_sums[bin_index] for bin_index in order]
+        next_value = binner.valueof(sorted_items[depth])
+        sum_of_remaining_items = sums_of_remaining_items[depth+1]
+        previous_bin_sum = None
+        for position, bin_index in enumerate(order):
+            # Heuristic 1: "If there are two subsets with the same sum, the current number is assigned to only one."
+            current_bin_sum = sorted_sums[position]
+            if current_bin_sum == previous_bin_sum:
+                continue
+            previous_bin_sum = current_bin_sum
+
+            # Fast-lower-bound heuristic (see `anytime`). It is checked when the child is reached, against the best value found so far.
+            if use_fast_lower_bound:
+                if objective==obj.MinimizeLargestSum:
+                    fast_lower_bound = max(current_bin_sum + next_value, sorted_sums[-1])
+                elif objective==obj.MaximizeSmallestSum:
+                    if position==0:
+                        new_smallest_sum = min(sorted_sums[0]+next_value, sorted_sums[1])
+                    else:
+                        new_smallest_sum = sorted_sums[0]
+                    fast_lower_bound = -(new_smallest_sum+sum_of_remaining_items)
+                else:
+                    fast_lower_bound = -np.inf
+                if fast_lower_bound >= best_objective_value:
+                    times_fast_lower_bound_activated += 1
+                    continue
+            yield bin_index
+
+    # The stack contains, for each depth along the current path, a generator of the bins still to try for the item at that depth.
+    stack = [bins_to_try(0)]
+    while len(stack) > 0:
+        if time.perf_counter() > end_time:
+            logger.info("Time-limit of %s reached - stopping", time_limit)
+            break
+
+        depth = len(stack)-1
+        bin_index = next(stack[-1], None)
+        if bin_index is None:
+            stack.pop()
+            if len(stack) > 0:
+                trail_binner.undo()   # remove the item that led to the exhausted node
+            continue
+
+        trail_binner.push_item(bins, sorted_items[depth], bin_index)
+        new_depth = depth + 1
+        new_sums = tuple(sorted(binner.sums(bins)))
+
+        # If we have reached the leaves of the DFS tree, check if we have an improvement:
+        if new_depth == numitems:
+            complete_partitions_checked += 1
+            new_objective_value = objective.value_to_minimize(new_sums)
+            if new_objective_value < best_objective_value:
+                best_bins, best_objective_value = binner.copy_bins(bins), new_objective_value
+                logger.info("  Found a better solution: %s, with value %s", best_bins, best_objective_value)
+                if new_objective_value<=global_lower_bound:
+                    logger.info("    Solution matches global lower bound - stopping")
+                    break
+            trail_binner.undo()
+            continue
+
+        if use_lower_bound:
+            lower_bound = objective.lower_bound(new_sums, sums_of_remaining_items[new_depth], are_sums_in_ascending_order=True)
+            if lower_bound >= best_objective_value:
+                logger.debug("    Lower bound %f too large", lower_bound)
+                times_lower_bound_activated += 1
+                trail_binner.undo()
+                continue
+        if use_set_of_seen_states:
+            if seen_states.check_and_add(new_sums, new_depth):
+                logger.debug("    State %s already seen", new_sums)
+                times_seen_state_skipped += 1
+                trail_binner.undo()
+                continue
+
+        stack.append(bins_to_try(new_depth))
+        intermediate_partitions_checked += 1
+
+    logger.info("Checked %d out of %d complete partitions, and %d intermediate partitions.", complete_partitions_checked, numbins**numitems, intermediate_partitions_checked)
+    logger.info("  Heuristics: fast lower bound = %d, lower bound = %d, seen state = %d.", times_fast_lower_bound_activated, times_lower_bound_activated, times_seen_state_skipped)
+    if use_set_of_seen_states:
+        logger.info("  Seen states: %d in the table, %d evicted.", len(seen_states), seen_states.evictions)
+
+    if best_bins is None:
+        return None
+    binner.sort_by_ascending_sum(best_bins)
+    return convert_bins(best_bins, binner, original_binner)
+
+
+def breadth_first(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+) -> BinsArray:
+    """
+    The same search tree as `anytime`, but explored breadth-first: all the states at the same depth are kept in a single
+    2-D numpy array (see `BatchBinner`), so each layer is expanded, sorted, pruned and deduplicated by vectorized operations.
+    The incumbent is the greedy partition (the first leaf of the depth-first search), and states whose lower bound
+    is not better are pruned. Unlike `anytime`, this is not an anytime algorithm, and it may use much memory.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums, printbins
+    >>> printbins(breadth_first(BinnerKeepingContents(), 2, [4,5,6,7,8], objective=obj.MinimizeDifference))
+    Bin #0: [6, 5, 4], sum=15.0
+    Bin #1: [8, 7], sum=15.0
+    >>> walter_numbers = [46, 39, 27, 26, 16, 13, 10]
+    >>> printbins(breadth_first(BinnerKeepingContents(), 3, walter_numbers, objective=obj.MinimizeDifference))
+    Bin #0: [39, 16], sum=55.0
+    Bin #1: [46, 13], sum=59.0
+    Bin #2: [27, 26, 10], sum=63.0
+    >>> list(breadth_first(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MinimizeLargestSum))
+    [53.0, 62.0, 62.0]
+    >>> list(breadth_first(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MaximizeSmallestSum))
+    [56.0, 56.0, 65.0]
+
+    Compare results with the depth-first search:
+    >>> random_numbers = np.random.randint(1, 2**16-1, 10, dtype=np.int64)
+    >>> for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+    ...     bins1=anytime(BinnerKeepingSums(), 3, random_numbers, objective=objective)
+    ...     bins2=breadth_first(BinnerKeepingSums(), 3, random_numbers, objective=objective)
+    ...     print(objective.value_to_minimize(bins1)==objective.value_to_minimize(bins2))
+    True
+    True
+    True
+
+    >>> from prtpy import partition, outputtypes as out
+    >>> partition(algorithm=breadth_first, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
+    [16, 16]
+    """
+    numitems = len(items)
+    sorted_items, sums_of_remaining_items = _sorted_items_and_sums_of_remaining_items(binner, items)
+    values = [binner.valueof(item) for item in sorted_items]
+    global_lower_bound = objective.lower_bound(np.zeros(numbins), sums_of_remaining_items[0], are_sums_in_ascending_order=True)
+    logger.info("\nBreadth-first Complete Greedy %s Partitioning of %d items into %d parts. Lower bound: %s", objective, numitems, numbins, global_lower_bound)
+
+    def greedy_completion(sums: List[float], depth: int) -> float:
+        # The value of adding the items from the given depth onwards, each to the bin with the smallest sum (= bin 0 of the sorted sums).
+        sums = sorted(sums)
+        for value in values[depth:]:
+            bisect.insort(sums, sums.pop(0)+value)
+        return objective.value_to_minimize(sums)
+
+    # The incumbent is kept as a path: the index of the bin (in the sorted bins-array) to which each item is added.
+    # Initially, it is the greedy partition, which is the first leaf of the depth-first search.
+    best_path = [0]*numitems
+    best_objective_value = greedy_completion([0]*numbins, 0)
+    logger.info("  Greedy solution value: %s", best_objective_value)
+
+    batcher = BatchBinner(binner)
+    batch = batcher.new_batch(numbins)
+    layers = []     # For each depth: the parent row and the bin of each row in the batch. Used to rebuild the paths.
+    depth = 0
+    while depth < numitems and best_objective_value > global_lower_bound:
+        batch, parents, bins = batcher.add_item_to_each_bin(batch, sorted_items[depth])
+        depth += 1
+        if use_lower_bound:
+            lower_bounds = objective.lower_bounds(batch, sums_of_remaining_items[depth])
+            is_promising = lower_bounds < best_objective_value
+            batch, parents, bins, lower_bounds = batch[is_promising], parents[is_promising], bins[is_promising], lower_bounds[is_promising]
+        batch, unique_indices = batcher.unique(batch)
+        parents, bins = parents[unique_indices], bins[unique_indices]
+        layers.append((parents, bins))
+        logger.info("  Depth %d: %d states", depth, len(batch))
+        if len(batch) == 0:
+            break
+
+        # Improve the incumbent by completing the most promising state greedily:
+        row = int(np.argmin(lower_bounds[unique_indices])) if use_lower_bound else 0
+        completion_value = greedy_completion(batch[row].tolist(), depth)
+        if completion_value < best_objective_value:
+            best_path = batcher.path_to_row(layers, row) + [0]*(numitems-depth)
+            best_objective_value = completion_value
+            logger.info("  Found a better solution, with value %s", best_objective_value)
+    else:
+        if depth == numitems and len(batch) > 0:
+            objective_values = objective.values_to_minimize(batch)
+            row = int(np.argmin(objective_values))
+            if objective_values[row] < best_objective_value:
+                best_path = batcher.path_to_row(layers, row)
+                best_objective_value = objective_values[row]
+                logger.info("  Found a better solution, with value %s", best_objective_value)
+
+    # Add the items to the bins along the best path:
+    best_bins = binner.new_bins(numbins)
+    for item, bin_index in zip(sorted_items, best_path):
+        binner.add_and_resort(best_bins, item, bin_index)
+    return best_bins
+
+
+TASKS_PER_PROCESS = 4       # The top levels of the search tree are expanded until there are at least this many subtrees per process.
+NODES_PER_TASK = 2**14      # A task that expanded this many nodes returns its unexplored nodes, so that they can be redistributed.
+
+def anytime_parallel(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    use_fast_lower_bound: bool = True,
+    use_set_of_seen_states: bool = True,
+    seen_states_memory: int = SEEN_STATES_MEMORY,
+    seen_states_replacement: str = "two-tier",
+    time_limit: float = np.inf,
+    numprocesses: int = None,
+) -> BinsArray:
+    """
+    The same search as `anytime`, run by a pool of numprocesses processes (default: the number of CPUs).
+
+    The top levels of the search tree are expanded in the main process, and each of the resulting subtrees is searched by a task.
+    A task that expands NODES_PER_TASK nodes stops and returns its unexplored nodes, which become new tasks;
+    so a large subtree is split among all the processes, and no process stays idle while there is work left.
+    The value of the best partition found so far is kept in shared memory, so each process prunes with the global best value
+    (it is kept as an exact integer when the values and the objective are integral, so large integer values are pruned exactly).
+    Each process keeps its own table of seen states.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums, printbins
+    >>> printbins(anytime_parallel(BinnerKeepingContents(), 2, [4,5,6,7,8], objective=obj.MinimizeDifference, numprocesses=2))
+    Bin #0: [6, 5, 4], sum=15.0
+    Bin #1: [8, 7], sum=15.0
+    >>> walter_numbers = [46, 39, 27, 26, 16, 13, 10]
+    >>> printbins(anytime_parallel(BinnerKeepingContents(), 3, walter_numbers, objective=obj.MinimizeDifference, numprocesses=2))
+    Bin #0: [39, 16], sum=55.0
+    Bin #1: [46, 13], sum=59.0
+    Bin #2: [27, 26, 10], sum=63.0
+    >>> list(anytime_parallel(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MinimizeLargestSum, numprocesses=2))
+    [53.0, 62.0, 62.0]
+    >>> list(anytime_parallel(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MaximizeSmallestSum, numprocesses=2))
+    [56.0, 56.0, 65.0]
+
+    Compare results with the sequential search:
+    >>> random_numbers = np.random.randint(1, 2**48-1, 14, dtype=np.int64)
+    >>> for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+    ...     bins1=anytime(BinnerKeepingSums(), 4, random_numbers, objective=objective)
+    ...     bins2=anytime_parallel(BinnerKeepingSums(), 4, random_numbers, objective=objective, numprocesses=2)
+    ...     print(objective.value_to_minimize(bins1)==objective.value_to_minimize(bins2))
+    True
+    True
+    True
+
+    >>> from prtpy import partition, outputtypes as out
+    >>> partition(algorithm=anytime_parallel, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums, numprocesses=2)
+    [16, 16]
+
+    Integers of any size are handled exactly (see `_shared_objective_value`):
+    >>> partition(algorithm=anytime_parallel, numbins=2, items=[2**62, 2**62, 1], outputtype=out.Sums, numprocesses=2)
+    [4611686018427387904, 4611686018427387905]
+    """
+    numitems = len(items)
+    end_time = time.perf_counter() + time_limit
+    numprocesses = numprocesses or os.cpu_count()
+    sorted_items, sums_of_remaining_items = _sorted_items_and_sums_of_remaining_items(binner, items)
+    search = _SubtreeSearch(binner.values_of(sorted_items).tolist(), numbins, objective, sums_of_remaining_items,
+        use_lower_bound, use_fast_lower_bound, use_set_of_seen_states, seen_states_memory, seen_states_replacement)
+    logger.info("\nParallel Complete Greedy %s Partitioning of %d items into %d parts, with %d processes. Lower bound: %s", objective, numitems, numbins, numprocesses, search.global_lower_bound)
+
+    # The initial incumbent is the greedy partition, which is the first leaf of the depth-first search.
+    best_path = [0]*numitems
+    best_sums = [0]*numbins
+    for value in search.values:
+        bisect.insort(best_sums, best_sums.pop(0)+value)
+    best_objective_value = objective.value_to_minimize(best_sums)
+    logger.info("  Greedy solution value: %s", best_objective_value)
+
+    # Expand the top levels of the tree, keeping the nodes in depth-first order:
+    queue = deque([(tuple([0]*numbins), 0, None)])
+    while 0 < len(queue) < numprocesses*TASKS_PER_PROCESS and all(depth < numitems for _, depth, _ in queue):
+        queue = deque(child for node in queue for child in search.children(node, best_objective_value))
+    logger.info("  Split the search into %d subtrees.", len(queue))
+
+    shared_best = _shared_objective_value(best_objective_value, search.values)
+    tasks, nodes_expanded = set(), 0
+    with ProcessPoolExecutor(numprocesses, initializer=_init_subtree_search, initargs=(search, shared_best)) as executor:
+        while len(queue) > 0 or len(tasks) > 0:
+            # Keep every process busy, with one task waiting for each:
+            while len(queue) > 0 and len(tasks) < 2*numprocesses:
+                tasks.add(executor.submit(_search_subtree, queue.popleft(), end_time - time.perf_counter()))
+            done, tasks = wait(tasks, return_when=FIRST_COMPLETED)
+            for task in done:
+                objective_value, path, unexplored_nodes, expanded = task.result()
+                nodes_expanded += expanded
+                if path is not None and objective_value < best_objective_value:
+                    best_path, best_objective_value = _path_to_list(path), objective_value
+                    logger.info("  Found a better solution, with value %s", best_objective_value)
+                queue.extendleft(reversed(unexplored_nodes))   # the unexplored nodes of a task are searched before the other subtrees.
+            if best_objective_value <= search.global_lower_bound:
+                logger.info("    Solution matches global lower bound - stopping")
+                break
+            if time.perf_counter() > end_time:
+                logger.info("Time-limit of %s reached - stopping", time_limit)
+                break
+        for task in tasks:
+            task.cancel()
+    logger.info("Expanded %d nodes.", nodes_expanded)
 
+    best_bins = binner.new_bins(numbins)
+    for item, bin_index in zip(sorted_items, best_path):
+        binner.add_and_resort(best_bins, item, bin_index)
     return best_bins
 
 
+def _shared_objective_value(objective_value: float, values: List[float]):
+    """
+    A number in shared memory, initialized to the given objective value.
+    It is an exact integer if the objective value and all item values are integers (a float would round integers larger than 2**53):
+    a 64-bit integer if the sum of the values fits in it, and a `_SharedInteger` otherwise. Otherwise, it is a float.
+
+    >>> _shared_objective_value(2**60+1, [2**60+1, 2**59]).value
+    1152921504606846977
+    >>> _shared_objective_value(2.5, [1.5, 4]).value
+    2.5
+    >>> _shared_objective_value(-2**62-1, [2**62, 2**62, 1]).value
+    -4611686018427387905
+    """
+    if isinstance(objective_value, int) and all(isinstance(value, int) for value in values):
+        sum_of_values = sum(map(abs, values))
+        if sum_of_values < 2**63:
+            return multiprocessing.Value("q", objective_value)
+        return _SharedInteger(objective_value, numbytes=sum_of_values.bit_length()//8 + 1)
+    return multiprocessing.Value("d", float(objective_value))
+
+
+class _SharedInteger:
+    """
+    An integer of any size in shared memory, kept as the bytes of its two's complement in a synchronized array.
+    It has the interface of multiprocessing.Value used by `anytime_parallel`: the "value" attribute and get_lock().
+
+    >>> number = _SharedInteger(-2**70, numbytes=9)
+    >>> number.value
+    -1180591620717411303424
+    >>> with number.get_lock():
+    ...     number.value = min(number.value, -2**71+1)
+    >>> number.value
+    -2361183241434822606847
+    """
+    def __init__(self, value: int, numbytes: int):
+        self.bytes = multiprocessing.Array("c", numbytes)
+        self.value = value
+
+    def get_lock(self):
+        return self.bytes.get_lock()
+
+    @property
+    def value(self) -> int:
+        return int.from_bytes(self.bytes.raw, "little", signed=True)
+
+    @value.setter
+    def value(self, value: int):
+        self.bytes.raw = value.to_bytes(len(self.bytes), "little", signed=True)
+
+
+class _SubtreeSearch:
+    """
+    The depth-first search of `anytime`, on the values of the items only, used by `anytime_parallel`.
+    A node is a tuple (sums, depth, path), where sums is the tuple of bin sums in ascending order,
+    and path is None at the root, or (parent path, index of the bin in the parent's sums to which the item at depth-1 was added).
+    """
+    def __init__(self, values: List[float], numbins: int, objective: obj.Objective, sums_of_remaining_items: List[float],
+        use_lower_bound: bool, use_fast_lower_bound: bool, use_set_of_seen_states: bool, seen_states_memory: int, seen_states_replacement: str):
+        self.values, self.numbins, self.objective, self.sums_of_remaining_items = values, numbins, objective, sums_of_remaining_items
+        self.use_lower_bound = use_lower_bound
+        # The objectives are compared here, since a copy of an objective in another process is not equal to the original.
+        self.fast_lower_bound = None if not use_fast_lower_bound else \
+            "min-max" if objective==obj.MinimizeLargestSum else "max-min" if objective==obj.MaximizeSmallestSum else None
+        self.seen_states = TranspositionTable(seen_states_memory, seen_states_replacement) if use_set_of_seen_states else None
+        self.global_lower_bound = objective.lower_bound(np.zeros(numbins), sums_of_remaining_items[0], are_sums_in_ascending_order=True)
+
+    def children(self, node: Tuple, best_objective_value: float) -> List[Tuple]:
+        """
+        Return the children of the given node that are not pruned, by ascending order of the sum of the bin to which the item is added.
+        """
+        sums, depth, path = node
+        next_value = self.values[depth]
+        sum_of_remaining_items = self.sums_of_remaining_items[depth+1]
+        children = []
+        previous_bin_sum = None
+        for bin_index, current_bin_sum in enumerate(sums):
+            # Heuristic 1: "If there are two subsets with the same sum, the current number is assigned to only one."
+            if current_bin_sum == previous_bin_sum:
+                continue
+            previous_bin_sum = current_bin_sum
+            if self.fast_lower_bound == "min-max":
+                if max(current_bin_sum + next_value, sums[-1]) >= best_objective_value:
+                    continue
+            elif self.fast_lower_bound == "max-min":
+                new_smallest_sum = min(sums[0]+next_value, sums[1]) if bin_index==0 else sums[0]
+                if -(new_smallest_sum+sum_of_remaining_items) >= best_objective_value:
+                    continue
+            new_sums = list(sums)
+            del new_sums[bin_index]
+            bisect.insort(new_sums, current_bin_sum+next_value)
+            new_sums = tuple(new_sums)
+            if self.use_lower_bound:
+                if self.objective.lower_bound(new_sums, sum_of_remaining_items, are_sums_in_ascending_order=True) >= best_objective_value:
+                    continue
+            if self.seen_states is not None:
+                if self.seen_states.check_and_add(new_sums, depth+1):
+                    continue
+            children.append((new_sums, depth+1, (path, bin_index)))
+        return children
+
+    def search(self, root: Tuple, shared_best, time_limit: float) -> Tuple[float, Tuple, List[Tuple], int]:
+        """
+        Search the subtree of the given root, pruning with the best value in shared_best, and updating it on every improvement.
+        Stop after NODES_PER_TASK nodes are expanded, or the time limit is reached.
+        Return the best value found in this subtree and its path (or None and None if no improvement was found),
+        the unexplored nodes in depth-first order, and the number of expanded nodes.
+        """
+        end_time = time.perf_counter() + time_limit
+        numitems = len(self.values)
+        best_objective_value = shared_best.value
+        found_objective_value, found_path = None, None
+        stack = [root]
+        expanded = 0
+        while len(stack) > 0 and expanded < NODES_PER_TASK:
+            best_objective_value = min(best_objective_value, shared_best.value)
+            if best_objective_value <= self.global_lower_bound or time.perf_counter() > end_time:
+                return found_objective_value, found_path, [], expanded
+            node = stack.pop()
+            sums, depth, path = node
+            if depth == numitems:
+                new_objective_value = self.objective.value_to_minimize(sums)
+                if new_objective_value < best_objective_value:
+                    best_objective_value = found_objective_value = new_objective_value
+                    found_path = path
+                    with shared_best.get_lock():
+                        shared_best.value = min(shared_best.value, new_objective_value)
+                continue
+            stack.extend(reversed(self.children(node, best_objective_value)))
+            expanded += 1
+        return found_objective_value, found_path, stack[::-1], expanded
+
+
+_subtree_search, _shared_best = None, None
+
+def _init_subtree_search(search: _SubtreeSearch, shared_best):
+    global _subtree_search, _shared_best
+    _subtree_search, _shared_best = search, shared_best
+
+def _search_subtree(root: Tuple, time_limit: float):
+    """
+    A task of `anytime_parallel`, run in a worker process.
+    """
+    return _subtree_search.search(root, _shared_best, time_limit)
+
+
+def _path_to_list(path: Tuple) -> List[int]:
+    """
+    >>> _path_to_list(((None, 0), 2))
+    [0, 2]
+    """
+    bin_indices = []
+    while path is not None:
+        path, bin_index = path
+        bin_indices.append(bin_index)
+    return bin_indices[::-1]
+
+
 if __name__ == "__main__":
     import doctest, sys
     (failures, tests) = doctest.testmod(report=True, optionflags=doctest.FAIL_FAST)
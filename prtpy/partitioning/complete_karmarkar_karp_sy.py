@@ -13,18 +13,21 @@ from prtpy import outputtypes as out, objectives as obj, Binner, BinsArray
 import logging, numpy as np
 
 from prtpy.partitioning.karmarkar_karp_sy import BinsSortedByMaxDiff
+from prtpy.partitioning.warm_start import best_heuristic_solution
 
 
 logger = logging.getLogger(__name__)
 
 
-def _possible_partition_difference_lower_bound(current_heap: BinsSortedByMaxDiff, numbins: int) -> int:
+def _possible_partition_difference_lower_bound(current_heap: BinsSortedByMaxDiff, numbins: int, new_sums: List[float] = ()) -> int:
     """
     This function check if from the current node we can yield to a better partition or not by checking the
     best difference we can reach from this node.
+    new_sums are the sums of a bins-array that should be considered as part of the heap, although it was not pushed yet.
     """
     logger.info("  A heap with %d partitions", len(current_heap))
     sums_flattened = [size for binsarray in current_heap.iterator() for size in current_heap.binner.sums(binsarray)]
+    sums_flattened.extend(new_sums)
     max_sums_flattened = max(sums_flattened)
     sum_sums_flattened = sum(sums_flattened)
     lower_bound = -(max_sums_flattened - (sum_sums_flattened - max_sums_flattened) // (numbins - 1))
@@ -32,13 +35,37 @@ def _possible_partition_difference_lower_bound(current_heap: BinsSortedByMaxDiff
     return lower_bound
 
 
+def _combinations(binner: Binner, heap: BinsSortedByMaxDiff, bins1: BinsArray, bins2: BinsArray) -> List[Tuple]:
+    """
+    Return stack entries for all the combinations of bins1 and bins2, in the order they should be pushed to the stack.
+    Only the sums of each combination are computed here; its contents are built only if it is explored (see `_explore`).
+    """
+    entries = [(heap, (bins1, bins2, perm, new_sums)) for perm, new_sums in binner.combination_sums(bins1, bins2)]
+    entries.sort(key=lambda entry: heap.topdiff_after_push(entry[1][3]))
+    return entries
+
+
+def _explore(binner: Binner, heap: BinsSortedByMaxDiff, combination: Tuple) -> BinsSortedByMaxDiff:
+    """
+    Return the heap of a stack entry: the given heap, with the bins-array of the given combination (if any) pushed into a clone.
+    """
+    if combination is None:
+        return heap
+    bins1, bins2, perm, _ = combination
+    new_heap = heap.clone()
+    new_heap.push(binner.combine_by_permutation(bins1, bins2, perm), is_sorted=True)
+    return new_heap
+
 
-def optimal(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
+def optimal(binner: Binner, numbins: int, items: List[any], upper_bound: float = np.inf, initial_solution: Any = None) -> BinsArray:
     """
     Finds a partition in which the largest sum is minimal, using the Complete Greedy algorithm.
 
     :param objective: represents the function that should be optimized. Default is minimizing the difference between bin sums.
     :param time_limit: determines how much time (in seconds) the function should run before it stops. Default is infinity.
+    :param upper_bound: only partitions whose difference is smaller than this are searched. Default is infinity.
+    :param initial_solution: a partition (bins-array of the given binner) with numbins bins, whose difference is used as an upper bound from the first node.
+      It is returned if no better partition is found. If it is "heuristics", the best partition of the heuristics in warm_start.HEURISTICS is used.
 
     >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums, printbins
     >>> printbins(optimal(BinnerKeepingContents(), 2, [4,5,6,7,8]))
@@ -53,47 +80,72 @@ def optimal(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     Bin #1: [13, 46], sum=59.0
     Bin #2: [10, 26, 27], sum=63.0
 
-    >>> optimal(BinnerKeepingSums(), 5, items=[1, 2, 3, 4, 5])
+    >>> list(optimal(BinnerKeepingSums(), 5, items=[1, 2, 3, 4, 5]))
     [1.0, 2.0, 3.0, 4.0, 5.0]
 
-    >>> optimal(BinnerKeepingSums(), 5, items=[1,9,8,2,3,7,6,5,4])
+    >>> list(optimal(BinnerKeepingSums(), 5, items=[1,9,8,2,3,7,6,5,4]))
     [9.0, 9.0, 9.0, 9.0, 9.0]
 
+    Start from the best partition of fast heuristics, which is returned if it is optimal:
+    >>> printbins(optimal(BinnerKeepingContents(), 3, walter_numbers, initial_solution="heuristics"))
+    Bin #0: [16, 39], sum=55.0
+    Bin #1: [13, 46], sum=59.0
+    Bin #2: [10, 26, 27], sum=63.0
+    >>> print(optimal(BinnerKeepingSums(), 3, walter_numbers, upper_bound=8))
+    None
+
     Partitioning items with names:
     >>> from prtpy import partition, outputtypes as out
     >>> partition(algorithm=optimal, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
-    [['a', 'g'], ['c', 'd', 'e'], ['b', 'f']]
+    [['a', 'f'], ['c', 'd', 'e'], ['b', 'g']]
     >>> partition(algorithm=optimal, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
-    [16.0, 16.0]
+    [16, 16]
 
     Randomly-found example:
     >>> example_2022_07_11 = [62,  93,  99, 129, 158, 187, 199, 212]
     >>> partition(algorithm=optimal, numbins=5, items=example_2022_07_11, outputtype=out.PartitionAndSums)
-    Bin #0: [199], sum=199.0
-    Bin #1: [212], sum=212.0
-    Bin #2: [99, 129], sum=228.0
-    Bin #3: [62, 187], sum=249.0
-    Bin #4: [93, 158], sum=251.0
+    Bin #0: [199], sum=199
+    Bin #1: [212], sum=212
+    Bin #2: [99, 129], sum=228
+    Bin #3: [62, 187], sum=249
+    Bin #4: [93, 158], sum=251
     """
     numitems = len(items)
     logger.info("\nComplete-Karmarkar-Karp Partitioning of %d items into %d parts.", numitems, numbins)
     items = sorted(items, reverse=True, key=binner.valueof)
 
-    stack = []  #: List[List[Tuple[int, int, Bins, List[int]]]]
+    stack = []  #: List[Tuple[heap, combination]] - see _combinations
     first_heap = BinsSortedByMaxDiff(binner)
     for item in items:
-        new_bins = binner.add_item_to_bin(binner.new_bins(numbins), item=item, bin_index=numbins-1)
-        first_heap.push(new_bins)
-    stack.append(first_heap)
-
-    best_difference_so_far = -np.inf  # maybe insert here upper bound constraint : best = upper
+        new_bins = binner.add_and_resort(binner.new_bins(numbins), item=item, bin_index=numbins-1)
+        first_heap.push(new_bins, is_sorted=True)
+    stack.append((first_heap, None))
+
+    # The differences are kept as non-positive numbers, so the upper bound on the difference is a lower bound on them.
+    best_difference_so_far, best_partition_so_far = -upper_bound, None
+    if isinstance(initial_solution, str):
+        if initial_solution != "heuristics":
+            raise ValueError(f"initial_solution should be a bins-array or 'heuristics', but it is {initial_solution}")
+        initial_solution, _ = best_heuristic_solution(binner, numbins, items, obj.MinimizeDifference)
+    if initial_solution is not None:
+        if binner.numbins(initial_solution) != numbins:
+            raise ValueError(f"initial_solution should have {numbins} bins, but it has {binner.numbins(initial_solution)}")
+        initial_difference = -obj.MinimizeDifference.value_to_minimize(binner.sums(initial_solution))
+        logger.info("  Initial solution difference: %s", -initial_difference)
+        if initial_difference > best_difference_so_far:
+            best_difference_so_far, best_partition_so_far = initial_difference, binner.copy_bins(initial_solution)
+            if initial_difference == 0:
+                binner.sort_by_ascending_sum(best_partition_so_far)
+                return best_partition_so_far
     while stack:
-        current_heap = stack.pop()
+        current_heap, combination = stack.pop()
 
         # if could lead to better partition - maybe insert here upper bound constraint
-        lower_bound = _possible_partition_difference_lower_bound(current_heap, numbins) 
+        new_sums = () if combination is None else combination[3]
+        lower_bound = _possible_partition_difference_lower_bound(current_heap, numbins, new_sums)
         if lower_bound <= best_difference_so_far:
             continue
+        current_heap = _explore(binner, current_heap, combination)
 
         # if could lead to complete partition
         if len(current_heap) == 1:
@@ -111,16 +163,10 @@ def optimal(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
         bins1 = current_heap.pop()
         bins2 = current_heap.pop()
 
-        tmp_stack_extension = []
-
-        # for new_bins in bins1.all_combinations(bins2):
-        for new_bins in binner.all_combinations(bins1, bins2):
-            tmp_heap = current_heap.clone()
-            tmp_heap.push(new_bins)
-            tmp_stack_extension.append(tmp_heap)
-        tmp_stack_extension.sort(key=lambda heap: heap.topdiff())
-        stack.extend(tmp_stack_extension)
+        stack.extend(_combinations(binner, current_heap, bins1, bins2))
 
+    if best_partition_so_far is None:
+        return None
     binner.sort_by_ascending_sum(best_partition_so_far)
     return best_partition_so_far
 
@@ -135,21 +181,21 @@ def generator(
            other: yield partitions with upper bound "best" on the difference.
 
     >>> from prtpy import partition, BinnerKeepingContents, BinnerKeepingSums
-    >>> for part in generator(BinnerKeepingSums(), 4, items=[1,2,3,3,5,9,9]): part
+    >>> for part in generator(BinnerKeepingSums(), 4, items=[1,2,3,3,5,9,9]): list(part)
     [7.0, 7.0, 9.0, 9.0]
     >>> for part in generator(BinnerKeepingContents(), 4, items=[1, 3, 3, 4, 4, 5, 5, 5]): part
-    ([6.0, 8.0, 8.0, 8.0], [[1, 5], [4, 4], [3, 5], [3, 5]])
+    (array([6., 8., 8., 8.]), [[1, 5], [4, 4], [3, 5], [3, 5]])
     """
     numitems = len(items)
     logger.info("\nComplete-Karmarkar-Karp Partitioning of %d items into %d parts.", numitems, numbins)
     items = sorted(items, reverse=True, key=binner.valueof)
 
-    stack = []  #: List[List[Tuple[int, int, Bins, List[int]]]]
+    stack = []  #: List[Tuple[heap, combination]] - see _combinations
     first_heap = BinsSortedByMaxDiff(binner)
     for item in items:
-        new_bins = binner.add_item_to_bin(binner.new_bins(numbins), item=item, bin_index=numbins-1)
-        first_heap.push(new_bins)
-    stack.append(first_heap)
+        new_bins = binner.add_and_resort(binner.new_bins(numbins), item=item, bin_index=numbins-1)
+        first_heap.push(new_bins, is_sorted=True)
+    stack.append((first_heap, None))
 
     logger.info(f"we create the stack - all stack items are possibles branches in the tree (we then combine them in all possible ways). "
                 f"The stack: {stack}")
@@ -159,12 +205,14 @@ def generator(
                 f"True means we search for the best partition, "
                 f"False means we search for partitions with bounded difference.")
     while stack:
-        current_heap = stack.pop()
+        current_heap, combination = stack.pop()
 
         # if could lead to better partition - maybe insert here upper bound constraint
-        lower_bound = _possible_partition_difference_lower_bound(current_heap, numbins) 
+        new_sums = () if combination is None else combination[3]
+        lower_bound = _possible_partition_difference_lower_bound(current_heap, numbins, new_sums)
         if lower_bound <= best_difference_so_far:
             continue
+        current_heap = _explore(binner, current_heap, combination)
 
         logger.info(f"This partition/s could lead to a better partition found so far: {current_heap}")
 
@@ -193,13 +241,7 @@ def generator(
         bins1 = current_heap.pop()
         bins2 = current_heap.pop()
 
-        tmp_stack_extension = []
-        for new_bins in binner.all_combinations(bins1, bins2):
-            tmp_heap = current_heap.clone()
-            tmp_heap.push(new_bins)
-            tmp_stack_extension.append(tmp_heap)
-        tmp_stack_extension.sort(key=lambda heap: heap.topdiff())
-        stack.extend(tmp_stack_extension)
+        stack.extend(_combinations(binner, current_heap, bins1, bins2))
 
 
 if __name__ == '__main__':
@@ -11,10 +11,13 @@ Since: 2022-02
 """
 
 from prtpy import outputtypes as out, objectives as obj
-from prtpy.binners import Binner, BinnerKeepingContents, BinnerKeepingSums, printbins
+from prtpy.binners import Binner, BinsArray, BinnerKeepingContents, BinnerKeepingSums, BinnerKeepingSumsInList, BatchBinner, printbins, convert_bins
+from prtpy.partitioning.greedy import greedy
+from prtpy.partitioning.karmarkar_karp_sy import kk
+from prtpy.partitioning.warm_start import best_heuristic_solution
 from typing import List, Any, Tuple
-from dataclasses import dataclass
-import logging, numpy as np
+import itertools, logging, math, os, tempfile, multiprocessing, numpy as np
+from multiprocessing import shared_memory
 
 logger = logging.getLogger(__name__)
 
@@ -31,18 +34,18 @@ def optimal(
 
     >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums
     >>> printbins(optimal(BinnerKeepingContents(), 2, [1,1,1,1,2], objective=obj.MaximizeSmallestSum))
-    Bin #0: [1, 1, 1], sum=3.0
-    Bin #1: [1, 2], sum=3.0
+    Bin #0: [2, 1], sum=3.0
+    Bin #1: [1, 1, 1], sum=3.0
 
     >>> walter_numbers = [46, 39, 27, 26, 16, 13, 10]
     >>> printbins(optimal(BinnerKeepingContents(), 3, walter_numbers, objective=obj.MinimizeDifference))
-    Bin #0: [39, 16], sum=55.0
-    Bin #1: [46, 13], sum=59.0
+    Bin #0: [46, 13], sum=59.0
+    Bin #1: [39, 16], sum=55.0
     Bin #2: [27, 26, 10], sum=63.0
     >>> printbins(optimal(BinnerKeepingContents(), 3, walter_numbers, objective=obj.MinimizeLargestSum))
-    Bin #0: [46, 16], sum=62.0
+    Bin #0: [27, 26], sum=53.0
     Bin #1: [39, 13, 10], sum=62.0
-    Bin #2: [27, 26], sum=53.0
+    Bin #2: [46, 16], sum=62.0
     >>> printbins(optimal(BinnerKeepingSums(), 3, walter_numbers, objective=obj.MaximizeSmallestSum))
     Bin #0: sum=56.0
     Bin #1: sum=56.0
@@ -50,9 +53,46 @@ def optimal(
 
     >>> from prtpy import partition
     >>> partition(algorithm=optimal, numbins=3, items={"a":46, "b":39, "c":27, "d":26, "e":16, "f":13, "g":10}, objective=obj.MinimizeDifference, outputtype=out.Partition)
-    [['b', 'e'], ['a', 'f'], ['c', 'd', 'g']]
+    [['a', 'f'], ['b', 'e'], ['c', 'd', 'g']]
+
+    With epsilon, the states are trimmed to a geometric grid, so their number is polynomial even for large values,
+    and the largest (or smallest) sum is within a factor 1+epsilon of the optimal one.
+    The difference between sums has no such guarantee (the optimal difference may be 0), so epsilon is not supported for MinimizeDifference:
+    >>> large_numbers = [n*10**9 + 7*n*n for n in walter_numbers]
+    >>> exact = optimal(BinnerKeepingSums(dtype=int), 3, large_numbers, objective=obj.MinimizeLargestSum)
+    >>> approximate = optimal(BinnerKeepingSums(dtype=int), 3, large_numbers, objective=obj.MinimizeLargestSum, epsilon=0.1)
+    >>> bool(max(approximate) <= 1.1*max(exact))
+    True
+    >>> optimal(BinnerKeepingSums(dtype=int), 3, large_numbers, objective=obj.MinimizeDifference, epsilon=0.1)
+    Traceback (most recent call last):
+    ...
+    ValueError: epsilon is not supported for minimize-largest-difference, since the difference has no approximation guarantee
+
+    With few distinct values, the copies of each value are handled together, so the number of layers is much smaller than the number of items:
+    >>> printbins(optimal(BinnerKeepingSums(), 4, [17]*300 + [11]*200 + [5]*100, objective=obj.MinimizeLargestSum))
+    Bin #0: sum=1950.0
+    Bin #1: sum=1950.0
+    Bin #2: sum=1950.0
+    Bin #3: sum=1950.0
     """
-    if isinstance(binner, BinnerKeepingSums):
+    if kwargs.get("epsilon") is not None and isinstance(objective, obj.MinimizeTheDifference):
+        raise ValueError(f"epsilon is not supported for {objective}, since the difference has no approximation guarantee")
+    items = list(items)
+    if numbins == 2:
+        values = _small_integer_values(binner, items)
+        if values is not None:
+            # Two-way partitioning is a subset-sum problem, which is solved much faster with a bitset.
+            return _optimal_two_way(binner, items, values, objective)
+    if kwargs.get("numprocesses") is not None:
+        # Expand each layer in parallel.
+        return _optimal_parallel(binner, numbins, items, objective, **kwargs)
+    if kwargs.get("directory") is not None:
+        # The states may not fit in memory, so they are kept in files.
+        return _optimal_out_of_core(binner, numbins, items, objective, **kwargs)
+    if len(set(map(binner.valueof, items))) <= len(items)/2:
+        # Many items have equal values, so several copies can be handled in each layer.
+        return _optimal_high_multiplicity(binner, numbins, items, objective, **kwargs)
+    if isinstance(binner, BinnerKeepingContents):
         # We need the entire partition.
         return _optimal_partition(binner, numbins, items, objective, **kwargs)
     else:
@@ -65,113 +105,831 @@ def optimal(
 def _optimal_sums(
     binner: Binner, numbins: int, items: List[any],
     objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    epsilon: float = None,
 ):
     """
     A DP that computes only the optimal sums in the bins (not the optimal partition itself).
 
     The states are of the form  (v1, v2, ..., vn) where n is the number of bins.
     The "vi" is the current sum in bin i.
+    Each layer of states is kept in a single numpy matrix (see BatchBinner), so the states are expanded,
+    sorted and deduplicated by vectorized operations.
+    If use_lower_bound is True, states that cannot lead to a better solution than the initial one (see `_initial_solution`) are pruned.
+    If epsilon is given, the DP is approximate: states are trimmed to a geometric grid (see `_unique_states`);
+    the guarantee holds for the largest or smallest sum only, not for the difference (see `optimal`).
+
+    >>> printbins(_optimal_sums(BinnerKeepingSums(dtype=int), 4, [46, 39, 27, 26, 16, 13, 10, 7, 3]))
+    Bin #0: sum=46
+    Bin #1: sum=46
+    Bin #2: sum=46
+    Bin #3: sum=49
+    >>> printbins(_optimal_sums(BinnerKeepingSums(dtype=int), 4, [46, 39, 27, 26, 16, 13, 10, 7, 3], use_lower_bound=False))
+    Bin #0: sum=46
+    Bin #1: sum=46
+    Bin #2: sum=46
+    Bin #3: sum=49
     """
 
     logger.info("\nDynamic Programming %s Partitioning of %d items into %d bins.", objective, len(items), numbins)
+    items, sums_of_remaining_items, use_lower_bound = _sorted_items_for_pruning(binner, items, use_lower_bound)
+    if use_lower_bound:
+        best_bins, best_objective_value = _initial_solution(binner, numbins, items, objective)
 
-    first_state = binner.new_bins(numbins)
+    grid_ratio = _grid_ratio(epsilon, len(items))
+    batcher = BatchBinner(binner)
+    current_states = batcher.new_batch(numbins)
     num_of_processed_states = 1
-
-    # Construct initial states:
-    current_states = {tuple(binner.sums(first_state))}
-    for item in items:
-        value = binner.valueof(item)
-
-        # Construct next states:
-        next_states = set()
-        for state in current_states:
-            for ibin in range(numbins):
-                next_state = binner.add_item_to_bin(binner.copy_bins(state), item, ibin)
-                binner.sort_by_ascending_sum(next_state)
-                next_states.add(tuple(binner.sums(next_state)))
-        states_added = len(next_states)
+    for depth, item in enumerate(items):
+        next_states, _, _ = batcher.add_item_to_each_bin(current_states, item)
+        if use_lower_bound:
+            next_states = next_states[objective.lower_bounds(next_states, sums_of_remaining_items[depth+1]) < best_objective_value]
+        current_states, _ = _unique_states(batcher, next_states, grid_ratio)
+        states_added = len(current_states)
         logger.info("  Processed item %s and added %d states.", item, states_added)
         num_of_processed_states += states_added
-        current_states = next_states
 
+    logger.info("Processed %d states.", num_of_processed_states)
     if len(current_states) == 0:
+        if use_lower_bound:   # no state is better than the initial solution, so it is optimal.
+            return best_bins
         raise ValueError("No final states!")
-    best_final_state = min(current_states, key=objective.value_to_minimize)
+    best_final_state = current_states[np.argmin(objective.values_to_minimize(current_states))]
     best_final_state_value = objective.value_to_minimize(best_final_state)
-    logger.info("Processed %d states.", num_of_processed_states)
     logger.info("Best final state: %s, value: %s", best_final_state, best_final_state_value)
-    return best_final_state
+    return convert_bins(list(best_final_state), BinnerKeepingSumsInList(binner.valueof), binner)
+
+
+def _sorted_items_for_pruning(binner: Binner, items: List[Any], use_lower_bound: bool) -> Tuple[List[Any], List[float], bool]:
+    """
+    Prepare the items for a DP that prunes by lower bounds: sort them by descending value, so that the bounds become tight early,
+    and compute the sums of the remaining items after each depth.
+    The bounds of the objectives round the sums to integers, so pruning is disabled when some value is not an integer.
+
+    >>> _sorted_items_for_pruning(BinnerKeepingSums(), [2, 5, 3], True)
+    ([5, 3, 2], [10, 5, 2, 0], True)
+    >>> _sorted_items_for_pruning(BinnerKeepingSums(), [2, 5, 3.5], True)
+    ([2, 5, 3.5], None, False)
+    """
+    if not use_lower_bound or len(items)==0:
+        return items, None, False
+    values = binner.values_of(items)
+    if values.dtype.kind not in "iu" and not all(float(value).is_integer() for value in values):
+        return items, None, False
+    order = np.argsort(-values, kind="stable")
+    sorted_items = [items[i] for i in order]
+    sums_of_remaining_items = np.cumsum(values[order][::-1])[::-1].tolist() + [0]
+    return sorted_items, sums_of_remaining_items, True
+
+
+def _initial_solution(binner: Binner, numbins: int, items: List[Any], objective: obj.Objective) -> Tuple[BinsArray, float]:
+    """
+    Return the better of the greedy and the Karmarkar-Karp partitions, and its objective value.
+    It is an upper bound on the optimal value, used for pruning the states of the DP.
+    With MinimizeLargestSum, this also discards every state whose largest sum is at least the upper bound,
+    since the largest sum is part of its lower bound.
+
+    >>> _initial_solution(BinnerKeepingSums(dtype=int), 2, [8,7,6,5,4], obj.MinimizeDifference)
+    (array([14, 16]), 2)
+    """
+    best_bins, best_objective_value = best_heuristic_solution(binner, numbins, items, objective, algorithms=[greedy, kk])
+    logger.info("  Initial solution value: %s", best_objective_value)
+    return best_bins, best_objective_value
+
+
+def _grid_ratio(epsilon: float, numitems: int) -> float:
+    """
+    The ratio of the geometric grid to which the states are trimmed in each of the numitems layers,
+    such that the accumulated error is at most a factor of 1+epsilon (for epsilon <= 1):  (1+epsilon/(2n))**n <= e**(epsilon/2) <= 1+epsilon.
+
+    >>> _grid_ratio(0.1, 5)
+    1.01
+    >>> _grid_ratio(None, 5) is None
+    True
+    """
+    if epsilon is None:
+        return None
+    if not 0 < epsilon <= 1:
+        raise ValueError(f"epsilon should be in (0,1], but it is {epsilon}")
+    return 1 + epsilon/(2*max(numitems,1))
+
+
+def _unique_states(batcher: BatchBinner, states: np.ndarray, grid_ratio: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the distinct states, and the index of the first occurrence of each of them.
+    If grid_ratio is given, states in which each sum is in the same cell of the geometric grid
+    {0}, ..., [r^-1,1), [1,r), [r,r^2), ...  are considered identical, and only the first of them is kept.
+    The kept state is then within a factor r of each removed state in every bin, so the errors grow by at most a factor r per layer.
+
+    >>> batcher = BatchBinner(BinnerKeepingSums(dtype=int))
+    >>> _unique_states(batcher, np.array([[0, 100], [0, 104], [0, 111], [0, 100]]))
+    (array([[  0, 100],
+           [  0, 104],
+           [  0, 111]]), array([0, 1, 2]))
+    >>> _unique_states(batcher, np.array([[0, 100], [0, 104], [0, 111], [0, 100]]), grid_ratio=1.1)
+    (array([[  0, 100],
+           [  0, 111]]), array([0, 2]))
+    """
+    if grid_ratio is None or len(states) == 0:
+        return batcher.unique(states)
+    float_states = states.astype(float)
+    is_positive = float_states > 0
+    grid_cells = np.zeros(states.shape, dtype=np.int64)
+    grid_cells[is_positive] = np.floor(np.log(float_states[is_positive]) / np.log(grid_ratio))
+    grid_cells[~is_positive] = grid_cells[is_positive].min()-1 if is_positive.any() else 0   # zero is in a cell of its own.
+    _, indices = batcher.unique(grid_cells - grid_cells.min())
+    indices = np.sort(indices)
+    return states[indices], indices
+
+
+MAX_BITSET_SIZE = 2**30   # In bits. Above this size, the bitset operations become too slow and use too much memory.
+CHUNK_SIZE = 2**13        # Number of bytes of the final bitset that are evaluated at once.
+
+def _small_integer_values(binner: Binner, items: List[Any])->List[int]:
+    """
+    If the item values are non-negative integers, whose sum is small enough for a bitset of subset sums, return them as Python ints.
+    Otherwise, return None.
+    """
+    if np.dtype(binner.dtype).kind not in "iu":
+        return None
+    values = [int(binner.valueof(item)) for item in items]
+    if len(values)==0 or min(values) < 0:
+        return None
+    half_sum = sum(values)//2
+    # A bitset of subset sums has half_sum bits, but there are at most 2**len(values) subset sums.
+    if half_sum >= MAX_BITSET_SIZE or half_sum >= 2**len(values) * 64:
+        return None
+    return values
+
+
+def _optimal_two_way(
+    binner: Binner, items: List[Any], values: List[int],
+    objective: obj.Objective = obj.MinimizeDifference,
+):
+    """
+    An optimal partition into two bins of items with non-negative integer values.
+
+    The states are the subset sums of the items, kept in a bitset (a Python int): bit t is 1 iff some subset has sum t.
+    Adding an item with value v is a single operation:  reach |= reach << v.
+    Only sums up to half the total are kept, since the smaller sum determines the entire state.
+    To reconstruct the partition, the bitsets are checkpointed every sqrt(n) items, and recomputed block by block from the last item back.
+
+    >>> printbins(_optimal_two_way(BinnerKeepingContents(dtype=int), [4,5,6,7,8], [4,5,6,7,8]))
+    Bin #0: [4, 5, 6], sum=15
+    Bin #1: [7, 8], sum=15
+    >>> printbins(_optimal_two_way(BinnerKeepingSums(dtype=int), [1,2,3,3,5,9,9], [1,2,3,3,5,9,9], objective=obj.MinimizeLargestSum))
+    Bin #0: sum=16
+    Bin #1: sum=16
+    """
+    numitems = len(values)
+    total_sum = sum(values)
+    half_sum = total_sum//2
+    mask = (1 << (half_sum+1)) - 1
+    block_size = max(1, math.isqrt(numitems))
+    logger.info("\nBitset Dynamic Programming %s Partitioning of %d items into 2 bins, with %d bits.", objective, numitems, half_sum+1)
+
+    checkpoints = []  # checkpoints[j] is the bitset before the item j*block_size.
+    reach = 1
+    for index, value in enumerate(values):
+        if index % block_size == 0:
+            checkpoints.append(reach)
+        reach = (reach | (reach << value)) & mask
+
+    reach_bytes = np.frombuffer(reach.to_bytes(half_sum//8+1, "little"), dtype=np.uint8)
+    best_sum, best_value, num_of_reachable_sums = None, None, 0
+    for start in range(0, len(reach_bytes), CHUNK_SIZE):   # evaluate the final states in chunks, to keep the batches small
+        chunk = np.flatnonzero(np.unpackbits(reach_bytes[start:start+CHUNK_SIZE], bitorder="little")) + 8*start
+        if len(chunk)==0:
+            continue
+        num_of_reachable_sums += len(chunk)
+        values_to_minimize = objective.values_to_minimize(np.column_stack((chunk, total_sum-chunk)))
+        ibest = np.argmin(values_to_minimize)
+        if best_value is None or values_to_minimize[ibest] < best_value:
+            best_sum, best_value = int(chunk[ibest]), values_to_minimize[ibest]
+    logger.info("%d reachable sums. Best final state: %s", num_of_reachable_sums, (best_sum, total_sum-best_sum))
+    if not isinstance(binner, BinnerKeepingContents):
+        return convert_bins([best_sum, total_sum-best_sum], BinnerKeepingSumsInList(binner.valueof), binner)
+
+    # construct the subset with the best sum, from the last item back
+    in_smaller_bin = [False]*numitems
+    target = best_sum    # invariant: target is reachable by the items before the current block and inside it.
+    for iblock in reversed(range(len(checkpoints))):
+        start = iblock*block_size
+        end = min(start+block_size, numitems)
+        layers = [checkpoints[iblock]]  # layers[j] is the bitset before the item start+j.
+        for index in range(start, end-1):
+            layers.append((layers[-1] | (layers[-1] << values[index])) & mask)
+        for index in reversed(range(start, end)):
+            if not (layers[index-start] >> target) & 1:
+                in_smaller_bin[index] = True
+                target -= values[index]
+
+    result_bins = binner.new_bins(2)
+    for item, is_in_smaller_bin in zip(items, in_smaller_bin):
+        binner.add_item_to_bin(result_bins, item, 0 if is_in_smaller_bin else 1)
+    return result_bins
 
 
 def _optimal_partition(
     binner: Binner, numbins: int, items: List[any],
     objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    epsilon: float = None,
 ):
     """
     A DP that computes both the optimal sums and the optimal partition.
 
     The states are of the form  (v1, v2, ..., vn) where n is the number of bins.
     The "vi" is the current sum in bin i.
+    As in `_optimal_sums`, the states are sorted by ascending sum, so states that differ only in the order of the bins are kept once.
+    Only the states of the current layer are kept, in a numpy matrix. For the previous layers, only compact arrays of back-pointers are kept:
+    the parent state of each state, and the index of the bin (in the sorted parent state) to which the item was added.
+    The optimal path is reconstructed from them at the end.
+    If use_lower_bound is True, states that cannot lead to a better solution than the initial one (see `_initial_solution`) are pruned.
+    If epsilon is given, the DP is approximate: states are trimmed to a geometric grid (see `_unique_states`);
+    the guarantee holds for the largest or smallest sum only, not for the difference (see `optimal`).
+
+    >>> from prtpy import BinnerKeepingContents
+    >>> printbins(_optimal_partition(BinnerKeepingContents(), 3, [46, 39, 27, 26, 16, 13, 10], objective=obj.MinimizeLargestSum, use_lower_bound=False))
+    Bin #0: [27, 26], sum=53.0
+    Bin #1: [39, 13, 10], sum=62.0
+    Bin #2: [46, 16], sum=62.0
     """
     items = list(items)
-    # allow to iterate twice. See https://stackoverflow.com/q/70381559/827927
-    State = Tuple[float]
-
-    @dataclass
-    class StateRecord:
-        state: State
-        prev: Any  # StateRecord
-        ibin: int  # the index of the bin to which the last item was added in order to get to this state.
-        def __hash__(self):
-            return hash(self.state)
-        def __eq__(self, other):
-            return self.state == other.state
-
-    # Construct initial states:
-    zero_values = numbins * (0,)
-    current_state_records = {StateRecord(zero_values, None, None)}
-    num_of_processed_states = len(current_state_records)
+    items, sums_of_remaining_items, use_lower_bound = _sorted_items_for_pruning(binner, items, use_lower_bound)
+    if use_lower_bound:
+        best_bins, best_objective_value = _initial_solution(binner, numbins, items, objective)
 
-    for item in items:
-        value = binner.valueof(item)
-
-        # Construct next state records:
-        next_state_records = set()
-        for record in current_state_records:
-            for ibin in range(numbins):
-                next_state = list(record.state)
-                next_state[ibin] += value
-                next_state_record = StateRecord(tuple(next_state), record, ibin)
-                next_state_records.add(next_state_record)
-        logger.info("  Processed item %s and added %d state reccords.", item, len(next_state_records))
-        num_of_processed_states += len(next_state_records)
-        current_state_records = next_state_records
+    grid_ratio = _grid_ratio(epsilon, len(items))
+    batcher = BatchBinner(binner)
+    current_states = batcher.new_batch(numbins)
+    num_of_processed_states = 1
+    layers = []   # For each item: the parent state and the bin of each state, in compact integer types.
+    for depth, item in enumerate(items):
+        numstates = len(current_states)   # the parents are indices of the current states, also after pruning.
+        next_states, parents, bins = batcher.add_item_to_each_bin(current_states, item)
+        if use_lower_bound:
+            is_promising = objective.lower_bounds(next_states, sums_of_remaining_items[depth+1]) < best_objective_value
+            next_states, parents, bins = next_states[is_promising], parents[is_promising], bins[is_promising]
+        current_states, unique_indices = _unique_states(batcher, next_states, grid_ratio)
+        layers.append((
+            parents[unique_indices].astype(np.min_scalar_type(numstates)),
+            bins[unique_indices].astype(np.min_scalar_type(numbins))))
+        logger.info("  Processed item %s and added %d states.", item, len(current_states))
+        num_of_processed_states += len(current_states)
 
     logger.info("Processed %d states.", num_of_processed_states)
-    if len(current_state_records) == 0:
+    if len(current_states) == 0:
+        if use_lower_bound:   # no state is better than the initial solution, so it is optimal.
+            return best_bins
         raise ValueError("No final states!")
-    best_final_record = min(
-        current_state_records, key=lambda record: objective.value_to_minimize(record.state)
-    )
+    best_row = int(np.argmin(objective.values_to_minimize(current_states)))
 
     # construct path to solution
-    path = []
-    record = best_final_record
-    while record.prev is not None:
-        path.insert(0, record.ibin)
-        record = record.prev
+    path = batcher.path_to_row(layers, best_row)
     logger.info("Path to best solution: %s", path)
 
-    # construct solution
+    # construct solution: the bin indices in the path are indices in the bins sorted by ascending sum.
     result_bins = binner.new_bins(numbins)
     for item_index, item in enumerate(items):
         ibin = path[item_index]
         logger.info("  Item %d (%s): bin %d", item_index, item, ibin,)
-        binner.add_item_to_bin(result_bins, item, ibin)
+        binner.add_and_resort(result_bins, item, ibin)
     return result_bins
 
 
+MAX_COMPOSITIONS = 2**8             # The maximum number of ways to distribute the copies handled in a single layer of the high-multiplicity DP.
+EXPANDED_STATES_PER_LAYER = 2**16   # Above this number of expanded states, the high-multiplicity DP handles a single copy per layer.
+
+def _optimal_high_multiplicity(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    epsilon: float = None,
+):
+    """
+    A DP for inputs with many items of equal value. It computes the optimal sums, and if the binner keeps contents, also the optimal partition.
+
+    The items are grouped by value. Each layer handles several copies of the same value at once:
+    each state is expanded by all the ways to distribute the copies among the bins (see `BatchBinner.add_copies_to_each_bin`).
+    So when the states are few, the number of layers depends on the number of distinct values, rather than on the number of items.
+    When the states are many, the distributions of many copies create many more states than adding the copies one by one,
+    so the number of copies in each layer is chosen by the number of states (see `_copies_per_layer`).
+    The back-pointers, pruning and epsilon-trimming are as in `_optimal_partition`.
+
+    >>> printbins(_optimal_high_multiplicity(BinnerKeepingSums(dtype=int), 3, [5]*10 + [3]*20 + [2]*7))
+    Bin #0: sum=41
+    Bin #1: sum=41
+    Bin #2: sum=42
+    >>> from prtpy import BinnerKeepingContents
+    >>> printbins(_optimal_high_multiplicity(BinnerKeepingContents(), 3, [46, 46, 46, 27, 27, 13, 13, 13, 13], objective=obj.MinimizeLargestSum, use_lower_bound=False))
+    Bin #0: [46, 13, 13], sum=72.0
+    Bin #1: [46, 27, 13], sum=86.0
+    Bin #2: [46, 27, 13], sum=86.0
+    """
+    items = list(items)
+    items, sums_of_remaining_items, use_lower_bound = _sorted_items_for_pruning(binner, items, use_lower_bound)
+    if use_lower_bound:
+        best_bins, best_objective_value = _initial_solution(binner, numbins, items, objective)
+    groups = _groups_of_equal_items(binner, items)
+    logger.info("\nHigh-multiplicity Dynamic Programming %s Partitioning of %d items with %d distinct values into %d bins.", objective, len(items), len(groups), numbins)
+
+    grid_ratio = _grid_ratio(epsilon, len(items))   # there are at most len(items) layers.
+    batcher = BatchBinner(binner)
+    current_states = batcher.new_batch(numbins)
+    num_of_processed_states = 1
+    compositions_of = {}   # number of copies -> the matrix of all the ways to distribute them among the bins.
+    keeps_contents = isinstance(binner, BinnerKeepingContents)   # otherwise, the back-pointers are not needed.
+    layer_items = []       # For each layer: the copies that it handled.
+    layers = []            # For each layer: the parent state and the composition of each state, in compact integer types.
+    depth = 0
+    for group in groups:
+        start = 0
+        while start < len(group) and len(current_states) > 0:
+            numcopies = _copies_per_layer(len(current_states), numbins, len(group)-start)
+            copies = group[start:start+numcopies]
+            start += numcopies
+            depth += numcopies
+            if numcopies not in compositions_of:
+                compositions_of[numcopies] = _compositions(numcopies, numbins)
+            compositions = compositions_of[numcopies]
+            numstates = len(current_states)   # the parents are indices of the current states, also after pruning.
+            next_states, parents, composition_indices = batcher.add_copies_to_each_bin(current_states, copies[0], compositions)
+            if use_lower_bound:
+                is_promising = objective.lower_bounds(next_states, sums_of_remaining_items[depth]) < best_objective_value
+                next_states, parents, composition_indices = next_states[is_promising], parents[is_promising], composition_indices[is_promising]
+            current_states, unique_indices = _unique_states(batcher, next_states, grid_ratio)
+            if keeps_contents:
+                layer_items.append(copies)
+                layers.append((
+                    parents[unique_indices].astype(np.min_scalar_type(numstates)),
+                    composition_indices[unique_indices].astype(np.min_scalar_type(len(compositions)))))
+            logger.info("  Processed %d copies of item %s and added %d states.", numcopies, copies[0], len(current_states))
+            num_of_processed_states += len(current_states)
+
+    logger.info("Processed %d states.", num_of_processed_states)
+    if len(current_states) == 0:
+        if use_lower_bound:   # no state is better than the initial solution, so it is optimal.
+            return best_bins
+        raise ValueError("No final states!")
+    best_row = int(np.argmin(objective.values_to_minimize(current_states)))
+    if not keeps_contents:
+        return convert_bins(list(current_states[best_row]), BinnerKeepingSumsInList(binner.valueof), binner)
+
+    # construct solution: the bin indices in each composition are indices in the bins sorted by ascending sum.
+    path = batcher.path_to_row(layers, best_row)
+    result_bins = binner.new_bins(numbins)
+    for copies, composition_index in zip(layer_items, path):
+        composition = compositions_of[len(copies)][composition_index]
+        remaining_copies = iter(copies)
+        for ibin, numcopies in enumerate(composition):
+            for _ in range(numcopies):
+                binner.add_item_to_bin(result_bins, next(remaining_copies), ibin)
+        binner.sort_by_ascending_sum(result_bins)
+    return result_bins
+
+
+def _groups_of_equal_items(binner: Binner, items: List[Any]) -> List[List[Any]]:
+    """
+    Group the items by their value, in the order of their first appearance.
+
+    >>> _groups_of_equal_items(BinnerKeepingSums(), [5, 3, 5, 2, 3, 5])
+    [[5, 5, 5], [3, 3], [2]]
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(binner.valueof(item), []).append(item)
+    return list(groups.values())
+
+
+def _copies_per_layer(numstates: int, numbins: int, numcopies: int) -> int:
+    """
+    The number of copies (out of the given numcopies) that a layer with the given number of states should handle:
+    the largest number whose distributions among the bins are at most MAX_COMPOSITIONS,
+    and expand the states to at most EXPANDED_STATES_PER_LAYER states, but at least 1.
+
+    >>> [_copies_per_layer(1, numbins, 1000) for numbins in [1, 2, 3, 4, 10]]
+    [1000, 255, 21, 9, 3]
+    >>> [_copies_per_layer(numstates, 3, 1000) for numstates in [100, 1000, 10000, 100000]]
+    [21, 9, 2, 1]
+    >>> _copies_per_layer(1, 3, 5)
+    5
+    """
+    copies = 1
+    while copies < numcopies:
+        numcompositions = math.comb(copies+1+numbins-1, numbins-1)
+        if numcompositions > MAX_COMPOSITIONS or numstates*numcompositions > EXPANDED_STATES_PER_LAYER:
+            break
+        copies += 1
+    return copies
+
+
+def _compositions(numcopies: int, numbins: int) -> np.ndarray:
+    """
+    All the ways to distribute the given number of identical copies among the given number of bins:
+    a matrix with a row per distribution, and a column per bin.
+
+    >>> _compositions(2, 3)
+    array([[0, 0, 2],
+           [0, 1, 1],
+           [0, 2, 0],
+           [1, 0, 1],
+           [1, 1, 0],
+           [2, 0, 0]])
+    """
+    # "Stars and bars": choose the positions of the numbins-1 bars among numcopies+numbins-1 places.
+    bars = np.array(list(itertools.combinations(range(numcopies+numbins-1), numbins-1)), dtype=np.int64).reshape(-1, numbins-1)
+    bounds = np.column_stack((np.full(len(bars), -1), bars, np.full(len(bars), numcopies+numbins-1)))
+    return np.diff(bounds, axis=1) - 1
+
+
+STATES_IN_MEMORY = 2**20  # Default number of states that the out-of-core DP reads into memory at once.
+
+def _optimal_out_of_core(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    epsilon: float = None,
+    directory: str = None,
+    states_in_memory: int = STATES_IN_MEMORY,
+):
+    """
+    The same DP as `_optimal_sums` and `_optimal_partition`, for state sets that do not fit in memory.
+
+    Each layer is kept in a memory-mapped file of fixed-width records, sorted and distinct:
+    the record of a state is its sums in big-endian order, so the byte order of the records is the lexicographic order of the states.
+    The next layer is built by expanding the current layer in chunks of states_in_memory states;
+    each chunk is pruned, sorted and deduplicated into a run file, and the runs are merged by a streaming k-way merge
+    that also removes the duplicates across runs. If the partition is needed, the back-pointers of each layer are kept in files too.
+    The files are created in a temporary sub-directory of the given directory (or of the default temporary directory), which is removed at the end.
+
+    >>> from prtpy import BinnerKeepingContents
+    >>> printbins(_optimal_out_of_core(BinnerKeepingContents(dtype=int), 3, [46, 39, 27, 26, 16, 13, 10], objective=obj.MinimizeLargestSum, use_lower_bound=False, states_in_memory=10))
+    Bin #0: [27, 26], sum=53
+    Bin #1: [39, 13, 10], sum=62
+    Bin #2: [46, 16], sum=62
+    >>> printbins(_optimal_out_of_core(BinnerKeepingSums(dtype=int), 4, [46, 39, 27, 26, 16, 13, 10, 7, 3], states_in_memory=10))
+    Bin #0: sum=46
+    Bin #1: sum=46
+    Bin #2: sum=46
+    Bin #3: sum=49
+    """
+    items = list(items)
+    values = binner.values_of(items)
+    if values.dtype.kind not in "iuf" or (len(values) > 0 and values.min() < 0):
+        raise ValueError(f"The out-of-core DP requires non-negative values of a numeric dtype, but the values are of dtype {values.dtype}")
+    logger.info("\nOut-of-core Dynamic Programming %s Partitioning of %d items into %d bins.", objective, len(items), numbins)
+    items, sums_of_remaining_items, use_lower_bound = _sorted_items_for_pruning(binner, items, use_lower_bound)
+    if use_lower_bound:
+        best_bins, best_objective_value = _initial_solution(binner, numbins, items, objective)
+    grid_ratio = _grid_ratio(epsilon, len(items))
+    keeps_contents = isinstance(binner, BinnerKeepingContents)
+    batcher = BatchBinner(binner)
+    columns = ["states", "parents", "bins"] if keeps_contents else ["states"]     # the files of each layer.
+    dtypes = [_record_dtype(numbins), np.int64, np.min_scalar_type(numbins)]
+    num_of_processed_states = 1
+
+    with tempfile.TemporaryDirectory(prefix="prtpy-dp-", dir=directory) as tmpdir:
+        layer_path = lambda depth, column: os.path.join(tmpdir, f"layer{depth}.{column}")
+        with open(layer_path(0, "states"), "wb") as file:
+            file.write(_states_to_records(batcher.new_batch(numbins)).tobytes())
+        current_records = _load_records(layer_path(0, "states"), dtypes[0])
+
+        for depth, item in enumerate(items):
+            # Expand the current layer, chunk by chunk, into sorted runs of distinct states:
+            run_paths = []
+            for start in range(0, len(current_records), states_in_memory):
+                current_states = _records_to_states(current_records[start:start+states_in_memory], numbins, batcher.dtype)
+                next_states, parents, bins = batcher.add_item_to_each_bin(current_states, item)
+                parents += start
+                if use_lower_bound:
+                    is_promising = objective.lower_bounds(next_states, sums_of_remaining_items[depth+1]) < best_objective_value
+                    next_states, parents, bins = next_states[is_promising], parents[is_promising], bins[is_promising]
+                next_states, unique_indices = _unique_states(batcher, next_states, grid_ratio)
+                records = _states_to_records(next_states)
+                order = np.argsort(records, kind="stable")
+                run_path = os.path.join(tmpdir, f"run{len(run_paths)}")
+                for column, dtype, values_of_column in zip(columns, dtypes, [records, parents[unique_indices], bins[unique_indices]]):
+                    with open(f"{run_path}.{column}", "wb") as file:
+                        file.write(values_of_column[order].astype(dtype).tobytes())
+                run_paths.append(run_path)
+
+            # Merge the runs into the next layer:
+            runs = [[_load_records(f"{run_path}.{column}", dtype) for column, dtype in zip(columns, dtypes)] for run_path in run_paths]
+            outputs = [open(layer_path(depth+1, column), "wb") for column in columns]
+            try:
+                _merge_runs(runs, outputs, block_size=max(1, states_in_memory // max(1, len(runs))))
+            finally:
+                for file in outputs:
+                    file.close()
+            del runs, current_records
+            for run_path in run_paths:
+                for column in columns:
+                    os.remove(f"{run_path}.{column}")
+            os.remove(layer_path(depth, "states"))  # the back-pointers are still needed, but the states are not.
+            current_records = _load_records(layer_path(depth+1, "states"), dtypes[0])
+            logger.info("  Processed item %s and added %d states.", item, len(current_records))
+            num_of_processed_states += len(current_records)
+
+        logger.info("Processed %d states.", num_of_processed_states)
+        if len(current_records) == 0:
+            if use_lower_bound:   # no state is better than the initial solution, so it is optimal.
+                return best_bins
+            raise ValueError("No final states!")
+
+        # Find the best final state, chunk by chunk:
+        best_row, best_value = None, None
+        for start in range(0, len(current_records), states_in_memory):
+            final_states = _records_to_states(current_records[start:start+states_in_memory], numbins, batcher.dtype)
+            values_to_minimize = objective.values_to_minimize(final_states)
+            row = int(np.argmin(values_to_minimize))
+            if best_value is None or values_to_minimize[row] < best_value:
+                best_row, best_value = start+row, values_to_minimize[row]
+        best_final_state = _records_to_states(current_records[best_row:best_row+1], numbins, batcher.dtype)[0]
+        logger.info("Best final state: %s, value: %s", best_final_state, best_value)
+        if not keeps_contents:
+            return convert_bins(list(best_final_state), BinnerKeepingSumsInList(binner.valueof), binner)
+
+        # construct path to solution, reading one back-pointer from each layer:
+        path = [None]*len(items)
+        row = best_row
+        for depth in reversed(range(len(items))):
+            path[depth] = int(_load_records(layer_path(depth+1, "bins"), dtypes[2])[row])
+            row = int(_load_records(layer_path(depth+1, "parents"), dtypes[1])[row])
+        del current_records
+
+    logger.info("Path to best solution: %s", path)
+    result_bins = binner.new_bins(numbins)
+    for item, ibin in zip(items, path):
+        binner.add_and_resort(result_bins, item, ibin)
+    return result_bins
+
+
+def _record_dtype(numbins: int) -> np.dtype:
+    """
+    The dtype of the fixed-width records of the out-of-core DP: a byte-string of 8 bytes per bin.
+    """
+    return np.dtype(f"S{8*numbins}")
+
+
+def _states_to_records(states: np.ndarray) -> np.ndarray:
+    """
+    Encode each state (a row of non-negative sums) as a byte-string of big-endian 64-bit numbers,
+    so that comparing the byte-strings is the same as comparing the rows lexicographically.
+
+    >>> records = _states_to_records(np.array([[0, 5], [1, 2], [0, 300]]))
+    >>> np.argsort(records).tolist()
+    [0, 2, 1]
+    >>> _records_to_states(records, 2, np.int64)
+    array([[  0,   5],
+           [  1,   2],
+           [  0, 300]])
+    """
+    numbins = states.shape[1]
+    # The bits of non-negative floats, as unsigned integers, are in the same order as the floats.
+    big_endian = states.astype(">f8") if states.dtype.kind == "f" else states.astype(">u8")
+    return np.ascontiguousarray(big_endian).view(_record_dtype(numbins)).reshape(len(states))
+
+
+def _records_to_states(records: np.ndarray, numbins: int, dtype: np.dtype) -> np.ndarray:
+    """
+    Decode the records of `_states_to_records` back to a matrix of states.
+    """
+    big_endian_dtype = ">f8" if np.dtype(dtype).kind == "f" else ">u8"
+    return np.ascontiguousarray(records).view(big_endian_dtype).reshape(len(records), numbins).astype(dtype)
+
+
+def _load_records(path: str, dtype: np.dtype) -> np.ndarray:
+    """
+    Map a file of fixed-width records to memory (an empty file cannot be mapped).
+    """
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _merge_runs(runs: List[List[np.ndarray]], outputs: List[Any], block_size: int):
+    """
+    Merge runs of records, each sorted and distinct, into a single sequence of sorted and distinct records, and write it to the outputs.
+    Each run is a list of columns: the first column has the records, which determine the order; the other columns are carried along.
+    Only a block of block_size records of each run is in memory at once.
+
+    >>> import io
+    >>> runs = [[np.array([b"a", b"c", b"e"]), np.array([1, 3, 5])], [np.array([b"b", b"c", b"f"]), np.array([2, 30, 6])]]
+    >>> outputs = [io.BytesIO(), io.BytesIO()]
+    >>> _merge_runs(runs, outputs, block_size=2)
+    >>> np.frombuffer(outputs[0].getvalue(), dtype="S1").tolist(), np.frombuffer(outputs[1].getvalue(), dtype=int).tolist()
+    ([b'a', b'b', b'c', b'e', b'f'], [1, 2, 3, 5, 6])
+    """
+    positions = [0]*len(runs)
+    while True:
+        active = [irun for irun in range(len(runs)) if positions[irun] < len(runs[irun][0])]
+        if len(active) == 0:
+            break
+        blocks = {irun: [column[positions[irun]:positions[irun]+block_size] for column in runs[irun]] for irun in active}
+        # All records up to the smallest last record of a partially-loaded run are in the loaded blocks:
+        last_records = [blocks[irun][0][-1] for irun in active if positions[irun]+block_size < len(runs[irun][0])]
+        cutoff = min(last_records) if len(last_records) > 0 else None
+        taken = []
+        for irun in active:
+            count = len(blocks[irun][0]) if cutoff is None else int(np.searchsorted(blocks[irun][0], cutoff, side="right"))
+            taken.append([column[:count] for column in blocks[irun]])
+            positions[irun] += count
+        merged = [np.concatenate(columns) for columns in zip(*taken)]
+        order = np.argsort(merged[0], kind="stable")
+        merged = [column[order] for column in merged]
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = merged[0][1:] != merged[0][:-1]
+        for column, output in zip(merged, outputs):
+            output.write(np.ascontiguousarray(column[is_first]).tobytes())
+
+
+def _optimal_parallel(
+    binner: Binner, numbins: int, items: List[any],
+    objective: obj.Objective = obj.MinimizeDifference,
+    use_lower_bound: bool = True,
+    epsilon: float = None,
+    numprocesses: int = None,
+):
+    """
+    The same DP as `_optimal_sums` and `_optimal_partition`, with the layers expanded by a pool of numprocesses processes
+    (default: the number of CPUs). The states are passed to and from the processes through shared memory.
+
+    Each layer is built in two parallel phases:
+    1. The current states are split into ranges of rows; each process expands its range, prunes and deduplicates the new states,
+       and groups them into shards by a hash of the state, so that equal states from different ranges are in the same shard.
+    2. Each process deduplicates a single shard.
+    The shards are then concatenated into the next layer.
+
+    >>> from prtpy import BinnerKeepingContents
+    >>> printbins(_optimal_parallel(BinnerKeepingContents(dtype=int), 3, [46, 39, 27, 26, 16, 13, 10], objective=obj.MinimizeLargestSum, use_lower_bound=False, numprocesses=2))
+    Bin #0: [27, 26], sum=53
+    Bin #1: [39, 13, 10], sum=62
+    Bin #2: [46, 16], sum=62
+    >>> printbins(_optimal_parallel(BinnerKeepingSums(dtype=int), 4, [46, 39, 27, 26, 16, 13, 10, 7, 3], numprocesses=2))
+    Bin #0: sum=46
+    Bin #1: sum=46
+    Bin #2: sum=46
+    Bin #3: sum=49
+    """
+    items = list(items)
+    if np.dtype(binner.dtype).kind not in "iuf":
+        raise ValueError(f"The parallel DP requires values of a numeric dtype, but the dtype is {binner.dtype}")
+    numprocesses = numprocesses or os.cpu_count()
+    logger.info("\nParallel Dynamic Programming %s Partitioning of %d items into %d bins, with %d processes.", objective, len(items), numbins, numprocesses)
+    items, sums_of_remaining_items, use_lower_bound = _sorted_items_for_pruning(binner, items, use_lower_bound)
+    best_objective_value = None
+    if use_lower_bound:
+        best_bins, best_objective_value = _initial_solution(binner, numbins, items, objective)
+    grid_ratio = _grid_ratio(epsilon, len(items))
+    keeps_contents = isinstance(binner, BinnerKeepingContents)
+    batcher = BatchBinner(binner)
+    dtypes = [batcher.dtype, np.int64, np.min_scalar_type(numbins)]   # of the states, parents and bins.
+    num_of_processed_states = 1
+    layers = []   # For each item: the parent state and the bin of each state.
+
+    current_states = _SharedArray.from_array(batcher.new_batch(numbins))
+    with multiprocessing.Pool(numprocesses) as pool:
+        for depth, item in enumerate(items):
+            numstates = len(current_states.array)
+            sum_of_remaining_items = sums_of_remaining_items[depth+1] if use_lower_bound else None
+            # Phase 1: each task expands a range of rows, and writes the new states grouped by shard, at the offset of its range.
+            expanded = [_SharedArray((numstates*numbins,) + shape, dtype) for shape, dtype in zip([(numbins,), (), ()], dtypes)]
+            ranges = np.linspace(0, numstates, numprocesses+1).astype(int)
+            shard_counts = pool.map(_expand_range, [
+                (current_states, start, end, binner.valueof(item), expanded, objective, sum_of_remaining_items, best_objective_value, grid_ratio, numprocesses)
+                for start, end in zip(ranges[:-1], ranges[1:])])
+            current_states.close(unlink=True)
+
+            # Phase 2: each task deduplicates a shard, and writes it at the offset of the shard.
+            shard_counts = np.array(shard_counts).reshape(numprocesses, numprocesses)   # [range, shard]
+            segment_offsets = ranges[:-1, None]*numbins + np.cumsum(shard_counts, axis=1) - shard_counts
+            shard_offsets = np.cumsum(shard_counts.sum(axis=0)) - shard_counts.sum(axis=0)
+            deduplicated = [_SharedArray(array.shape, array.dtype) for array in expanded]
+            unique_counts = pool.map(_deduplicate_shard, [
+                (expanded, list(zip(segment_offsets[:, shard], shard_counts[:, shard])), deduplicated, shard_offsets[shard], grid_ratio)
+                for shard in range(numprocesses)])
+            for array in expanded:
+                array.close(unlink=True)
+
+            # Concatenate the shards into the next layer:
+            segments = [slice(offset, offset+count) for offset, count in zip(shard_offsets, unique_counts)]
+            next_columns = [np.concatenate([array.array[segment] for segment in segments]) for array in deduplicated]
+            for array in deduplicated:
+                array.close(unlink=True)
+            current_states = _SharedArray.from_array(next_columns[0])
+            if keeps_contents:
+                layers.append((next_columns[1].astype(np.min_scalar_type(numstates)), next_columns[2]))
+            logger.info("  Processed item %s and added %d states.", item, len(next_columns[0]))
+            num_of_processed_states += len(next_columns[0])
+
+    final_states = current_states.array.copy()
+    current_states.close(unlink=True)
+    logger.info("Processed %d states.", num_of_processed_states)
+    if len(final_states) == 0:
+        if use_lower_bound:   # no state is better than the initial solution, so it is optimal.
+            return best_bins
+        raise ValueError("No final states!")
+    best_row = int(np.argmin(objective.values_to_minimize(final_states)))
+    if not keeps_contents:
+        return convert_bins(list(final_states[best_row]), BinnerKeepingSumsInList(binner.valueof), binner)
+    path = batcher.path_to_row(layers, best_row)
+    logger.info("Path to best solution: %s", path)
+    result_bins = binner.new_bins(numbins)
+    for item, ibin in zip(items, path):
+        binner.add_and_resort(result_bins, item, ibin)
+    return result_bins
+
+
+class _SharedArray:
+    """
+    A numpy array in shared memory. When pickled (e.g. sent to a worker process), only its name, shape and dtype are sent,
+    and the receiver attaches to the same memory.
+    """
+    def __init__(self, shape: Tuple[int], dtype: np.dtype, name: str = None):
+        self.shape, self.dtype = tuple(shape), np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)   # shared memory cannot be empty.
+        self.shm = shared_memory.SharedMemory(name=name, create=(name is None), size=size)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @staticmethod
+    def from_array(array: np.ndarray):
+        shared = _SharedArray(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    def __getstate__(self):
+        return (self.shape, self.dtype, self.shm.name)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def close(self, unlink: bool = False):
+        del self.array
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _shard_of(states: np.ndarray, numshards: int) -> np.ndarray:
+    """
+    A hash of each state (a row of sums) modulo numshards. Equal states are in the same shard.
+
+    >>> _shard_of(np.array([[1, 2], [3, 4], [1, 2]]), 5).tolist()
+    [3, 4, 3]
+    """
+    bits = states.astype(np.float64).view(np.uint64) if states.dtype.kind == "f" else states.astype(np.uint64)
+    hashes = np.zeros(len(states), dtype=np.uint64)
+    for column in bits.T:    # FNV-style mixing; overflow is intended.
+        hashes = (hashes ^ column) * np.uint64(1099511628211)
+    hashes ^= hashes >> np.uint64(29)
+    return (hashes % np.uint64(numshards)).astype(np.intp)
+
+
+def _expand_range(args) -> List[int]:
+    """
+    Phase 1 of a layer of `_optimal_parallel`, run in a worker process.
+    Expands the states in rows start..end of the current layer by the given value, prunes and deduplicates them,
+    and writes them, sorted by shard, at offset start*numbins of the expanded arrays. Returns the number of states in each shard.
+    """
+    current_states, start, end, value, expanded, objective, sum_of_remaining_items, best_objective_value, grid_ratio, numshards = args
+    states = current_states.array[start:end].copy()
+    numbins = states.shape[1]
+    batcher = BatchBinner(BinnerKeepingSums(dtype=states.dtype))
+    next_states, parents, bins = batcher.add_item_to_each_bin(states, value)
+    parents += start
+    if best_objective_value is not None:
+        is_promising = objective.lower_bounds(next_states, sum_of_remaining_items) < best_objective_value
+        next_states, parents, bins = next_states[is_promising], parents[is_promising], bins[is_promising]
+    next_states, unique_indices = _unique_states(batcher, next_states, grid_ratio)
+    shards = _shard_of(next_states, numshards)
+    order = np.argsort(shards, kind="stable")
+    offset = start*numbins
+    for array, column in zip(expanded, [next_states, parents[unique_indices], bins[unique_indices]]):
+        array.array[offset:offset+len(order)] = column[order]
+        array.close()
+    current_states.close()
+    return np.bincount(shards, minlength=numshards).tolist()
+
+
+def _deduplicate_shard(args) -> int:
+    """
+    Phase 2 of a layer of `_optimal_parallel`, run in a worker process.
+    Collects the states of a single shard from the given segments of the expanded arrays, deduplicates them,
+    and writes them at the given offset of the deduplicated arrays. Returns the number of distinct states.
+    """
+    expanded, segments, deduplicated, offset, grid_ratio = args
+    columns = [np.concatenate([array.array[segment_offset:segment_offset+count] for segment_offset, count in segments]) for array in expanded]
+    batcher = BatchBinner(BinnerKeepingSums(dtype=columns[0].dtype))
+    unique_states, unique_indices = _unique_states(batcher, columns[0], grid_ratio)
+    for array, column in zip(deduplicated, [unique_states, columns[1][unique_indices], columns[2][unique_indices]]):
+        array.array[offset:offset+len(unique_states)] = column
+        array.close()
+    for array in expanded:
+        array.close()
+    return len(unique_states)
+
+
 if __name__ == "__main__":
     # DOCTEST
     import doctest, sys
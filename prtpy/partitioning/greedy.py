@@ -31,7 +31,7 @@ def greedy(binner: Binner, numbins: int, items: List[any]):
     >>> partition(algorithm=greedy, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
     [['f', 'b'], ['g', 'a'], ['e', 'c', 'd']]
     >>> partition(algorithm=greedy, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
-    [16.0, 16.0]
+    [16, 16]
     """
     bins = binner.new_bins(numbins)
     for item in sorted(items, key=binner.valueof, reverse=True):
@@ -77,21 +77,21 @@ def optimal(
     >>> partition(algorithm=optimal, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
     [['a', 'g'], ['c', 'd', 'e'], ['b', 'f']]
     >>> partition(algorithm=optimal, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
-    [16.0, 16.0]
+    [16, 16]
 
     >>> traversc_example = [18, 12, 22, 22]
     >>> print(partition(algorithm=optimal, numbins=2, items=traversc_example, outputtype=out.PartitionAndSums))
-    Bin #0: [12, 22], sum=34.0
-    Bin #1: [18, 22], sum=40.0
+    Bin #0: [12, 22], sum=34
+    Bin #1: [18, 22], sum=40
 
     Randomly-found example:
     >>> example_2022_07_11 = [62,  93,  99, 129, 158, 187, 199, 212]
     >>> partition(algorithm=optimal, numbins=5, items=example_2022_07_11, outputtype=out.PartitionAndSums)
-    Bin #0: [199], sum=199.0
-    Bin #1: [212], sum=212.0
-    Bin #2: [99, 129], sum=228.0
-    Bin #3: [62, 187], sum=249.0
-    Bin #4: [93, 158], sum=251.0
+    Bin #0: [199], sum=199
+    Bin #1: [212], sum=212
+    Bin #2: [99, 129], sum=228
+    Bin #3: [62, 187], sum=249
+    Bin #4: [93, 158], sum=251
     """
     ibins = range(numbins)
     items = list(items)
@@ -8,7 +8,7 @@ Credit: based on code by Søren Fuglede Jørgensen in the numberpartitioning pac
 """
 from typing import Callable, List, Any
 from prtpy import outputtypes as out, objectives as obj
-from prtpy.binners import Binner, BinsArray, printbins
+from prtpy.binners import Binner, BinsArray, printbins, small_binner, convert_bins
 import heapq, logging
 from itertools import count
 
@@ -25,8 +25,13 @@ class BinsSortedByMaxDiff:
         self.heap_count = count()       # To avoid ambiguity in heap
         self.binner = binner
 
-    def push(self, bins: BinsArray):
-        self.binner.sort_by_ascending_sum(bins)
+    def push(self, bins: BinsArray, is_sorted: bool = False):
+        """
+        Push the given bins-array into the heap.
+        If is_sorted is True, the bins are assumed to be already sorted by ascending sum (e.g. by Binner.add_and_resort).
+        """
+        if not is_sorted:
+            self.binner.sort_by_ascending_sum(bins)
         bins_sums = self.binner.sums(bins)
         bins_diff = bins_sums[-1] - bins_sums[0]     # To sort by descending difference
         new_state = (-bins_diff, next(self.heap_count), bins)
@@ -50,6 +55,11 @@ class BinsSortedByMaxDiff:
         diff, _, _ = self.bins_heap[0]
         return diff
 
+    def topdiff_after_push(self, sums: List[float])->float:
+        """ Return the topdiff of the heap after pushing a bins-array with the given sorted sums, without pushing it. """
+        diff = -(sums[-1] - sums[0])
+        return min(diff, self.topdiff()) if self.bins_heap else diff
+
     def clone(self):
         the_clone = BinsSortedByMaxDiff(self.binner)
         the_clone.bins_heap = list(self.bins_heap)
@@ -103,14 +113,15 @@ def kk(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     numitems = len(items)
     logger.info("\nKarmarkar-Karp Partitioning of %d items into %d parts.", numitems, numbins)
     items = sorted(items, reverse=True, key=binner.valueof)
+    original_binner, binner = binner, small_binner(binner, numbins)
 
     bins_heap = BinsSortedByMaxDiff(binner)
 
     # Explanation from Wikipedia: https://en.wikipedia.org/wiki/Largest_differencing_method#Multi-way_partitioning
     # 1. "Initially, for each number i in S, construct a k-tuple of subsets, in which one subset is {i} and the other k-1 subsets are empty.
     for item in items:
-        new_bins = binner.add_item_to_bin(binner.new_bins(numbins), item=item, bin_index=numbins-1)
-        bins_heap.push(new_bins)
+        new_bins = binner.add_and_resort(binner.new_bins(numbins), item=item, bin_index=numbins-1)
+        bins_heap.push(new_bins, is_sorted=True)
 
     # 2. "In each iteration, select two k-tuples A and B in which the difference between the maximum and minimum sum is largest, 
     #    "   and combine them in reverse order of sizes, i.e.: smallest subset in A with largest subset in B, second-smallest in A with second-largest in B, etc."
@@ -125,7 +136,7 @@ def kk(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
             binner.combine_bins(bins1, numbins-i-1, bins2, i)
         bins_heap.push(bins1)
 
-    return bins_heap.top()
+    return convert_bins(bins_heap.top(), binner, original_binner)
 
 
 if __name__ == '__main__':
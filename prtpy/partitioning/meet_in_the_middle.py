@@ -0,0 +1,135 @@
+"""
+Optimal two-way number partitioning by the meet-in-the-middle algorithm of Horowitz and Sahni (1974).
+
+The items are split into two halves. All subset sums of each half are enumerated into a numpy array,
+and the sums of the second half are sorted. For each subset sum of the first half,
+a binary search finds the subset sum of the second half that brings the total closest to half the sum of all items.
+The run-time is about 2^(n/2)*n, and the memory is about 2^(n/2) sums (about 32 bytes each, with the sorted copy and the sort order),
+so it is practical for up to about 45-50 items: 45 items need about 200 MB, 50 items about 1 GB, and 60 items more than 30 GB.
+
+The algorithm of Schroeppel and Shamir (1981) needs only about 2^(n/4) memory, by enumerating the subset sums of each half
+in sorted order with heaps. It is not implemented: the enumeration is inherently sequential, so in Python it would take
+2^(n/2) interpreted heap operations (about 10^9 for 60 items), which is much slower than the vectorized enumeration here.
+
+All the usual objectives (difference, largest sum, smallest sum) are optimized by the same two-way partition,
+so the objective is not needed.
+
+Author: Erel Segal-Halevi
+Since: 2022-10
+"""
+
+from prtpy.binners import Binner, BinsArray, printbins
+from typing import List, Any, Tuple
+import logging, numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2**16   # The number of subset sums of the first half that are searched at once.
+
+
+def optimal(binner: Binner, numbins: int, items: List[Any], **kwargs) -> BinsArray:
+    """
+    Finds an optimal partition into two bins, using the meet-in-the-middle algorithm.
+    The bin with the smaller sum is bin #0.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums
+    >>> printbins(optimal(BinnerKeepingContents(), 2, [4,5,6,7,8]))
+    Bin #0: [7, 8], sum=15.0
+    Bin #1: [4, 5, 6], sum=15.0
+    >>> printbins(optimal(BinnerKeepingContents(), 2, [1,1,1,6]))
+    Bin #0: [1, 1, 1], sum=3.0
+    Bin #1: [6], sum=6.0
+    >>> list(optimal(BinnerKeepingSums(), 2, [1/2,1/3,1/5]))
+    [0.5, 0.5333333333333333]
+    >>> list(optimal(BinnerKeepingSums(), 2, []))
+    [0.0, 0.0]
+
+    >>> from prtpy import partition, outputtypes as out
+    >>> partition(algorithm=optimal, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
+    [['b', 'e', 'f'], ['a', 'c', 'd', 'g']]
+    >>> partition(algorithm=optimal, numbins=2, items=[18, 17, 12, 11, 8, 2], outputtype=out.Sums)
+    [33, 35]
+    >>> partition(algorithm=optimal, numbins=3, items=[1,2,3])
+    Traceback (most recent call last):
+    ...
+    ValueError: numbins must be 2
+    """
+    if numbins != 2:
+        raise ValueError("numbins must be 2")
+    items = list(items)
+    values = binner.values_of(items)
+    logger.info("\nMeet-in-the-middle partitioning of %d items into 2 parts.", len(items))
+
+    half = len(items)//2
+    first_mask, second_mask = _best_subset(values[:half], values[half:], values.sum() if len(values)>0 else 0)
+
+    in_subset = [bool(first_mask >> i & 1) for i in range(half)] + [bool(second_mask >> i & 1) for i in range(len(items)-half)]
+    subset_sum = sum(value for value, chosen in zip(values, in_subset) if chosen)
+    other_sum = sum(value for value, chosen in zip(values, in_subset) if not chosen)
+    subset_bin = 0 if subset_sum <= other_sum else 1
+    bins = binner.new_bins(2)
+    for item, chosen in zip(items, in_subset):
+        binner.add_item_to_bin(bins, item, subset_bin if chosen else 1-subset_bin)
+    return bins
+
+
+def _subset_sums(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the sums of all subsets of the given values.
+    The sum of the subset represented by the bitmask m is at index m.
+
+    >>> list(_subset_sums(np.array([1, 10, 100])))
+    [0, 1, 10, 11, 100, 101, 110, 111]
+    """
+    sums = np.zeros(1, dtype=values.dtype)
+    for value in values:
+        sums = np.concatenate((sums, sums + value))
+    return sums
+
+
+def _best_subset(first_values: np.ndarray, second_values: np.ndarray, total: float) -> Tuple[int, int]:
+    """
+    Finds a subset whose sum is as close as possible to half the total.
+    Returns the bitmask of its items in the first half, and the bitmask of its items in the second half.
+
+    >>> _best_subset(np.array([4,5]), np.array([6,7,8]), 30)
+    (0, 6)
+    >>> _best_subset(np.array([1/2]), np.array([1/3,1/5]), 1/2+1/3+1/5)
+    (1, 0)
+    >>> values = np.array([2**62+1, 2**62, 3, 2**61, 2**61+1], dtype=object)   # total/2 is not exact as a float.
+    >>> _best_subset(values[:2], values[2:], values.sum())
+    (1, 4)
+    """
+    first_sums = _subset_sums(first_values)
+    second_sums = _subset_sums(second_values)
+    second_order = np.argsort(second_sums, kind="stable")
+    second_sorted = second_sums[second_order]
+    # With integers (int64 or arbitrary-precision Python ints), the comparisons are exact, and a difference of total%2 is perfect.
+    # With floats, only 0 is perfect.
+    is_integer = first_sums.dtype.kind in "iuO"
+    perfect_difference = total%2 if is_integer else 0
+    half_total = (total+1)//2 if is_integer else total/2   # with integers, subset_sum >= total/2 iff subset_sum >= (total+1)//2.
+
+    best_difference, best_masks = np.inf, (0, 0)
+    for start in range(0, len(first_sums), CHUNK_SIZE):
+        chunk = first_sums[start:start+CHUNK_SIZE]
+        # The second-half sums just below and just above the one that, together with each first-half sum, gives half the total.
+        # Both are checked, since the best one may be on either side.
+        above = np.searchsorted(second_sorted, half_total - chunk).clip(max=len(second_sorted)-1)
+        below = (above-1).clip(min=0)
+        for positions in (below, above):
+            subset_sums = chunk + second_sorted[positions]
+            differences = np.abs((total - subset_sums) - subset_sums)   # not 2*subset_sums, which might overflow 64 bits.
+            best_in_chunk = np.argmin(differences)
+            if differences[best_in_chunk] < best_difference:
+                best_difference = differences[best_in_chunk]
+                best_masks = (start + int(best_in_chunk), int(second_order[positions[best_in_chunk]]))
+        if best_difference <= perfect_difference:   # a perfect partition - it cannot be improved.
+            break
+    return best_masks
+
+
+if __name__ == "__main__":
+    import doctest
+    (failures, tests) = doctest.testmod(report=True)
+    print("{} failures, {} tests".format(failures, tests))
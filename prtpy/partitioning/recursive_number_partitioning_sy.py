@@ -20,7 +20,7 @@ Date:    03-2022
 """
 
 from typing import Callable, List
-from prtpy import outputtypes as out, objectives as obj, Binner, BinnerKeepingContents, BinsArray, printbins
+from prtpy import outputtypes as out, objectives as obj, Binner, BinnerKeepingContents, BinsArray, TrailBinner, printbins
 from prtpy.partitioning.karmarkar_karp_sy import kk
 import numpy as np, logging
 from prtpy import partition
@@ -38,7 +38,7 @@ def find_diff(l1: List, l2: List):
 
 
 # works only for 3, 4, 5 ways partitioning (as present in the paper)
-def rnp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
+def rnp(binner: Binner, numbins: int, items: List[any], two_way_algorithm: Callable = ckk_optimal) -> BinsArray:
     """
     In general, for an even number of subsets, RNP starts with two-way partitioning at the top level (using CKK),
     and then recursively partitions each half.
@@ -48,6 +48,7 @@ def rnp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     bins - a Bins structure. It is initialized with no bins at all. It contains a function for adding new empty bins.
     items - a list of item-names.
     valueof - a function that accepts an item and returns its value.
+    two_way_algorithm - an optimal two-way partitioning algorithm, used for the last two bins. Default is CKK.
 
     return: a Bins structure with the partition (according to the algorithm output)
 
@@ -72,11 +73,16 @@ def rnp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     >>> sorted(rnp(BinnerKeepingContents(), 5, items=[3, 16, 22, 24, 24, 29])[0])
     [19.0, 22.0, 24.0, 24.0, 29.0]
 
+    Using the meet-in-the-middle algorithm for the last two bins:
+    >>> from prtpy.partitioning.meet_in_the_middle import optimal as meet_in_the_middle
+    >>> list(rnp(BinnerKeepingSums(), 5, items=[1,2,3,4,5,6,7,8,9], two_way_algorithm=meet_in_the_middle))
+    [9.0, 9.0, 9.0, 9.0, 9.0]
+
     >>> from prtpy import partition
     >>> partition(algorithm=rnp, numbins=4, items={"a":1, "b":1, "c":1, "d":1})
     [['c'], ['d'], ['b'], ['a']]
     >>> partition(algorithm=rnp, numbins=4, items={"a":1, "b":1, "c":1, "d":1}, outputtype=out.Sums)
-    [1.0, 1.0, 1.0, 1.0]
+    [1, 1, 1, 1]
     """
     best_partition_so_far = kk(binner=binner, numbins=numbins, items=items)
     sums = binner.sums(best_partition_so_far)
@@ -85,11 +91,11 @@ def rnp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
         return best_partition_so_far     # 0 is the best possible value
 
     prior_bins = binner.new_bins(0)
-    best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=binner)
+    best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=binner, two_way_algorithm=two_way_algorithm)
     return best_partition_so_far
 
 
-def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: Binner):
+def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: Binner, two_way_algorithm: Callable = ckk_optimal):
     """
     A recursive subroutine of RNP.
     """
@@ -100,7 +106,7 @@ def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, i
 
     #### Base case: numbins == 2
     if current_numbins == 2:
-        return ckk_optimal(binner=binner, numbins=2, items=items)
+        return two_way_algorithm(binner=binner, numbins=2, items=items)
 
     #### Odd case: numbins is odd
     if current_numbins % 2 == 1:  
@@ -118,7 +124,7 @@ def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, i
             for item in items_for_last_bin:
                 binner.add_item_to_bin(prior_bins, item=item, bin_index=num_prior_bins)
             remaining_items = find_diff(items, items_for_last_bin)
-            new_bins = rec_generate_sets(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins - 1, trees, binner)
+            new_bins = rec_generate_sets(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins - 1, trees, binner, two_way_algorithm)
             # if new_bins:
             bins_sums = binner.sums(best_partition_so_far)
             best_difference_so_far = max(bins_sums) - min(bins_sums)
@@ -130,11 +136,97 @@ def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, i
     
     #### Even case: numbins is odd
     else:
-        ckk_binner = BinnerKeepingContents(binner.valueof)
+        ckk_binner = BinnerKeepingContents(binner.valueof, binner.dtype)
+        for top_level_part in ckk_generator(binner=ckk_binner, numbins=2, items=items, best_difference_so_far=-best_difference_so_far):
+            bin1items, bin2items = top_level_part[1]
+            new_bin1 = rec_generate_sets(prior_bins, best_partition_so_far, bin1items, total_numbins, current_numbins/2, trees, binner, two_way_algorithm)
+            new_bin2 = rec_generate_sets(prior_bins, best_partition_so_far, bin2items, total_numbins, current_numbins/2, trees, binner, two_way_algorithm)
+
+            combined_sums = np.append(binner.sums(new_bin1), binner.sums(new_bin2))
+            diff = max(combined_sums) - min(combined_sums)
+            if diff < best_difference_so_far:
+                best_partition_so_far = binner.concatenate_bins(new_bin1, new_bin2)
+
+    return best_partition_so_far
+
+
+def rnp_with_trail(binner: Binner, numbins: int, items: List[any], two_way_algorithm: Callable = ckk_optimal) -> BinsArray:
+    """
+    The same algorithm as rnp, but the subsets chosen by the inclusion-exclusion trees (for an odd number of subsets)
+    are kept in a single mutable bins-array: their items are added with TrailBinner.push_item,
+    and removed with TrailBinner.undo when backtracking.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums
+    >>> rnp_with_trail(BinnerKeepingContents(), 3, items=[4, 5, 7, 8, 6])[1]
+    [[8], [4, 7], [5, 6]]
+    >>> rnp_with_trail(BinnerKeepingContents(), 5, items=[1,2,3,4,5,6,7,8,9])[1]
+    [[2, 7], [4, 5], [9], [3, 6], [1, 8]]
+    >>> sorted(rnp_with_trail(BinnerKeepingSums(), 5, items=[3, 16, 22, 24, 24, 29]))
+    [19.0, 22.0, 24.0, 24.0, 29.0]
+
+    >>> from prtpy import partition
+    >>> partition(algorithm=rnp_with_trail, numbins=3, items={"a":1, "b":1, "c":1})
+    [['a'], ['b'], ['c']]
+    """
+    best_partition_so_far = kk(binner=binner, numbins=numbins, items=items)
+    sums = binner.sums(best_partition_so_far)
+    best_difference_so_far = max(sums) - min(sums)
+    if best_difference_so_far == 0:  
+        return best_partition_so_far     # 0 is the best possible value
+
+    trail_binner = TrailBinner(binner)
+    prior_bins = binner.new_bins(numbins)
+    best_partition_so_far = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=trail_binner, two_way_algorithm=two_way_algorithm)
+    return best_partition_so_far
+
+
+def rec_generate_sets_with_trail(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: TrailBinner, two_way_algorithm: Callable = ckk_optimal):
+    """
+    A recursive subroutine of rnp_with_trail.
+    prior_bins has total_numbins bins; only the first total_numbins-current_numbins of them are filled.
+    """
+    num_prior_bins = total_numbins - current_numbins
+    bins_sums = binner.sums(best_partition_so_far)
+    best_difference_so_far = max(bins_sums) - min(bins_sums)
+
+    #### Base case: numbins == 2
+    if current_numbins == 2:
+        return two_way_algorithm(binner=binner.binner, numbins=2, items=items)
+
+    #### Odd case: numbins is odd
+    if current_numbins % 2 == 1:  
+        # take one with in_ex_tree end then split in 2
+        t = sum(map(binner.valueof, items))  # t is the sum of all the remaining items
+        in_ex_tree = InExclusionBinTree(
+            items=items,
+            valueof=binner.valueof,
+            lower_bound=(t - (current_numbins - 1) * best_difference_so_far) / current_numbins, upper_bound=t / current_numbins
+        )
+        trees.append((in_ex_tree, t, current_numbins))
+
+        for items_for_last_bin in in_ex_tree.generate_tree():
+            checkpoint = binner.checkpoint()
+            for item in items_for_last_bin:
+                binner.push_item(prior_bins, item=item, bin_index=num_prior_bins)
+            remaining_items = find_diff(items, items_for_last_bin)
+            new_bins = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins - 1, trees, binner, two_way_algorithm)
+            bins_sums = binner.sums(best_partition_so_far)
+            best_difference_so_far = max(bins_sums) - min(bins_sums)
+            combined_sums = np.append(binner.sums(new_bins), binner.sums(prior_bins)[:num_prior_bins+1])
+            diff = max(combined_sums) - min(combined_sums)
+            if diff < best_difference_so_far:
+                # The prior bins are copied, since they will be changed when backtracking.
+                filled_prior_bins = binner.remove_bins(binner.copy_bins(prior_bins), current_numbins-1)
+                best_partition_so_far = binner.concatenate_bins(filled_prior_bins, new_bins)
+            binner.undo(checkpoint)
+    
+    #### Even case: numbins is even
+    else:
+        ckk_binner = BinnerKeepingContents(binner.valueof, binner.binner.dtype)
         for top_level_part in ckk_generator(binner=ckk_binner, numbins=2, items=items, best_difference_so_far=-best_difference_so_far):
             bin1items, bin2items = top_level_part[1]
-            new_bin1 = rec_generate_sets(prior_bins, best_partition_so_far, bin1items, total_numbins, current_numbins/2, trees, binner)
-            new_bin2 = rec_generate_sets(prior_bins, best_partition_so_far, bin2items, total_numbins, current_numbins/2, trees, binner)
+            new_bin1 = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, bin1items, total_numbins, current_numbins/2, trees, binner, two_way_algorithm)
+            new_bin2 = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, bin2items, total_numbins, current_numbins/2, trees, binner, two_way_algorithm)
 
             combined_sums = np.append(binner.sums(new_bin1), binner.sums(new_bin2))
             diff = max(combined_sums) - min(combined_sums)
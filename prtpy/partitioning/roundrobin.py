@@ -28,7 +28,7 @@ def roundrobin(binner: Binner, numbins: int, items: List[any]):
     >>> partition(algorithm=roundrobin, numbins=3, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9})
     [['f', 'c', 'a'], ['g', 'd'], ['e', 'b']]
     >>> partition(algorithm=roundrobin, numbins=2, items={"a":1, "b":2, "c":3, "d":3, "e":5, "f":9, "g":9}, outputtype=out.Sums)
-    [18.0, 14.0]
+    [18, 14]
     """
     ibin = 0
     bins = binner.new_bins(numbins)
@@ -18,7 +18,7 @@ Since: 03-2022
 """
 
 from typing import Callable, List
-from prtpy import outputtypes as out, objectives as obj, Binner, BinsArray, printbins
+from prtpy import outputtypes as out, objectives as obj, Binner, BinsArray, TrailBinner, printbins
 from prtpy.partitioning.karmarkar_karp_sy import kk
 from prtpy.partitioning.complete_karmarkar_karp_sy import optimal as ckk_optimal
 import numpy as np, logging
@@ -35,7 +35,7 @@ def find_diff(l1: List, l2: List):
 
 logger = logging.getLogger(__name__)
 
-def snp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
+def snp(binner: Binner, numbins: int, items: List[any], two_way_algorithm: Callable = ckk_optimal) -> BinsArray:
     """
     Given N numbers to partition into K subsets, the algorithm first choose K-2 complete subsets (using bounds on the subsets sums),
     and then optimally partition the remaining numbers two ways (using CKK algorithm- which is optimally for two ways partitioning).
@@ -43,6 +43,7 @@ def snp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     bins - a Bins structure. It is initialized with no bins at all. It contains a function for adding new empty bins.
     items - a list of item-names.
     valueof - a function that accepts an item and returns its value.
+    two_way_algorithm - an optimal two-way partitioning algorithm, used for the last two bins. Default is CKK.
 
     return: a Bins structure with the partition (according to the algorithm output)
 
@@ -75,11 +76,16 @@ def snp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
     >>> list(snp(BinnerKeepingSums(), 5, items=[1,2,3,4,5,6,7,8,9]))
     [9.0, 9.0, 9.0, 9.0, 9.0]
 
+    Using the meet-in-the-middle algorithm for the last two bins:
+    >>> from prtpy.partitioning.meet_in_the_middle import optimal as meet_in_the_middle
+    >>> list(snp(BinnerKeepingSums(), 5, items=[1,2,3,4,5,6,7,8,9], two_way_algorithm=meet_in_the_middle))
+    [9.0, 9.0, 9.0, 9.0, 9.0]
+
     >>> from prtpy import partition
     >>> partition(algorithm=snp, numbins=3, items={"a":1, "b":1, "c":1})
     [['a'], ['b'], ['c']]
     >>> partition(algorithm=snp, numbins=3, items={"a":1, "b":1, "c":1}, outputtype=out.Sums)
-    [1.0, 1.0, 1.0]
+    [1, 1, 1]
     """
     best_partition_so_far = kk(binner=binner, numbins=numbins, items=items)
     sums = binner.sums(best_partition_so_far)
@@ -88,11 +94,11 @@ def snp(binner: Binner, numbins: int, items: List[any]) -> BinsArray:
         return best_partition_so_far     # 0 is the best possible value
 
     prior_bins = binner.new_bins(0)
-    best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=binner)
+    best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=binner, two_way_algorithm=two_way_algorithm)
     return best_partition_so_far
 
 
-def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: Binner):
+def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: Binner, two_way_algorithm: Callable = ckk_optimal):
     """
     A recursive subroutine of SNP.
     """
@@ -100,9 +106,9 @@ def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, i
     num_prior_bins = total_numbins - current_numbins
     bins_sums = binner.sums(best_partition_so_far)
     best_difference_so_far = max(bins_sums) - min(bins_sums)
-    if current_numbins == 2:   # Run two-way CKK on the remaining items.
-        two_bins = ckk_optimal(binner=binner, numbins=2, items=items)
-        logger.info("  CKK result: %s", two_bins)
+    if current_numbins == 2:   # Run the two-way algorithm (CKK by default) on the remaining items.
+        two_bins = two_way_algorithm(binner=binner, numbins=2, items=items)
+        logger.info("  Two-way result: %s", two_bins)
         combined_sums = np.append(binner.sums(two_bins), binner.sums(prior_bins))
         diff = max(combined_sums) - min(combined_sums)
 
@@ -130,12 +136,92 @@ def rec_generate_sets(prior_bins: BinsArray, best_partition_so_far: BinsArray, i
         for item in items_for_last_bin:
             binner.add_item_to_bin(prior_bins, item=item, bin_index=num_prior_bins)
         remaining_items = find_diff(items, items_for_last_bin)
-        best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins-1, trees, binner)
+        best_partition_so_far = rec_generate_sets(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins-1, trees, binner, two_way_algorithm)
         prior_bins = binner.remove_bins(prior_bins, 1)
 
     return best_partition_so_far
 
 
+def snp_with_trail(binner: Binner, numbins: int, items: List[any], two_way_algorithm: Callable = ckk_optimal) -> BinsArray:
+    """
+    The same algorithm as snp, but the subsets chosen for the first K-2 bins are kept in a single mutable bins-array:
+    the items of each subset are added with TrailBinner.push_item, and removed with TrailBinner.undo when backtracking.
+    So no bins-array is created for each subset; a new bins-array is created only when a better partition is found.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums
+    >>> snp_with_trail(BinnerKeepingContents(), 3, items=[4, 5, 7, 8, 6])
+    (array([ 8., 11., 11.]), [[8], [4, 7], [5, 6]])
+    >>> printbins(snp_with_trail(BinnerKeepingContents(), 5, items=[1,2,3,4,5,6,7,8,9]))
+    Bin #0: [2, 7], sum=9.0
+    Bin #1: [4, 5], sum=9.0
+    Bin #2: [9], sum=9.0
+    Bin #3: [3, 6], sum=9.0
+    Bin #4: [1, 8], sum=9.0
+    >>> list(snp_with_trail(BinnerKeepingSums(), 4, items=[4, 5, 7, 8, 6]))
+    [6.0, 7.0, 8.0, 9.0]
+
+    >>> from prtpy import partition
+    >>> partition(algorithm=snp_with_trail, numbins=3, items={"a":1, "b":1, "c":1})
+    [['a'], ['b'], ['c']]
+    """
+    best_partition_so_far = kk(binner=binner, numbins=numbins, items=items)
+    sums = binner.sums(best_partition_so_far)
+    best_difference_so_far = max(sums) - min(sums)
+    if best_difference_so_far == 0:  
+        return best_partition_so_far     # 0 is the best possible value
+
+    trail_binner = TrailBinner(binner)
+    prior_bins = binner.new_bins(numbins)
+    best_partition_so_far = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, items, numbins, numbins, trees=[], binner=trail_binner, two_way_algorithm=two_way_algorithm)
+    return best_partition_so_far
+
+
+def rec_generate_sets_with_trail(prior_bins: BinsArray, best_partition_so_far: BinsArray, items: List, total_numbins:int, current_numbins:int, trees: List, binner: TrailBinner, two_way_algorithm: Callable = ckk_optimal):
+    """
+    A recursive subroutine of snp_with_trail.
+    prior_bins has total_numbins bins; only the first total_numbins-current_numbins of them are filled.
+    """
+    num_prior_bins = total_numbins - current_numbins
+    bins_sums = binner.sums(best_partition_so_far)
+    best_difference_so_far = max(bins_sums) - min(bins_sums)
+    if current_numbins == 2:   # Run the two-way algorithm (CKK by default) on the remaining items.
+        two_bins = two_way_algorithm(binner=binner.binner, numbins=2, items=items)
+        logger.info("  Two-way result: %s", two_bins)
+        combined_sums = np.append(binner.sums(two_bins), binner.sums(prior_bins)[:num_prior_bins])
+        diff = max(combined_sums) - min(combined_sums)
+
+        # Better partition found - update best_partition_so_far
+        if diff < best_difference_so_far:
+            # The prior bins are copied, since they will be changed when backtracking.
+            filled_prior_bins = binner.remove_bins(binner.copy_bins(prior_bins), 2)
+            best_partition_so_far = binner.concatenate_bins(two_bins, filled_prior_bins)
+            logger.info("  Combined with prior: %s", best_partition_so_far)
+
+            # update lower bounds
+            for tree in trees:
+                tree[0].lower_bound = (tree[1] - (tree[2] - 1) * diff) / tree[2]
+
+        return best_partition_so_far
+
+    # Here, numbins >= 3.
+    t = sum(map(binner.valueof, items))  # t is the sum of all the remaining items
+    in_ex_tree = InExclusionBinTree(items=items, valueof=binner.valueof,
+        lower_bound=(t - (current_numbins - 1) * best_difference_so_far) / current_numbins, 
+        upper_bound=t / current_numbins
+    )
+    trees.append((in_ex_tree, t, current_numbins))
+
+    for items_for_last_bin in in_ex_tree.generate_tree():
+        checkpoint = binner.checkpoint()
+        for item in items_for_last_bin:
+            binner.push_item(prior_bins, item=item, bin_index=num_prior_bins)
+        remaining_items = find_diff(items, items_for_last_bin)
+        best_partition_so_far = rec_generate_sets_with_trail(prior_bins, best_partition_so_far, remaining_items, total_numbins, current_numbins-1, trees, binner, two_way_algorithm)
+        binner.undo(checkpoint)
+
+    return best_partition_so_far
+
+
 if __name__ == '__main__':
     import doctest
     (failures, tests) = doctest.testmod(report=True, optionflags=doctest.FAIL_FAST)
@@ -0,0 +1,65 @@
+"""
+Initial solutions ("warm starts") for the branch-and-bound partitioning algorithms.
+The objective value of a partition found by a fast heuristic is an upper bound on the optimal value,
+so it can be used to prune the search tree from the first node, before the search finds any partition of its own.
+
+Programmer: Erel Segal-Halevi
+"""
+
+from typing import List, Any, Tuple, Callable
+from prtpy import objectives as obj, Binner, BinsArray
+from prtpy.partitioning.greedy import greedy
+from prtpy.partitioning.karmarkar_karp_sy import kk
+from prtpy.partitioning.multifit import multifit
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+HEURISTICS = [kk, greedy, multifit]   # Fast heuristics, whose results are usually close to optimal.
+
+def best_heuristic_solution(binner: Binner, numbins: int, items: List[Any], objective: obj.Objective = obj.MinimizeDifference,
+    algorithms: List[Callable] = HEURISTICS) -> Tuple[BinsArray, float]:
+    """
+    Run each of the given algorithms, and return the best partition found, and its objective value.
+    Partitions with a different number of bins (e.g. multifit may leave some bins out) are skipped;
+    if all of them are skipped, a ValueError is raised.
+
+    >>> from prtpy import BinnerKeepingContents, BinnerKeepingSums
+    >>> best_heuristic_solution(BinnerKeepingSums(), 2, [8,7,6,5,4])
+    (array([15., 15.]), 0.0)
+    >>> best_heuristic_solution(BinnerKeepingContents(), 3, [46, 39, 27, 26, 16, 13, 10], objective=obj.MinimizeLargestSum)
+    ((array([62., 62., 53.]), [[46, 16], [39, 13, 10], [27, 26]]), 62.0)
+    >>> best_heuristic_solution(BinnerKeepingSums(), 3, [], objective=obj.MinimizeLargestSum)
+    (array([0., 0., 0.]), 0.0)
+    >>> best_heuristic_solution(BinnerKeepingSums(), 4, [4914,4972,8307,20789,6036,60760,10655,1167,5849,63532], objective=obj.MaximizeSmallestSum)
+    (array([31137., 31552., 60760., 63532.]), -31137.0)
+    >>> best_heuristic_solution(BinnerKeepingSums(), 4, [4914,4972,8307,20789,6036,60760,10655,1167,5849,63532], algorithms=[multifit])
+    Traceback (most recent call last):
+    ...
+    ValueError: None of the algorithms ['multifit'] returned a partition into 4 bins
+    """
+    if len(items) == 0:   # some heuristics need at least one item.
+        bins = binner.new_bins(numbins)
+        return bins, objective.value_to_minimize(binner.sums(bins))
+    best_bins, best_objective_value = None, None
+    for algorithm in algorithms:
+        bins = algorithm(binner, numbins, items)
+        if binner.numbins(bins) != numbins:
+            logger.info("  %s solution has %d bins instead of %d - skipped", algorithm.__name__, binner.numbins(bins), numbins)
+            continue
+        objective_value = objective.value_to_minimize(binner.sums(bins))
+        logger.info("  %s solution value: %s", algorithm.__name__, objective_value)
+        if best_bins is None or objective_value < best_objective_value:
+            best_bins, best_objective_value = bins, objective_value
+    if best_bins is None:
+        raise ValueError(f"None of the algorithms {[algorithm.__name__ for algorithm in algorithms]} returned a partition into {numbins} bins")
+    return best_bins, best_objective_value
+
+
+if __name__ == "__main__":
+    import doctest, sys
+    (failures, tests) = doctest.testmod(report=True, optionflags=doctest.FAIL_FAST)
+    print("{} failures, {} tests".format(failures, tests))
+    if failures>0:
+        sys.exit(1)
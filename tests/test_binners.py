@@ -0,0 +1,143 @@
+"""
+Tests that the different binners give the same results when used by the same algorithm.
+"""
+
+import unittest, itertools
+import numpy as np
+
+import prtpy
+from prtpy import BinnerKeepingContents, BinnerKeepingSums, BinnerKeepingIndices, BinnerKeepingAssignment, BinnerKeepingPersistentContents, BinnerKeepingSumsInList, BinnerKeepingContentsInList
+prt = prtpy.partitioning
+obj = prtpy.objectives
+
+
+def normalized(bins):
+    sums, lists = bins
+    return (list(sums), [sorted(lst) for lst in lists])
+
+
+class TestContentBinners(unittest.TestCase):
+    def _test_algorithm(self, algorithm, numbins, **kwargs):
+        for _ in range(5):
+            items = list(np.random.randint(1, 2**16, 10))
+            expected = algorithm(BinnerKeepingContents(), numbins, items, **kwargs)
+            for binner in [BinnerKeepingIndices(), BinnerKeepingAssignment(), BinnerKeepingPersistentContents()]:
+                result = algorithm(binner, numbins, items, **kwargs)
+                self.assertEqual(normalized(result), normalized(expected))
+                self.assertEqual(sorted(sum(result[1], [])), sorted(items))
+
+    def test_complete_greedy(self):
+        for numbins in [2,3,4]:
+            self._test_algorithm(prt.complete_greedy, numbins, objective=obj.MinimizeLargestSum)
+
+    def test_complete_karmarkar_karp(self):
+        for numbins in [2,3,4]:
+            self._test_algorithm(prt.complete_karmarkar_karp, numbins)
+
+    def test_karmarkar_karp(self):
+        for numbins in [2,3,4]:
+            self._test_algorithm(prt.karmarkar_karp, numbins)
+
+    def test_sequential_number_partitioning(self):
+        for numbins in [3,4]:
+            self._test_algorithm(prt.snp, numbins)
+
+    def test_recursive_number_partitioning(self):
+        for numbins in [3,4]:
+            self._test_algorithm(prt.rnp, numbins)
+
+    def test_cbldm(self):
+        self._test_algorithm(prt.cbldm, 2, partition_difference=2)
+
+
+class TestAddAndResort(unittest.TestCase):
+    def test_same_as_add_and_sort(self):
+        for binner in [BinnerKeepingSums(), BinnerKeepingContents(), BinnerKeepingIndices(), BinnerKeepingAssignment(), BinnerKeepingPersistentContents(), BinnerKeepingSumsInList(), BinnerKeepingContentsInList()]:
+            for numbins in [1, 2, 5, 20]:
+                bins = binner.new_bins(numbins)
+                for item in np.random.randint(0, 10, 50):
+                    bin_index = np.random.randint(numbins)
+                    expected = binner.add_item_to_bin(binner.copy_bins(bins), item, bin_index)
+                    binner.sort_by_ascending_sum(expected)
+                    binner.add_and_resort(bins, item, bin_index)
+                    self.assertEqual(list(binner.sums(bins)), sorted(binner.sums(bins)))
+                    if isinstance(binner, BinnerKeepingContents):
+                        self.assertEqual(normalized(bins), normalized(expected))
+                    else:
+                        self.assertEqual(list(bins), list(expected))
+
+
+class TestCombinations(unittest.TestCase):
+    def test_same_sums_as_all_permutations(self):
+        for numbins in [2, 3, 5]:
+            for _ in range(10):
+                sums1 = list(np.random.randint(0, 4, numbins))   # small values, to have many equal sums
+                sums2 = list(np.random.randint(0, 4, numbins))
+                expected = {tuple(sorted(sums1[perm[i]]+sums2[i] for i in range(numbins))) for perm in itertools.permutations(range(numbins))}
+                binner = BinnerKeepingSums()
+                result = [(perm, tuple(sums)) for perm, sums in binner.combination_sums(sums1, sums2)]
+                self.assertEqual(sorted(sums for _,sums in result), sorted(expected))
+                for perm, sums in result:
+                    self.assertEqual(tuple(binner.combine_by_permutation(sums1, sums2, perm)), sums)
+
+
+class TestTrailBinner(unittest.TestCase):
+    """
+    Tests that the depth-first variants that use a TrailBinner give the same results as the original algorithms.
+    """
+    def _test_algorithm(self, algorithm, algorithm_with_trail, numbins, **kwargs):
+        objective = kwargs.get("objective", obj.MinimizeDifference)
+        for _ in range(5):
+            items = list(np.random.randint(1, 2**16, 10))
+            expected = algorithm(BinnerKeepingSums(), numbins, items, **kwargs)
+            for binner in [BinnerKeepingSums(), BinnerKeepingContents(), BinnerKeepingIndices(), BinnerKeepingPersistentContents()]:
+                result = algorithm_with_trail(binner, numbins, items, **kwargs)
+                self.assertEqual(objective.value_to_minimize(binner.sums(result)), objective.value_to_minimize(expected))
+                if isinstance(binner, BinnerKeepingContents):
+                    self.assertEqual(sorted(sum(result[1], [])), sorted(items))
+
+    def test_complete_greedy(self):
+        for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+            for numbins in [2,3,4]:
+                self._test_algorithm(prt.complete_greedy, prt.complete_greedy_with_trail, numbins, objective=objective)
+
+    def test_sequential_number_partitioning(self):
+        for numbins in [3,4,5]:
+            self._test_algorithm(prt.snp, prt.snp_with_trail, numbins)
+
+    def test_recursive_number_partitioning(self):
+        for numbins in [3,4,5]:
+            self._test_algorithm(prt.rnp, prt.rnp_with_trail, numbins)
+
+
+class TestSmallBinners(unittest.TestCase):
+    """
+    Tests that the algorithms that switch to list-based binners for a small number of bins
+    give the same results as with a numpy-based binner that they do not switch.
+    """
+    def _test_algorithm(self, algorithm, numbins, **kwargs):
+        objective = kwargs.get("objective", obj.MinimizeDifference)
+        for _ in range(5):
+            items = list(np.random.randint(1, 2**16, 8))
+            expected = algorithm(BinnerKeepingIndices(), numbins, items, **kwargs)
+            expected_value = objective.value_to_minimize(expected.sums)
+            for binner in [BinnerKeepingSums(), BinnerKeepingContents()]:
+                result = algorithm(binner, numbins, items, **kwargs)
+                self.assertIsInstance(binner.sums(result), np.ndarray)
+                self.assertEqual(objective.value_to_minimize(binner.sums(result)), expected_value)
+
+    def test_complete_greedy(self):
+        for numbins in [2,3,4]:
+            self._test_algorithm(prt.complete_greedy, numbins, objective=obj.MinimizeLargestSum)
+
+    def test_dynamic_programming(self):
+        for numbins in [2,3]:
+            self._test_algorithm(prt.dynamic_programming, numbins)
+
+    def test_karmarkar_karp(self):
+        for numbins in [2,3,4]:
+            self._test_algorithm(prt.karmarkar_karp, numbins)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,10 @@ Tests for the CG (Complete Greedy) partitioning algorithm.
 """
 
 import unittest
+import numpy as np
 
 import prtpy
+from prtpy.partitioning.complete_greedy import generator, TranspositionTable
 prt = prtpy.partitioning
 out = prtpy.outputtypes
 obj = prtpy.objectives
@@ -19,6 +21,105 @@ class TestCG(unittest.TestCase):
                 algorithm1=prt.integer_programming, kwargs1={"objective": obj.MinimizeDifference}, 
                 algorithm2=prt.complete_greedy, kwargs2={})
 
+    def test_breadth_first_on_random_inputs(self):
+        for numbins in [2,3,4,5]:
+            for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=numbins, 
+                    numitems=8, bitsperitem=8, 
+                    outputtype=outputtype, 
+                    algorithm1=prt.complete_greedy, kwargs1={"objective": objective}, 
+                    algorithm2=prt.complete_greedy_breadth_first, kwargs2={"objective": objective})
+
+    def test_bounded_seen_states(self):
+        for numbins in [3,4]:
+            for replacement in ["lru", "depth", "two-tier"]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                    numitems=10, bitsperitem=8,
+                    outputtype=out.Difference,
+                    algorithm1=prt.complete_greedy, kwargs1={},
+                    algorithm2=prt.complete_greedy, kwargs2={"seen_states_memory": 1000, "seen_states_replacement": replacement})
+
+    def test_seen_states_with_equal_hashes(self):
+        for replacement in ["lru", "depth", "two-tier"]:
+            table = TranspositionTable(memory=10000, replacement=replacement)
+            for i in range(20):
+                self.assertEqual(hash((i, 2**61+i)), hash((i, i+1)))   # Python hashes integers modulo 2**61-1.
+                self.assertFalse(table.check_and_add((i, i+1), depth=2))
+                self.assertFalse(table.check_and_add((i, 2**61+i), depth=2))
+
+    def test_parallel(self):
+        for numbins in [2,3,4]:
+            for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                    numitems=12, bitsperitem=16,
+                    outputtype=outputtype,
+                    algorithm1=prt.complete_greedy, kwargs1={"objective": objective},
+                    algorithm2=prt.complete_greedy_parallel, kwargs2={"objective": objective, "numprocesses": 2})
+
+    def test_parallel_large_integers(self):
+        offsets = [2329, 2868, 792, 623, 2377, 2485, 1544, 448, 2498, 1538]
+        for base, dtype in [(2**58, int), (2**62, object)]:   # the sums are not exact as floats; with 2**62, they are not 64-bit integers either.
+            items = [base + offset for offset in offsets]
+            for objective in [obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                binner = prtpy.BinnerKeepingSums(dtype=dtype)
+                in_one_process = prt.complete_greedy(binner, 3, items, objective=objective, use_lower_bound=False)
+                in_parallel = prt.complete_greedy_parallel(binner, 3, items, objective=objective, use_lower_bound=False, numprocesses=2)
+                self.assertEqual(objective.value_to_minimize(in_parallel), objective.value_to_minimize(in_one_process))
+
+    def test_discrepancy_search(self):
+        for numbins in [2,3,4]:
+            for discrepancy_search in ["ilds", "dds"]:
+                for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                    assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                        numitems=9, bitsperitem=16,
+                        outputtype=outputtype,
+                        algorithm1=prt.complete_greedy, kwargs1={"objective": objective},
+                        algorithm2=prt.complete_greedy, kwargs2={"objective": objective, "discrepancy_search": discrepancy_search})
+
+    def test_discrepancy_search_iterations(self):
+        items = [100, 12, 11, 9, 8, 7, 5, 4, 3, 2]   # the global lower bound is never reached, so the search does not stop early.
+        no_pruning = {"use_lower_bound": False, "use_fast_lower_bound": False, "use_set_of_seen_states": False}
+        for numbins in [2,3]:
+            logs = {}
+            for discrepancy_search in [None, "dds"]:
+                with self.assertLogs("prtpy.partitioning.complete_greedy", level="INFO") as logs[discrepancy_search]:
+                    prt.complete_greedy(prtpy.BinnerKeepingSums(), numbins, items, objective=obj.MinimizeLargestSum, discrepancy_search=discrepancy_search, **no_pruning)
+            iterations = [int(line.split()[-1]) for line in logs["dds"].output if "Discrepancy search iteration" in line]
+            self.assertEqual(iterations, list(range(2, len(items)+1)))   # iteration 1 would need a discrepancy at depth 0, which is impossible.
+            checked = {key: [line for line in log.output if "Checked" in line][0].split()[1] for key, log in logs.items()}
+            self.assertEqual(checked["dds"], checked[None])   # each complete partition is checked once.
+
+    def test_generator(self):
+        for numbins in [2,3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                items = list(np.random.randint(1, 2**16, 10))
+                solutions = list(generator(prtpy.BinnerKeepingSums(), numbins, items, objective=objective))
+                objective_values = [objective_value for _, objective_value, _, _ in solutions]
+                self.assertEqual(objective_values, sorted(set(objective_values), reverse=True))   # every solution is strictly better.
+                self.assertEqual([objective.value_to_minimize(bins) for bins, _, _, _ in solutions], objective_values)
+                self.assertEqual(objective_values[-1], objective.value_to_minimize(prt.complete_greedy(prtpy.BinnerKeepingSums(), numbins, items, objective=objective)))
+                nodes = [nodes for _, _, _, nodes in solutions]
+                self.assertEqual(nodes, sorted(nodes))
+
+    def test_warm_start(self):
+        for numbins in [2,3,4]:
+            for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                    numitems=10, bitsperitem=16,
+                    outputtype=outputtype,
+                    algorithm1=prt.complete_greedy, kwargs1={"objective": objective},
+                    algorithm2=prt.complete_greedy, kwargs2={"objective": objective, "initial_solution": "heuristics"})
+
+    def test_warm_start_with_missing_bins(self):
+        items = [4914,4972,8307,20789,6036,60760,10655,1167,5849,63532]   # multifit puts these items into 3 bins instead of 4.
+        for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+            expected = prtpy.partition(algorithm=prt.complete_greedy, numbins=4, items=items, objective=objective, outputtype=outputtype)
+            warm_started = prtpy.partition(algorithm=prt.complete_greedy, numbins=4, items=items, objective=objective, outputtype=outputtype, initial_solution="heuristics")
+            self.assertEqual(warm_started, expected)
+        binner = prtpy.BinnerKeepingSums()
+        with self.assertRaises(ValueError):
+            prt.complete_greedy(binner, 4, items, initial_solution=prt.multifit(binner, 4, items))
+
 
 if __name__ == '__main__':
     unittest.main()
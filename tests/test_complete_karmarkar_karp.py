@@ -19,6 +19,23 @@ class TestCKK(unittest.TestCase):
                 algorithm1=prt.integer_programming, kwargs1={"objective": obj.MinimizeDifference}, 
                 algorithm2=prt.complete_karmarkar_karp, kwargs2={})
 
+    def test_warm_start(self):
+        for numbins in [2,3,4]:
+            assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                numitems=9, bitsperitem=16,
+                outputtype=out.Difference,
+                algorithm1=prt.complete_karmarkar_karp, kwargs1={},
+                algorithm2=prt.complete_karmarkar_karp, kwargs2={"initial_solution": "heuristics"})
+
+    def test_warm_start_with_missing_bins(self):
+        items = [4914,4972,8307,20789,6036,60760,10655,1167,5849,63532]   # multifit puts these items into 3 bins instead of 4.
+        expected = prtpy.partition(algorithm=prt.complete_karmarkar_karp, numbins=4, items=items, outputtype=out.Difference)
+        warm_started = prtpy.partition(algorithm=prt.complete_karmarkar_karp, numbins=4, items=items, outputtype=out.Difference, initial_solution="heuristics")
+        self.assertEqual(warm_started, expected)
+        binner = prtpy.BinnerKeepingSums()
+        with self.assertRaises(ValueError):
+            prt.complete_karmarkar_karp(binner, 4, items, initial_solution=prt.multifit(binner, 4, items))
+
 
 if __name__ == '__main__':
     unittest.main()
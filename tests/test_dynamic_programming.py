@@ -0,0 +1,126 @@
+"""
+Tests for the DP (Dynamic Programming) partitioning algorithm.
+"""
+
+import unittest, tempfile, os
+import numpy as np
+
+import prtpy
+prt = prtpy.partitioning
+out = prtpy.outputtypes
+obj = prtpy.objectives
+
+
+class TestDP(unittest.TestCase):
+    def test_on_random_inputs(self):
+        for numbins in [2,3]:
+            for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=numbins,
+                    numitems=10, bitsperitem=10,
+                    outputtype=outputtype,
+                    algorithm1=prt.complete_greedy, kwargs1={"objective": objective},
+                    algorithm2=prt.dynamic_programming, kwargs2={"objective": objective})
+
+    def test_two_way_partition(self):
+        for _ in range(5):
+            items = list(np.random.randint(1, 2**16, 50))
+            sums = prtpy.partition(algorithm=prt.dynamic_programming, numbins=2, items=items, outputtype=out.Sums)
+            partition = prtpy.partition(algorithm=prt.dynamic_programming, numbins=2, items=items)
+            self.assertEqual(sorted(sum(partition, [])), sorted(items))
+            self.assertEqual(sorted(sum(bin) for bin in partition), sorted(sums))
+            self.assertLessEqual(abs(sums[0]-sums[1]), 1)   # with 50 random items of 16 bits, a perfect partition almost surely exists.
+
+    def test_lower_bound(self):
+        for numbins in [3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                for items in [list(np.random.randint(1, 2**10, 7)), list(np.random.randint(1, 2**10, 7) / 7)]:
+                    for binner in [prtpy.BinnerKeepingSums(), prtpy.BinnerKeepingContents()]:
+                        with_bound = prt.dynamic_programming(binner, numbins, items, objective=objective)
+                        without_bound = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=False)
+                        self.assertAlmostEqual(objective.value_to_minimize(binner.sums(with_bound)), objective.value_to_minimize(binner.sums(without_bound)))
+
+    def test_partition_same_as_sums(self):
+        for numbins in [3,4,5]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                items = list(np.random.randint(1, 2**8, 10))
+                sums = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective, outputtype=out.SortedSums, use_lower_bound=False)
+                partition = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective, use_lower_bound=False)
+                self.assertEqual(sorted(sum(partition, [])), sorted(items))
+                self.assertEqual(sorted(sum(bin) for bin in partition), list(sums))
+
+    def test_partition_same_as_sums_with_pruning(self):
+        example = [3394,3145,2900,516,1041,3387,1368,3477,723,1433,3994,2095,3424,2468,270]   # a pruned layer is smaller than the layer its parents point into.
+        for numbins in [3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                for items in [example, list(np.random.randint(1, 2**12, 15))]:
+                    sums = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective, outputtype=out.SortedSums)
+                    partition = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective)
+                    self.assertEqual(sorted(sum(partition, [])), sorted(items))
+                    self.assertEqual(objective.value_to_minimize(sorted(sum(bin) for bin in partition)), objective.value_to_minimize(sums))
+
+    def test_epsilon(self):
+        epsilon = 0.1
+        for numbins in [3,4]:
+            items = list(np.random.randint(1, 2**30, 10))
+            largest_sum = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=obj.MinimizeLargestSum, outputtype=out.LargestSum)
+            partition = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=obj.MinimizeLargestSum, epsilon=epsilon)
+            self.assertEqual(sorted(sum(partition, [])), sorted(items))
+            self.assertLessEqual(max(sum(bin) for bin in partition), (1+epsilon)*largest_sum)
+            smallest_sum = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=obj.MaximizeSmallestSum, outputtype=out.SmallestSum)
+            approximate_smallest_sum = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=obj.MaximizeSmallestSum, outputtype=out.SmallestSum, epsilon=epsilon)
+            self.assertGreaterEqual((1+epsilon)*approximate_smallest_sum, smallest_sum)
+            with self.assertRaises(ValueError):   # the difference has no approximation guarantee.
+                prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=obj.MinimizeDifference, epsilon=epsilon)
+
+    def test_high_multiplicity(self):
+        for numbins in [3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                integer_items = list(np.random.choice(np.random.randint(1, 2**10, 3), 12))
+                expected = objective.value_to_minimize(prtpy.partition(algorithm=prt.complete_greedy, numbins=numbins, items=integer_items, objective=objective, outputtype=out.Sums))
+                for divisor in [1, 7]:  # dividing all items by 7 should divide the optimal value by 7.
+                    items = [item/divisor for item in integer_items]
+                    for binner in [prtpy.BinnerKeepingSums(), prtpy.BinnerKeepingContents()]:
+                        for use_lower_bound in [True, False]:
+                            result = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=use_lower_bound)
+                            self.assertAlmostEqual(objective.value_to_minimize(binner.sums(result)), expected/divisor)
+                            if isinstance(binner, prtpy.BinnerKeepingContents):
+                                self.assertEqual(sorted(sum(result[1], [])), sorted(items))
+
+    def test_high_multiplicity_partition_same_as_sums_with_pruning(self):
+        example = [386]*4 + [1764]*3 + [2206]*7 + [2322]*4 + [3141]*4 + [3374]*2   # a pruned layer is smaller than the layer its parents point into.
+        for numbins in [3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                for items in [example, list(np.random.choice(np.random.randint(1, 2**12, 6), 24))]:
+                    sums = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective, outputtype=out.Sums)
+                    partition = prtpy.partition(algorithm=prt.dynamic_programming, numbins=numbins, items=items, objective=objective)
+                    self.assertEqual(sorted(sum(partition, [])), sorted(items))
+                    self.assertEqual(objective.value_to_minimize([sum(bin) for bin in partition]), objective.value_to_minimize(sums))
+
+    def test_out_of_core(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for numbins in [3,4]:
+                for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum, obj.MaximizeSmallestSum]:
+                    for items in [list(np.random.randint(1, 2**10, 8)), list(np.random.randint(1, 2**10, 8) / 7)]:
+                        for binner in [prtpy.BinnerKeepingSums(), prtpy.BinnerKeepingContents()]:
+                            in_memory = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=False)
+                            out_of_core = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=False, directory=directory, states_in_memory=50)
+                            self.assertAlmostEqual(objective.value_to_minimize(binner.sums(out_of_core)), objective.value_to_minimize(binner.sums(in_memory)))
+                            if isinstance(binner, prtpy.BinnerKeepingContents):
+                                self.assertEqual(sorted(sum(out_of_core[1], [])), sorted(items))
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_parallel(self):
+        for numbins in [3,4]:
+            for objective in [obj.MinimizeDifference, obj.MinimizeLargestSum]:
+                for items in [list(np.random.randint(1, 2**10, 8)), list(np.random.randint(1, 2**10, 8) / 7)]:
+                    for binner in [prtpy.BinnerKeepingSums(), prtpy.BinnerKeepingContents()]:
+                        for use_lower_bound in [True, False]:
+                            in_one_process = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=use_lower_bound)
+                            in_parallel = prt.dynamic_programming(binner, numbins, items, objective=objective, use_lower_bound=use_lower_bound, numprocesses=3)
+                            self.assertAlmostEqual(objective.value_to_minimize(binner.sums(in_parallel)), objective.value_to_minimize(binner.sums(in_one_process)))
+                            if isinstance(binner, prtpy.BinnerKeepingContents):
+                                self.assertEqual(sorted(sum(in_parallel[1], [])), sorted(items))
+
+
+if __name__ == '__main__':
+    unittest.main()
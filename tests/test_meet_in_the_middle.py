@@ -0,0 +1,52 @@
+"""
+Tests for the meet-in-the-middle two-way partitioning algorithm.
+"""
+
+import unittest
+import numpy as np
+
+import prtpy
+prt = prtpy.partitioning
+out = prtpy.outputtypes
+obj = prtpy.objectives
+
+
+class TestMeetInTheMiddle(unittest.TestCase):
+    def test_on_random_inputs(self):
+        for numitems in [1, 7, 10]:
+            for objective, outputtype in [(obj.MinimizeDifference, out.Difference), (obj.MinimizeLargestSum, out.LargestSum), (obj.MaximizeSmallestSum, out.SmallestSum)]:
+                assert prtpy.compare_algorithms_on_random_items(numbins=2,
+                    numitems=numitems, bitsperitem=10,
+                    outputtype=outputtype,
+                    algorithm1=prt.complete_greedy, kwargs1={"objective": objective},
+                    algorithm2=prt.meet_in_the_middle, kwargs2={})
+
+    def test_same_as_ckk(self):
+        for _ in range(3):
+            items = list(np.random.randint(1, 2**16, 20))
+            ckk_difference = prtpy.partition(algorithm=prt.ckk, numbins=2, items=items, outputtype=out.Difference)
+            for divisor in [1, 7]:  # dividing all items by 7 should divide the optimal difference by 7.
+                fractional_items = [item/divisor for item in items]
+                partition = prtpy.partition(algorithm=prt.meet_in_the_middle, numbins=2, items=fractional_items)
+                self.assertEqual(sorted(sum(partition, [])), sorted(fractional_items))
+                sums = [sum(bin) for bin in partition]
+                self.assertLessEqual(sums[0], sums[1])
+                self.assertAlmostEqual(sums[1]-sums[0], ckk_difference/divisor, places=6)
+
+    def test_large_integers(self):
+        for base in [2**50, 2**61]:   # half the sum is not exact as a float; with 2**61, the sums do not fit in 64 bits.
+            items = [base*4+1, base*4, 3, base*2, base*2+1, 5, 7]
+            expected = prtpy.partition(algorithm=prt.complete_greedy, numbins=2, items=items, outputtype=out.Difference)
+            self.assertEqual(prtpy.partition(algorithm=prt.meet_in_the_middle, numbins=2, items=items, outputtype=out.Difference), expected)
+
+    def test_as_two_way_algorithm(self):
+        for algorithm in [prt.snp, prt.snp_with_trail, prt.rnp, prt.rnp_with_trail]:
+            for numbins in [3,4,5]:
+                items = list(np.random.randint(1, 2**10, 10))
+                expected = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=out.Difference)
+                result = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=out.Difference, two_way_algorithm=prt.meet_in_the_middle)
+                self.assertEqual(result, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,6 +22,9 @@ class TestPackingAlgorithms(unittest.TestCase):
             result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.SmallestSum)
             assert (result==11)
 
+            result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.Assignment)
+            assert (list(result)==[0,1] or list(result)==[1,0])
+
             result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.BinCount)
             assert (result==2)
 
@@ -43,6 +46,9 @@ class TestPackingAlgorithms(unittest.TestCase):
             result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.SmallestSum)
             assert (result==11)
 
+            result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.Assignment)
+            assert (list(result)==[0,1] or list(result)==[1,0])
+
             result = prtpy.pack(algorithm=algorithm, binsize=binsize, items=items, outputtype=prtpy.out.BinCount)
             assert (result==2)
 
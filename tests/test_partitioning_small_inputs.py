@@ -24,6 +24,9 @@ class TestPartitionAlgorithms(unittest.TestCase):
             result = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=prtpy.out.SmallestSum)
             assert (result==11)
 
+            result = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=prtpy.out.Assignment)
+            assert (list(result)==[0,1] or list(result)==[1,0])
+
     def test_with_dict_input(self):
         items = {"a":11, "b":22}
         numbins = 2
@@ -40,6 +43,9 @@ class TestPartitionAlgorithms(unittest.TestCase):
             result = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=prtpy.out.SmallestSum)
             assert (result==11)
 
+            result = prtpy.partition(algorithm=algorithm, numbins=numbins, items=items, outputtype=prtpy.out.Assignment)
+            assert (list(result)==[0,1] or list(result)==[1,0])
+
 
 if __name__ == "__main__":
     unittest.main()